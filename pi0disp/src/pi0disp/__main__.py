@@ -4,7 +4,13 @@
 import click
 
 from .commands.ball_anime import ball_anime
+from .commands.bench import bench
+from .commands.encode import encode
 from .commands.image import image
+from .commands.merge_bench import merge_bench
+from .commands.play import play
+from .commands.precompile import precompile
+from .commands.resize_bench import resize_bench
 
 @click.group()
 def cli():
@@ -14,7 +20,13 @@ def cli():
     pass
 
 cli.add_command(ball_anime)
+cli.add_command(bench)
+cli.add_command(encode)
 cli.add_command(image)
+cli.add_command(merge_bench)
+cli.add_command(play)
+cli.add_command(precompile)
+cli.add_command(resize_bench)
 
 
 if __name__ == "__main__":
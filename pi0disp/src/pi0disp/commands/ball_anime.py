@@ -16,8 +16,12 @@ from PIL import Image, ImageDraw, ImageFont
 
 import importlib.resources
 
+from ..disp.emulator import save_snapshot
 from ..disp.st7789v import ST7789V
-from ..utils.performance_core import RegionOptimizer
+from ..disp.transport import TRANSPORTS
+from ..utils.frame_scheduler import POLICIES, FrameScheduler
+from ..utils.compositor import Compositor
+from ..utils.text_renderer import TextRenderer
 
 
 # --- 元の見た目設定を維持 ---
@@ -26,6 +30,7 @@ TARGET_FPS = 30.0
 BALL_RADIUS = 20
 TEXT_COLOR = (255, 255, 255)
 FPS_UPDATE_INTERVAL = 0.2
+HUD_PADDING = 5
 
 # --- 計算最適化のみの設定 ---
 PHYSICS_SUBSTEPS = 4  # 物理精度維持
@@ -63,7 +68,7 @@ def fast_cos_sin(angle):
 # --- 最適化されたクラス定義 ---
 class Ball:
     """計算最適化版ボールクラス（見た目は同じ）"""
-    __slots__ = ('x', 'y', 'radius', 'speed_x', 'speed_y', 'fill_color', 'prev_bbox', 
+    __slots__ = ('x', 'y', 'radius', 'speed_x', 'speed_y', 'fill_color',
                  'speed_sq', '_bbox_cache', '_bbox_dirty')
 
     def __init__(self, x, y, radius, speed, angle, fill_color):
@@ -78,7 +83,6 @@ class Ball:
         self.speed_sq = speed * speed  # 速度の二乗を事前計算
         
         self.fill_color = fill_color
-        self.prev_bbox = None
         self._bbox_cache = None
         self._bbox_dirty = True
 
@@ -128,11 +132,6 @@ class Ball:
             self._bbox_dirty = False
         return self._bbox_cache
 
-    def draw(self, draw: ImageDraw.ImageDraw):
-        """描画処理（変更なし）"""
-        bbox = self.get_bbox()
-        draw.ellipse(bbox, fill=self.fill_color, outline=self.fill_color)
-
 class FpsCounter:
     """FPSカウンター（計算最適化版）"""
     __slots__ = ('frame_count', 'last_update_time', 'fps_text', '_update_threshold')
@@ -313,10 +312,10 @@ def _handle_ball_collisions_optimized(balls: List[Ball], frame_count: int):
                 ball2._bbox_dirty = True
 
 def _main_loop_optimized(lcd: ST7789V, background: Image.Image, balls: List[Ball], 
-                        fps_counter: FpsCounter, font, target_fps: float):
+                        fps_counter: FpsCounter, font, scheduler: FrameScheduler,
+                        use_pipeline: bool = True):
     """メインループ（計算最適化版）"""
-    target_duration = 1.0 / target_fps
-    last_frame_time = time.time()
+    target_duration = scheduler.period
     frame_count = 0
     
     # 時間制限を事前計算
@@ -324,19 +323,26 @@ def _main_loop_optimized(lcd: ST7789V, background: Image.Image, balls: List[Ball
     min_delta_t = target_duration * 0.2
     inv_substeps = 1.0 / PHYSICS_SUBSTEPS  # 除算を事前計算
 
-    # 再利用オブジェクト
-    hud_layer = Image.new("RGBA", (lcd.width, lcd.height), (0, 0, 0, 0))
-    hud_draw = ImageDraw.Draw(hud_layer)
-    prev_fps_bbox = None
+    # レイヤー合成（変化した領域だけを再合成する）
+    compositor = Compositor(background, merge_regions=lcd.merge_regions)
+    ball_layers = []
+    for ball in balls:
+        x0, y0, _, _ = ball.get_bbox()
+        ball_layers.append(
+            compositor.add_layer(_ball_sprite(ball.radius, ball.fill_color), x0, y0)
+        )
+    hud_layer = compositor.add_layer(
+        _text_image(font, fps_counter.fps_text), HUD_PADDING, HUD_PADDING
+    )
     
     # 画面サイズを事前取得
     screen_width = lcd.width
     screen_height = lcd.height
 
     while True:
+        # 次のフレーム期限まで待機（絶対時刻基準でドリフトしない）
+        actual_delta_t = scheduler.tick()
         frame_count += 1
-        current_time = time.time()
-        actual_delta_t = current_time - last_frame_time
         
         # 時間クランプ（min/max関数の組み合わせ最適化）
         if actual_delta_t > max_delta_t:
@@ -346,7 +352,6 @@ def _main_loop_optimized(lcd: ST7789V, background: Image.Image, balls: List[Ball
         else:
             delta_t = actual_delta_t
             
-        last_frame_time = current_time
         sub_delta_t = delta_t * inv_substeps
 
         # --- 物理更新ループ ---
@@ -358,65 +363,57 @@ def _main_loop_optimized(lcd: ST7789V, background: Image.Image, balls: List[Ball
             # 衝突処理
             _handle_ball_collisions_optimized(balls, frame_count)
 
-        # --- 描画処理 ---
-        new_frame_image = background.copy()
-        draw = ImageDraw.Draw(new_frame_image)
-        dirty_regions = []
+        # --- 描画処理（レイヤーを動かすだけ） ---
+        for ball, layer in zip(balls, ball_layers):
+            x0, y0, _, _ = ball.get_bbox()
+            layer.move_to(x0, y0)
 
-        # ボール描画
-        for ball in balls:
-            prev_bbox = ball.prev_bbox
-            curr_bbox = ball.get_bbox()
-            dirty_region = RegionOptimizer._merge_two(prev_bbox, curr_bbox) if prev_bbox else curr_bbox
-            
-            if dirty_region:
-                expanded_dirty_region = (dirty_region[0] - 1, dirty_region[1] - 1, dirty_region[2] + 1, dirty_region[3] + 1)
-                dirty_regions.append(RegionOptimizer.clamp_region(expanded_dirty_region, screen_width, screen_height))
-            
-            ball.draw(draw)
-            ball.prev_bbox = curr_bbox
-
-        # FPS表示更新
+        # FPS表示（文字列が変わった時だけ差し替える）
         if fps_counter.update():
-            if prev_fps_bbox:
-                expanded_prev_fps_bbox = (
-                    prev_fps_bbox[0] - 4, prev_fps_bbox[1] - 6,
-                    prev_fps_bbox[2] + 4, prev_fps_bbox[3] + 6
-                )
-                hud_draw.rectangle(expanded_prev_fps_bbox, fill=(0, 0, 0, 0))
-
-            current_fps_bbox = draw_text(hud_draw, fps_counter.fps_text, font, 
-                                      x='left', y='top',
-                                      width=screen_width, height=screen_height, 
-                                      color=TEXT_COLOR)
-            
-            if current_fps_bbox:
-                expanded_current_fps_bbox = (
-                    current_fps_bbox[0] - 4, current_fps_bbox[1] - 6,
-                    current_fps_bbox[2] + 4, current_fps_bbox[3] + 6
-                )
-                dirty_regions.append(expanded_current_fps_bbox)
-                prev_fps_bbox = current_fps_bbox
-
-        # 画面合成と表示
-        frame_rgba = new_frame_image.convert("RGBA")
-        frame_rgba.alpha_composite(hud_layer)
-        final_frame = frame_rgba.convert("RGB")
-
-        if dirty_regions:
-            optimized = RegionOptimizer.merge_regions(dirty_regions, max_regions=8)
-            for r in optimized:
-                lcd.display_region(final_frame, *r)
-
-        # フレームレート制御
-        next_frame_time = last_frame_time + target_duration
-        sleep_duration = next_frame_time - time.time()
-        
-        if 0 < sleep_duration <= target_duration:
-            time.sleep(sleep_duration)
+            hud_layer.set_image(_text_image(font, fps_counter.fps_text))
+
+        # 変化した領域だけを合成してRGB565で転送
+        rects = compositor.render(max_regions=8)
+        if rects:
+            if use_pipeline:
+                # 転送はライタースレッドで実行
+                lcd.submit(rects)
+            else:
+                lcd.display_rgb565_rects(rects)
+
+
+# フォントオブジェクト -> TextRenderer (キーがフォントを保持するので
+# 解放されたフォントのidが別のフォントに再利用されることはない)
+_text_renderers: dict = {}
+_TEXT_RENDERERS_MAX = 8
+
+
+def _ball_sprite(radius: int, color) -> Image.Image:
+    """ボールのスプライト（透明背景のRGBA画像）"""
+    size = radius * 2 + 1
+    sprite = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).ellipse((0, 0, size - 1, size - 1), fill=color, outline=color)
+    return sprite
+
+
+def _text_renderer(font) -> TextRenderer:
+    """フォントごとのTextRenderer"""
+    renderer = _text_renderers.get(font)
+    if renderer is None:
+        if len(_text_renderers) >= _TEXT_RENDERERS_MAX:
+            # 一番古いフォントのキャッシュを捨てる
+            del _text_renderers[next(iter(_text_renderers))]
+        renderer = _text_renderers[font] = TextRenderer(font)
+    return renderer
+
+
+def _text_image(font, text: str) -> Image.Image:
+    """テキストのRGBA画像（文字の外接矩形ぴったり、キャッシュ済み）"""
+    return _text_renderer(font).render(text).rgba_image(TEXT_COLOR)
+
 
 def draw_text(
-        draw: ImageDraw.ImageDraw,
+        target: Image.Image,
         text: str, font: ImageFont.FreeTypeFont | ImageFont.ImageFont, 
         x, y, 
         width: int,
@@ -425,18 +422,12 @@ def draw_text(
         padding: int = 5
 ):
     """
-    Draws text on a PIL ImageDraw object with flexible positioning.
-    It pre-renders the text to accurately determine its bounding box.
+    Draws text on an image with flexible positioning.
+    Glyphs and rendered strings are cached by `TextRenderer`, so redrawing
+    unchanged text is a masked paste.
     """
-    # Get the actual bounding box of the text using ImageDraw.textbbox
-    try:
-        actual_bbox = draw.textbbox((0, 0), text, font=font)
-    except (TypeError, ValueError):
-        # Handle cases where textbbox might not be available or fails
-        return (0, 0, 0, 0)
-
-    if actual_bbox is None:
-        return (0, 0, 0, 0)
+    renderer = _text_renderer(font)
+    actual_bbox = renderer.measure(text)
 
     text_width = actual_bbox[2] - actual_bbox[0]
     text_height = actual_bbox[3] - actual_bbox[1]
@@ -466,17 +457,8 @@ def draw_text(
             final_y = padding - actual_bbox[1]
     else:
         final_y = y - actual_bbox[1]
-        
-    final_pos = (final_x, final_y)
-    
-    draw.text(final_pos, text, font=font, fill=color)
-    
-    return (
-        int(final_pos[0] + actual_bbox[0]),
-        int(final_pos[1] + actual_bbox[1]),
-        int(final_pos[0] + actual_bbox[2] + 1),
-        int(final_pos[1] + actual_bbox[3] + 1)
-    )
+
+    return renderer.draw(target, (final_x, final_y), text, color)
 
 # --- CLIコマンド ---
 @click.command("ball_anime")
@@ -484,12 +466,25 @@ def draw_text(
 @click.option('--fps', "-f", default=TARGET_FPS, type=float, help='Target frames per second', show_default=True)
 @click.option('--num-balls', "-n", default=3, type=int, help='Number of balls to display', show_default=True)
 @click.option('--ball-speed', "-b", default=None, type=float, help='Absolute speed of balls (pixels/second).')
-def ball_anime(spi_mhz: float, fps: float, num_balls: int, ball_speed: float):
+@click.option('--pipeline/--no-pipeline', default=True, help='Overlap rendering with SPI transfer.', show_default=True)
+@click.option('--transport', '-t', default='pigpio', type=click.Choice(list(TRANSPORTS)), help='SPI backend.', show_default=True)
+@click.option('--frame-policy', default='drop', type=click.Choice(POLICIES), help='On a missed deadline: drop frames or slow down.', show_default=True)
+@click.option('--te-pin', type=int, default=None, help='GPIO wired to the panel TE output: sync transfers and pacing to the refresh (simulated 60 Hz on memory/emulator).')
+@click.option('--snapshot', type=click.Path(dir_okay=False), default=None, help='Save the emulated screen to this file on exit (emulator transport).')
+def ball_anime(spi_mhz: float, fps: float, num_balls: int, ball_speed: float, pipeline: bool, transport: str, frame_policy: str,
+               te_pin: int, snapshot: str):
     """物理ベースのアニメーションデモを実行する（計算最適化版）。"""
     print(f"Running at {fps} FPS... Press Ctrl+C to exit.")
+    scheduler = FrameScheduler(fps, policy=frame_policy)
+    te_sync = None
 
     try:
-        with ST7789V(speed_hz=int(spi_mhz * 1_000_000)) as lcd:
+        with ST7789V(speed_hz=int(spi_mhz * 1_000_000), transport=transport, te_pin=te_pin) as lcd:
+            # TEピンがあればパネルのリフレッシュに同期してフレームを刻む
+            te_sync = lcd.te_sync
+            if te_sync is not None:
+                scheduler.vsync = te_sync.wait
+
             # Load the bundled font
             font_large: ImageFont.FreeTypeFont | ImageFont.ImageFont
             font_small: ImageFont.FreeTypeFont | ImageFont.ImageFont
@@ -510,7 +505,7 @@ def ball_anime(spi_mhz: float, fps: float, num_balls: int, ball_speed: float):
                 draw.line((0, y, lcd.width, y), fill=color)
 
             # 静的テキスト（IPアドレスなど）を描画
-            draw_text(draw, "IP: N/A", font_small, 
+            draw_text(background_image, "IP: N/A", font_small, 
                       x='center', y='bottom',
                       width=lcd.width, height=lcd.height, 
                       color=TEXT_COLOR)
@@ -522,10 +517,25 @@ def ball_anime(spi_mhz: float, fps: float, num_balls: int, ball_speed: float):
             fps_counter = FpsCounter()
             
             # メインループを開始
-            _main_loop_optimized(lcd, background_image, balls, fps_counter, font_large, fps)
+            try:
+                _main_loop_optimized(lcd, background_image, balls, fps_counter, font_large, scheduler,
+                                     use_pipeline=pipeline)
+            finally:
+                if snapshot:
+                    lcd.stop_pipeline()  # 書き込み中のフレームを反映
+                    save_snapshot(lcd.transport, snapshot)
 
     except KeyboardInterrupt:
-        print("\nExiting.\n")
+        stats = scheduler.get_stats()
+        print(f"\nFrames: {stats['frames']}, FPS: {stats['fps']:.1f}/{stats['target_fps']:g}, "
+              f"missed: {stats['missed']}, dropped: {stats['dropped']}, "
+              f"max late: {stats['max_late_ms']:.1f} ms")
+        if te_sync is not None:
+            te = te_sync.get_stats()
+            print(f"TE: {te['refresh_hz']:.1f} Hz, in window: {te['in_window']}/{te['transfers']}, "
+                  f"late starts: {te['late_starts']}, overruns: {te['overruns']}, "
+                  f"timeouts: {te['timeouts']}, avg wait: {te['avg_wait_ms']:.1f} ms")
+        print("Exiting.\n")
     except Exception as e:
         print(f"An error occurred: {e}")
         exit(1)
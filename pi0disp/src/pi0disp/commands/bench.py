@@ -0,0 +1,307 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Display pipeline benchmark command."""
+import importlib.resources
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import click
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from ..disp.st7789v import ST7789V
+from ..disp.transport import TRANSPORTS
+from ..utils.performance_core import ColorConverter
+
+STAGES = ('draw', 'convert', 'merge', 'window', 'transfer')
+WORKLOADS = ('full-frame', 'small-regions', 'text-overlay')
+
+Region = Tuple[int, int, int, int]
+# A workload draws one frame and returns its dirty regions
+FrameFunc = Callable[[int], Tuple[Image.Image, List[Region]]]
+
+
+def _gradient(width: int, height: int) -> Image.Image:
+    """Returns the static background used by all workloads."""
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    y = np.linspace(0, 255, height, dtype=np.uint8)
+    rgb = np.empty((height, width, 3), dtype=np.uint8)
+    rgb[..., 0] = x[None, :]
+    rgb[..., 1] = y[:, None]
+    rgb[..., 2] = 128
+    return Image.fromarray(rgb, "RGB")
+
+
+def _full_frame(width: int, height: int, rng: random.Random) -> FrameFunc:
+    """Every frame redraws the whole screen."""
+    background = _gradient(width, height)
+    shapes = [
+        (rng.randrange(width), rng.randrange(height), rng.randint(10, 60),
+         tuple(rng.randrange(256) for _ in range(3)))
+        for _ in range(24)
+    ]
+
+    def frame(n: int):
+        image = background.copy()
+        draw = ImageDraw.Draw(image)
+        for x, y, size, color in shapes:
+            x = (x + n * 3) % width
+            draw.rectangle((x, y, x + size, y + size // 2), fill=color)
+        draw.line((0, n % height, width, height - n % height),
+                  fill=(255, 255, 255), width=3)
+        return image, [(0, 0, width, height)]
+    return frame
+
+
+def _small_regions(
+        width: int, height: int, rng: random.Random, count: int
+) -> FrameFunc:
+    """Many small sprites move over a static background."""
+    background = _gradient(width, height)
+    image = background.copy()
+    size = 16
+    sprites = [
+        [rng.randrange(width - size), rng.randrange(height - size),
+         rng.choice((-2, -1, 1, 2)), rng.choice((-2, -1, 1, 2)),
+         tuple(rng.randrange(256) for _ in range(3))]
+        for _ in range(count)
+    ]
+
+    def frame(n: int):
+        draw = ImageDraw.Draw(image)
+        dirty: List[Region] = []
+        for s in sprites:
+            x, y = s[0], s[1]
+            # Erase with the background, then move and redraw
+            box = (x, y, x + size, y + size)
+            image.paste(background.crop(box), box[:2])
+            s[0] = min(max(0, x + s[2]), width - size)
+            s[1] = min(max(0, y + s[3]), height - size)
+            if s[0] in (0, width - size):
+                s[2] = -s[2]
+            if s[1] in (0, height - size):
+                s[3] = -s[3]
+            draw.ellipse((s[0], s[1], s[0] + size - 1, s[1] + size - 1),
+                         fill=s[4])
+            dirty.append((min(x, s[0]), min(y, s[1]),
+                          max(x, s[0]) + size, max(y, s[1]) + size))
+        return image, dirty
+    return frame
+
+
+def _text_overlay(width: int, height: int) -> FrameFunc:
+    """A changing text line over a static background."""
+    background = _gradient(width, height)
+    image = background.copy()
+    try:
+        with importlib.resources.path(
+                'pi0disp.fonts', 'NotoSans-Regular.ttf'
+        ) as font_path:
+            font = ImageFont.truetype(str(font_path), 28)
+    except (IOError, FileNotFoundError):
+        font = ImageFont.load_default()
+    area = (0, height // 2 - 24, width, height // 2 + 24)
+
+    def frame(n: int):
+        image.paste(background.crop(area), area[:2])
+        draw = ImageDraw.Draw(image)
+        draw.text((8, area[1] + 4), f"Frame {n:06d}  {n * 0.033:8.2f}s",
+                  font=font, fill=(255, 255, 255))
+        return image, [area]
+    return frame
+
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    """Returns mean/median/p95/min/max of seconds, in milliseconds."""
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        'mean_ms': round(statistics.fmean(ms), 4),
+        'median_ms': round(statistics.median(ms), 4),
+        'p95_ms': round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        'min_ms': round(ms[0], 4),
+        'max_ms': round(ms[-1], 4),
+    }
+
+
+def _traffic(lcd: ST7789V) -> int:
+    """Bytes sent so far, if the transport counts them (else -1)."""
+    transport = lcd.transport
+    if hasattr(transport, 'bytes_written'):
+        return transport.bytes_written
+    device = getattr(transport, 'device', None)
+    if device is not None:
+        return device.counters['bytes']
+    return -1
+
+
+def run_workload(
+        lcd: ST7789V, frame_func: FrameFunc, frames: int, warmup: int,
+        max_regions: int
+) -> dict:
+    """
+    Runs one workload and times each stage of every frame.
+
+    The stages are the steps `display_region` performs, run one by one:
+    drawing, merging the dirty regions, RGB565 conversion (plus RGB444
+    packing at 12-bit color depth), window setup (CASET/RASET/RAMWR) and
+    pixel transfer.
+    """
+    converter = lcd._optimizers['color_converter']
+    times: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    totals: List[float] = []
+    regions_sent = 0
+    pixels_sent = 0
+    bytes_start = 0
+    clock = time.perf_counter
+
+    for n in range(warmup + frames):
+        if n == warmup:
+            bytes_start = _traffic(lcd)
+        t = dict.fromkeys(STAGES, 0.0)
+
+        start = clock()
+        image, dirty = frame_func(n)
+        t['draw'] = clock() - start
+
+        start = clock()
+        regions = lcd.merge_regions(dirty, max_regions=max_regions)
+        t['merge'] = clock() - start
+
+        for region in regions:
+            region = lcd.framebuffer.clip(region)
+            if region is None:
+                continue
+            x0, y0, x1, y1 = region
+
+            start = clock()
+            pixels = converter.rgb_to_rgb565(np.asarray(image.crop(region)))
+            if lcd.color_depth == 12:
+                pixels = converter.rgb565_to_rgb444(pixels)
+            pixel_bytes = memoryview(pixels).cast('B')
+            t['convert'] += clock() - start
+
+            start = clock()
+            lcd.set_window(x0, y0, x1 - 1, y1 - 1)
+            t['window'] += clock() - start
+
+            start = clock()
+            lcd.write_pixels(pixel_bytes)
+            t['transfer'] += clock() - start
+
+            if n >= warmup:
+                regions_sent += 1
+                pixels_sent += (x1 - x0) * (y1 - y0)
+
+        if n >= warmup:
+            for stage in STAGES:
+                times[stage].append(t[stage])
+            totals.append(sum(t.values()))
+
+    result = {
+        'frames': frames,
+        'stages': {stage: _summarize(times[stage]) for stage in STAGES},
+        'total': _summarize(totals),
+        'fps': round(frames / sum(totals), 2) if sum(totals) > 0 else 0.0,
+        'regions_per_frame': round(regions_sent / frames, 2),
+        'pixels_per_frame': round(pixels_sent / frames, 1),
+    }
+    bytes_end = _traffic(lcd)
+    if bytes_end >= 0:
+        per_frame = (bytes_end - bytes_start) / frames
+        result['bytes_per_frame'] = round(per_frame, 1)
+        # Frame rate if the SPI clock were the only limit
+        result['bus_fps'] = round(lcd.speed_hz / 8 / per_frame, 2) \
+            if per_frame else 0.0
+    return result
+
+
+def _environment(lcd: ST7789V, spi_hz: int) -> dict:
+    """Describes the board and software the benchmark ran on."""
+    try:
+        from importlib.metadata import version
+        pi0disp_version = version('pi0disp')
+    except Exception:
+        pi0disp_version = 'unknown'
+    try:
+        with open('/proc/device-tree/model') as f:
+            board = f.read().strip('\x00\n')
+    except OSError:
+        board = platform.machine()
+    return {
+        'pi0disp': pi0disp_version,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pillow': Image.__version__,
+        'board': board,
+        'transport': lcd.transport.name,
+        'spi_hz': spi_hz,
+        'color_depth': lcd.color_depth,
+        'screen': [lcd.width, lcd.height],
+        'rgb565_engine': lcd._optimizers['color_converter'].engine,
+        'conversion_workers': lcd._optimizers['color_converter'].workers,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+@click.command()
+@click.option('--transport', '-t', default='memory', type=click.Choice(list(TRANSPORTS)), help='SPI backend (memory/emulator need no hardware).', show_default=True)
+@click.option('--spi-mhz', '-z', default=32.0, type=float, help='SPI speed in MHz.', show_default=True)
+@click.option('--workload', '-w', 'workloads', multiple=True, type=click.Choice(WORKLOADS), help='Workload to run (repeatable). Default: all.')
+@click.option('--frames', '-n', default=100, type=int, help='Measured frames per workload.', show_default=True)
+@click.option('--warmup', default=10, type=int, help='Unmeasured frames before each workload.', show_default=True)
+@click.option('--sprites', default=40, type=int, help='Sprites in the small-regions workload.', show_default=True)
+@click.option('--max-regions', default=8, type=int, help='Maximum regions after merging.', show_default=True)
+@click.option('--engine', '-e', default='auto', type=click.Choice(('auto',) + ColorConverter.ENGINES), help='RGB565 conversion engine.', show_default=True)
+@click.option('--workers', default=1, type=int, help='RGB565 conversion threads (0: one per core).', show_default=True)
+@click.option('--color-depth', '-d', default=16, type=click.Choice(['16', '12']), help='Bits per pixel on the SPI bus.', show_default=True)
+@click.option('--seed', default=1, type=int, help='Random seed for reproducible workloads.', show_default=True)
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None, help='Write the JSON result to a file instead of stdout.')
+def bench(transport, spi_mhz, workloads, frames, warmup, sprites, max_regions, engine, workers, color_depth, seed, output):
+    """Times each display pipeline stage and prints the results as JSON.
+
+    Stages: PIL drawing, RGB565 conversion, region merging, window setup
+    and pixel transfer, for the full-frame, small-regions and text-overlay
+    workloads.
+    """
+    spi_hz = int(spi_mhz * 1_000_000)
+    workloads = workloads or WORKLOADS
+
+    try:
+        with ST7789V(speed_hz=spi_hz, transport=transport, conversion_workers=workers,
+                     color_depth=int(color_depth)) as lcd:
+            if engine != 'auto':
+                if engine not in ColorConverter.available_engines():
+                    raise RuntimeError(f"RGB565 engine '{engine}' is not available here.")
+                lcd._optimizers['color_converter'].close()
+                lcd._optimizers['color_converter'] = ColorConverter(engine, workers=workers)
+            result = {'environment': _environment(lcd, spi_hz), 'workloads': {}}
+            for name in workloads:
+                rng = random.Random(seed)
+                if name == 'full-frame':
+                    frame_func = _full_frame(lcd.width, lcd.height, rng)
+                elif name == 'small-regions':
+                    frame_func = _small_regions(lcd.width, lcd.height, rng, sprites)
+                else:
+                    frame_func = _text_overlay(lcd.width, lcd.height)
+                print(f"Running {name}...", file=sys.stderr)
+                result['workloads'][name] = run_workload(
+                    lcd, frame_func, frames, warmup, max_regions
+                )
+            result['environment']['chunk_size'] = lcd.chunk_size
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        exit(1)
+
+    text = json.dumps(result, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Wrote {output}", file=sys.stderr)
+    else:
+        print(text)
@@ -0,0 +1,48 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Delta animation encoder command."""
+import json
+import time
+
+import click
+
+from ..utils.delta_anim import DELTA_FILE_EXT, DeltaAnimation, encode_delta_animation
+from .precompile import parse_size
+
+
+@click.command()
+@click.argument('source', type=click.Path(exists=True, readable=True))
+@click.argument('output', type=click.Path(dir_okay=False), required=False)
+@click.option('--size', '-s', default='320x240', callback=parse_size, help='Frame size WIDTHxHEIGHT (the screen size after rotation).', show_default=True)
+@click.option('--fit', 'fit_mode', default='contain', type=click.Choice(['contain', 'cover']), help='How frames are fitted to the size.', show_default=True)
+@click.option('--default-fps', type=float, default=30.0, help='Frame rate for image directories and frames without a duration.', show_default=True)
+@click.option('--key-interval', type=int, default=0, help='Full keyframe every N frames for random access (0: first frame only).', show_default=True)
+@click.option('--tile', type=int, default=8, help='Tile size of the frame comparison in pixels.', show_default=True)
+@click.option('--info', is_flag=True, help=f'Print the statistics of an existing {DELTA_FILE_EXT} file instead.')
+def encode(source, output, size, fit_mode, default_fps, key_interval, tile, info):
+    """Encodes an animation as delta-compressed RGB565 frames.
+
+    SOURCE: a GIF/APNG file or a directory of images (file name order).
+    OUTPUT defaults to SOURCE with the .delta extension. Each frame stores
+    only its changed rectangles; play the result with `pi0disp play`.
+    Prints the compression ratio and bytes per frame as JSON.
+    """
+    if info:
+        with DeltaAnimation(source) as anim:
+            print(json.dumps(anim.get_stats(), indent=2))
+        return
+
+    width, height = size
+    output = output or source.rstrip('/').rsplit('.', 1)[0] + DELTA_FILE_EXT
+    start = time.perf_counter()
+    try:
+        stats = encode_delta_animation(
+            source, output, width, height, fit_mode, default_fps, key_interval, tile
+        )
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        exit(1)
+    stats['encode_s'] = round(time.perf_counter() - start, 2)
+    print(f"Wrote {output}")
+    print(json.dumps(stats, indent=2))
@@ -6,15 +6,27 @@ import time
 import click
 from PIL import Image
 
+from ..disp.emulator import save_snapshot
 from ..disp.st7789v import ST7789V
-from ..utils.image_processor import ImageProcessor
+from ..disp.transport import TRANSPORTS
+from ..utils.image_cache import ImageCache
+from ..utils.image_processor import QUALITY_PRESETS, ImageProcessor
 
 @click.command()
 @click.argument('image_path', type=click.Path(exists=True, dir_okay=False, readable=True))
 @click.option('--duration', '-d', type=float, default=3.0, help='Duration to display each image in seconds.')
-def image(image_path, duration):
+@click.option('--transport', '-t', default='pigpio', type=click.Choice(list(TRANSPORTS)), help='SPI backend.', show_default=True)
+@click.option('--quality', '-q', default='best', type=click.Choice(list(QUALITY_PRESETS)), help='Resize quality preset (faster presets decode JPEGs at reduced scale).', show_default=True)
+@click.option('--cache/--no-cache', default=True, help='Use the pre-converted RGB565 image cache.', show_default=True)
+@click.option('--brightness', '-b', type=click.FloatRange(0.0, 1.0), default=1.0, help='Backlight brightness (PWM duty cycle, 0.0-1.0).', show_default=True)
+@click.option('--fade', type=float, default=0.5, help='Backlight fade-in/out time in seconds.', show_default=True)
+@click.option('--snapshot', type=click.Path(dir_okay=False), default=None, help='Save the emulated screen to this file at the end (emulator transport).')
+def image(image_path, duration, transport, quality, cache, brightness, fade, snapshot):
     """Displays an image with optional gamma correction.
 
+    Fade-in, fade-out and dimming use backlight PWM, so they send no pixel
+    data.
+
     IMAGE_PATH: Path to the image file to display.
     """
     try:
@@ -27,24 +39,50 @@ def image(image_path, duration):
         exit(1)
 
     processor = ImageProcessor()
+    image_cache = ImageCache() if cache else None
 
     try:
-        with ST7789V() as lcd:
+        with ST7789V(transport=transport) as lcd:
             print("Displaying original image resized to screen (contain mode)...")
+            lcd.set_brightness(0)
+
+            if image_cache is None:
+                # Resize while maintaining aspect ratio
+                resized_image = processor.resize_with_aspect_ratio(
+                    source_image, lcd.width, lcd.height, fit_mode="contain",
+                    quality=quality
+                )
+
+            def show(gamma):
+                if image_cache is not None:
+                    # Converted once, then memory-mapped and sent as-is
+                    lcd.display_rgb565(image_cache.get(
+                        image_path, lcd.width, lcd.height, "contain", gamma,
+                        quality
+                    ))
+                elif gamma == 1.0:
+                    lcd.display(resized_image)
+                else:
+                    lcd.display(processor.apply_gamma(resized_image, gamma=gamma))
 
-            # Resize while maintaining aspect ratio
-            resized_image = processor.resize_with_aspect_ratio(
-                source_image, lcd.width, lcd.height, fit_mode="contain"
-            )
-            lcd.display(resized_image)
+            show(1.0)
+            lcd.fade_to(brightness, fade)
             time.sleep(duration)
 
+            print(f"Dimming backlight to {brightness * 0.3:.0%}")
+            lcd.fade_to(brightness * 0.3, fade)
+            time.sleep(duration)
+            lcd.fade_to(brightness, fade)
+
             for gamma in (1.0, 1.5, 1.0, 0.5, 1.0):
                 print(f"Applying gamma={gamma}")
-                corrected_image = processor.apply_gamma(resized_image, gamma=gamma)
-                lcd.display(corrected_image)
+                show(gamma)
                 time.sleep(duration)
 
+            if snapshot:
+                save_snapshot(lcd.transport, snapshot)
+            lcd.fade_to(0, fade)
+
     except RuntimeError as e:
         print(f"Error: {e}. Make sure pigpio daemon is running and SPI is enabled.")
         exit(1)
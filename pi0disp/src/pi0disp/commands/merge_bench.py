@@ -0,0 +1,85 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Dirty-region merge benchmark command (no display required)."""
+import random
+import time
+
+import click
+
+from ..utils.performance_core import RegionMerger, RegionOptimizer
+
+
+def _sprite_regions(count: int, size: int, width: int, height: int, seed: int):
+    """Returns `count` random sprite bounding boxes (old + new position)."""
+    rng = random.Random(seed)
+    regions = []
+    for _ in range(count):
+        x = rng.randint(0, width - size)
+        y = rng.randint(0, height - size)
+        dx, dy = rng.randint(-3, 3), rng.randint(-3, 3)
+        regions.append((
+            max(0, min(x, x + dx)), max(0, min(y, y + dy)),
+            min(width, max(x, x + dx) + size), min(height, max(y, y + dy) + size),
+        ))
+    return regions
+
+
+def _time_ms(func, repeat: int) -> float:
+    """Returns the best run time of `func` in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+@click.command(name='merge-bench')
+@click.option('--counts', '-n', default='25,50,100,200,400', help='Comma-separated sprite counts.', show_default=True)
+@click.option('--size', '-s', type=int, default=16, help='Sprite size in pixels.', show_default=True)
+@click.option('--max-regions', type=int, default=8, help='Maximum regions after merging.', show_default=True)
+@click.option('--fps', type=float, default=30.0, help='Frame rate that defines the frame budget.', show_default=True)
+@click.option('--spi-mhz', type=float, default=32.0, help='SPI clock used by the cost model.', show_default=True)
+@click.option('--overhead-us', type=float, default=600.0, help='Per-window command overhead in microseconds.', show_default=True)
+@click.option('--repeat', type=int, default=5, help='Timing repetitions per case.', show_default=True)
+def merge_bench(counts, size, max_regions, fps, spi_mhz, overhead_us, repeat):
+    """Compares the region mergers on random sprite workloads.
+
+    For each sprite count, prints the merge time, the estimated SPI
+    transfer time of the result and their total (all in ms) for the legacy
+    pixel-distance merger and the cost-model merger, and whether the
+    cost-model merge fits in the frame budget.
+    """
+    width, height = 320, 240
+    budget_ms = 1000.0 / fps
+    merger = RegionMerger(
+        window_overhead_us=overhead_us,
+        bytes_per_sec=spi_mhz * 1e6 / 8,
+    )
+
+    print(f"Frame budget: {budget_ms:.1f} ms ({fps:g} fps), "
+          f"{width}x{height}, sprite {size}px, max {max_regions} regions")
+    print(f"{'sprites':>7} | {'legacy':>7} {'regions':>7} {'xfer':>7} {'total':>7} "
+          f"| {'cost':>7} {'regions':>7} {'xfer':>7} {'total':>7} | merge fits")
+
+    for count in (int(c) for c in counts.split(',') if c.strip()):
+        regions = _sprite_regions(count, size, width, height, seed=count)
+
+        legacy = RegionOptimizer.merge_regions(regions, max_regions=max_regions)
+        legacy_ms = _time_ms(
+            lambda: RegionOptimizer.merge_regions(regions, max_regions=max_regions),
+            repeat
+        )
+        merged = merger.merge(regions, max_regions=max_regions)
+        merged_ms = _time_ms(
+            lambda: merger.merge(regions, max_regions=max_regions), repeat
+        )
+
+        legacy_xfer = merger.cost(legacy) / 1000
+        merged_xfer = merger.cost(merged) / 1000
+        print(f"{count:>7} | {legacy_ms:>7.2f} {len(legacy):>7} "
+              f"{legacy_xfer:>7.2f} {legacy_ms + legacy_xfer:>7.2f} "
+              f"| {merged_ms:>7.2f} {len(merged):>7} "
+              f"{merged_xfer:>7.2f} {merged_ms + merged_xfer:>7.2f} "
+              f"| {'yes' if merged_ms <= budget_ms else 'no'}")
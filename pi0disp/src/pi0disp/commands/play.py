@@ -0,0 +1,90 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Animation playback command."""
+import os
+import time
+
+import click
+
+from ..disp.emulator import save_snapshot
+from ..disp.frame_player import DeltaPlayer, FramePlayer
+from ..disp.st7789v import ST7789V
+from ..disp.transport import TRANSPORTS
+from ..utils.delta_anim import DELTA_FILE_EXT, DeltaAnimation
+from ..utils.frame_file import FRAME_FILE_EXT, FrameFile, cached_frame_file, convert_to_frame_file
+from ..utils.frame_scheduler import POLICIES
+
+
+@click.command()
+@click.argument('source', type=click.Path(exists=True, readable=True))
+@click.option('--fps', type=float, default=None, help='Fixed frame rate. Default: the clip\'s own frame durations.')
+@click.option('--default-fps', type=float, default=30.0, help='Frame rate for image directories and frames without a duration.', show_default=True)
+@click.option('--loops', '-l', type=int, default=1, help='Times to play the clip (0: until Ctrl+C).', show_default=True)
+@click.option('--fit', 'fit_mode', default='contain', type=click.Choice(['contain', 'cover']), help='How frames are fitted to the screen.', show_default=True)
+@click.option('--frame-policy', default='drop', type=click.Choice(POLICIES), help='Late frames: drop (skip frames, keep real time) or slow (play every frame).', show_default=True)
+@click.option('--prefetch', type=int, default=8, help='Frames paged in ahead of playback.', show_default=True)
+@click.option('--save', 'save_path', type=click.Path(dir_okay=False), default=None, help=f'Write the converted frame file ({FRAME_FILE_EXT}) here instead of the cache.')
+@click.option('--transport', '-t', default='pigpio', type=click.Choice(list(TRANSPORTS)), help='SPI backend.', show_default=True)
+@click.option('--snapshot', type=click.Path(dir_okay=False), default=None, help='Save the emulated screen to this file at the end (emulator transport).')
+def play(source, fps, default_fps, loops, fit_mode, frame_policy, prefetch, save_path, transport, snapshot):
+    """Plays an animation from pre-converted, memory-mapped frames.
+
+    SOURCE: a GIF/APNG file, a directory of images (file name order), a
+    frame file or a delta animation (`pi0disp encode`). Other sources are
+    converted once into a frame file in the cache; playback then streams
+    it with bounded memory.
+    """
+    try:
+        with ST7789V(transport=transport) as lcd:
+            if source.endswith(DELTA_FILE_EXT) and os.path.isfile(source):
+                with DeltaAnimation(source) as anim:
+                    print(f"Playing {len(anim)} frames ({anim.duration:.2f}s per loop). Press Ctrl+C to stop.")
+                    player = DeltaPlayer(lcd, anim, fps=fps, policy=frame_policy)
+                    try:
+                        player.play(loops=loops)
+                    except KeyboardInterrupt:
+                        pass
+                    stats = player.get_stats()
+                    print(f"Shown: {stats['shown']}, skipped: {stats['skipped']}, "
+                          f"FPS: {stats['fps']:.1f}, missed: {stats['missed']}, "
+                          f"max late: {stats['max_late_ms']:.1f} ms, "
+                          f"{stats['pixel_bytes_per_frame']:.0f} pixel bytes/frame")
+                if snapshot:
+                    save_snapshot(lcd.transport, snapshot)
+                return
+
+            if source.endswith(FRAME_FILE_EXT) and os.path.isfile(source):
+                path = source
+            else:
+                print(f"Preparing {source} for {lcd.width}x{lcd.height}...")
+                start = time.perf_counter()
+                if save_path:
+                    convert_to_frame_file(source, save_path, lcd.width, lcd.height, fit_mode, default_fps)
+                    path = save_path
+                else:
+                    path = cached_frame_file(source, lcd.width, lcd.height, fit_mode, default_fps)
+                print(f"Ready in {time.perf_counter() - start:.2f}s: {path}")
+
+            with FrameFile(path) as clip:
+                print(f"Playing {len(clip)} frames ({clip.duration:.2f}s per loop). Press Ctrl+C to stop.")
+                player = FramePlayer(lcd, clip, fps=fps, policy=frame_policy, prefetch=prefetch)
+                try:
+                    player.play(loops=loops)
+                except KeyboardInterrupt:
+                    lcd.stop_pipeline(drain=False)
+                stats = player.get_stats()
+                print(f"Shown: {stats['shown']}, skipped: {stats['skipped']}, "
+                      f"FPS: {stats['fps']:.1f}, missed: {stats['missed']}, "
+                      f"max late: {stats['max_late_ms']:.1f} ms, "
+                      f"prefetched: {stats['prefetched']}/{stats['shown']}")
+
+            if snapshot:
+                save_snapshot(lcd.transport, snapshot)
+
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        exit(1)
+    except RuntimeError as e:
+        print(f"Error: {e}. Make sure pigpio daemon is running and SPI is enabled.")
+        exit(1)
@@ -0,0 +1,56 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Image cache warm-up command."""
+import os
+import sys
+import time
+
+import click
+
+from ..utils.frame_file import clear_clip_cache
+from ..utils.image_cache import ImageCache, find_images
+from ..utils.image_processor import QUALITY_PRESETS
+
+
+def parse_size(ctx, param, value):
+    """Parses WIDTHxHEIGHT."""
+    try:
+        width, height = (int(v) for v in value.lower().split('x'))
+    except ValueError:
+        raise click.BadParameter("expected WIDTHxHEIGHT, e.g. 320x240")
+    if width <= 0 or height <= 0:
+        raise click.BadParameter("width and height must be positive")
+    return width, height
+
+
+@click.command()
+@click.argument('directory', type=click.Path(exists=True, file_okay=False, readable=True))
+@click.option('--size', '-s', default='320x240', callback=parse_size, help='Target size WIDTHxHEIGHT (the screen size after rotation).', show_default=True)
+@click.option('--fit', 'fit_mode', default='contain', type=click.Choice(['contain', 'cover']), help='How images are fitted to the size.', show_default=True)
+@click.option('--gamma', '-g', 'gammas', multiple=True, type=float, help='Gamma value to prepare (repeatable). Default: 1.0.')
+@click.option('--quality', '-q', default='best', type=click.Choice(list(QUALITY_PRESETS)), help='Resize quality preset (faster presets decode JPEGs at reduced scale).', show_default=True)
+@click.option('--recursive/--no-recursive', default=True, help='Include subdirectories.', show_default=True)
+@click.option('--clear', is_flag=True, help='Delete all cached images and clips before converting.')
+def precompile(directory, size, fit_mode, gammas, quality, recursive, clear):
+    """Converts the images in DIRECTORY into the RGB565 image cache.
+
+    Cached images are memory-mapped and sent to the panel without
+    decoding, resizing or color conversion (`pi0disp image`,
+    `ImageCache`).
+    """
+    width, height = size
+    cache = ImageCache()
+    if clear:
+        print(f"Removed {cache.clear()} cached images and {clear_clip_cache()} cached clips")
+
+    paths = list(find_images(directory, recursive))
+    start = time.perf_counter()
+    failed = cache.precompile(paths, width, height, fit_mode, gammas or (1.0,), quality)
+    elapsed = time.perf_counter() - start
+
+    for path in failed:
+        print(f"Skipped {path}: not a readable image", file=sys.stderr)
+    print(f"{len(paths) - len(failed)} images ready at {width}x{height} "
+          f"({cache.stats['misses']} converted, {cache.stats['hits']} already cached) "
+          f"in {elapsed:.2f}s -> {os.path.abspath(cache.cache_dir)}")
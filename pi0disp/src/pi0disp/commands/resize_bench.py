@@ -0,0 +1,53 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""Image decode/resize benchmark command (no display required)."""
+import os
+import time
+
+import click
+import numpy as np
+from PIL import Image
+
+from ..utils.image_processor import QUALITY_PRESETS, ImageProcessor
+from .precompile import parse_size
+
+
+def _psnr(a: np.ndarray, b: np.ndarray) -> float:
+    """Peak signal-to-noise ratio in dB (inf if identical)."""
+    mse = np.mean((a.astype(np.float64) - b) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+@click.command(name='resize-bench')
+@click.argument('images', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False, readable=True))
+@click.option('--size', '-s', default='320x240', callback=parse_size, help='Target size WIDTHxHEIGHT.', show_default=True)
+@click.option('--fit', 'fit_mode', default='contain', type=click.Choice(['contain', 'cover']), help='How images are fitted to the size.', show_default=True)
+@click.option('--repeat', type=int, default=5, help='Timing repetitions per preset.', show_default=True)
+def resize_bench(images, size, fit_mode, repeat):
+    """Compares the resize quality presets on IMAGES.
+
+    Each run opens, decodes and resizes the file. Prints the best time,
+    the speedup over "best" and the PSNR against the "best" output.
+    """
+    width, height = size
+    processor = ImageProcessor()
+
+    for path in images:
+        with Image.open(path) as img:
+            print(f"{os.path.basename(path)}: {img.width}x{img.height} {img.format} -> {width}x{height} ({fit_mode})")
+        print(f"  {'preset':<9} {'ms':>8} {'speedup':>8} {'PSNR dB':>8}")
+        reference = None
+        base_ms = None
+        for quality in QUALITY_PRESETS:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                with Image.open(path) as img:
+                    result = processor.resize_with_aspect_ratio(img, width, height, fit_mode, quality)
+                best = min(best, time.perf_counter() - start)
+            pixels = np.asarray(result.convert("RGB"))
+            if reference is None:
+                reference, base_ms = pixels, best * 1000
+            print(f"  {quality:<9} {best * 1000:>8.1f} {base_ms / (best * 1000):>7.1f}x "
+                  f"{_psnr(pixels, reference):>8.1f}")
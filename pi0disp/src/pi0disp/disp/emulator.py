@@ -0,0 +1,327 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Headless ST7789V emulator.
+
+`ST7789VEmulator` interprets the byte stream the driver sends (commands on
+D/C low, parameters and pixel data on D/C high) and keeps a virtual GRAM,
+so the display path can be run, inspected and benchmarked on any machine.
+`transport.EmulatorTransport` plugs it into `ST7789V` as the "emulator"
+transport.
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Commands understood by the emulator
+CMD_SWRESET = 0x01
+CMD_SLPIN = 0x10
+CMD_SLPOUT = 0x11
+CMD_NORON = 0x13
+CMD_INVOFF = 0x20
+CMD_INVON = 0x21
+CMD_DISPOFF = 0x28
+CMD_DISPON = 0x29
+CMD_CASET = 0x2A
+CMD_RASET = 0x2B
+CMD_RAMWR = 0x2C
+CMD_VSCRDEF = 0x33
+CMD_TEOFF = 0x34
+CMD_TEON = 0x35
+CMD_MADCTL = 0x36
+CMD_VSCSAD = 0x37
+CMD_COLMOD = 0x3A
+CMD_RAMWRC = 0x3C
+
+# Parameter bytes collected before a command takes effect
+PARAM_COUNTS = {
+    CMD_CASET: 4, CMD_RASET: 4, CMD_VSCRDEF: 6, CMD_MADCTL: 1,
+    CMD_VSCSAD: 2, CMD_COLMOD: 1, CMD_TEON: 1,
+}
+
+# MADCTL bits
+MADCTL_MY = 0x80
+MADCTL_MX = 0x40
+MADCTL_MV = 0x20
+
+
+class ST7789VEmulator:
+    """
+    A virtual ST7789V: GRAM, address window, MADCTL mapping, pixel
+    formats (12, 16 and 18 bits per pixel) and vertical scrolling.
+
+    The GRAM is kept as an RGB888 array in the panel's native orientation
+    (`height` rows of `width` pixels). Memory writes follow the datasheet:
+    the MCU address runs through the CASET/RASET window, MV exchanges
+    columns and rows, then MX/MY mirror the physical column/row, and the
+    pointer wraps to the window start after its last pixel.
+    """
+    def __init__(self, width: int = 240, height: int = 320):
+        """
+        Args:
+            width: Native panel width (GRAM columns).
+            height: Native panel height (GRAM rows).
+        """
+        self.width = width
+        self.height = height
+        self.gram = np.zeros((height, width, 3), dtype=np.uint8)
+        self.counters: Counter = Counter()
+        self.command_counts: Counter = Counter()
+        self.frames: List[Dict[str, int]] = []
+        self._mark: Counter = Counter()
+        self.reset()
+
+    def reset(self):
+        """Hardware/software reset: registers to defaults, GRAM kept."""
+        self.madctl = 0
+        self.colmod = 0x66  # 18 bits per pixel after reset
+        self.sleeping = True
+        self.display_on = False
+        self.inverted = False
+        self.window = (0, 0, self.width - 1, self.height - 1)
+        self.scroll = (0, self.height, 0)  # TFA, VSA, BFA
+        self.scroll_start = 0
+        self.scrolling = False
+        self.te_mode: Optional[int] = None  # TEON mode, None: TE line off
+        self._command: Optional[int] = None
+        self._params = bytearray()
+        self._pending = b''  # partial pixel bytes
+        self._pointer = 0
+
+    # --- Byte stream ---
+
+    def feed(self, dc: int, data: bytes):
+        """
+        Processes one SPI transfer.
+
+        Args:
+            dc: Level of the D/C pin (0: command, 1: parameters/data).
+            data: The transferred bytes.
+        """
+        self.counters['bytes'] += len(data)
+        if dc == 0:
+            for cmd in data:
+                self._begin_command(cmd)
+            return
+
+        self.counters['data_bytes'] += len(data)
+        cmd = self._command
+        if cmd in (CMD_RAMWR, CMD_RAMWRC):
+            self.counters['pixel_bytes'] += len(data)
+            self._write_pixel_bytes(bytes(data))
+        elif cmd in PARAM_COUNTS:
+            self._params += data
+            if len(self._params) >= PARAM_COUNTS[cmd]:
+                self._apply_params(cmd, bytes(self._params))
+                self._command = None
+
+    def _begin_command(self, cmd: int):
+        self.counters['commands'] += 1
+        self.command_counts[cmd] += 1
+        self._command = cmd
+        self._params = bytearray()
+
+        if cmd == CMD_RAMWR:
+            self._pointer = 0
+            self._pending = b''
+            self.counters['windows'] += 1
+        elif cmd == CMD_RAMWRC:
+            self._pending = b''
+        elif cmd == CMD_SWRESET:
+            self.reset()
+        elif cmd == CMD_SLPIN:
+            self.sleeping = True
+        elif cmd == CMD_SLPOUT:
+            self.sleeping = False
+        elif cmd == CMD_NORON:
+            self.scrolling = False
+        elif cmd == CMD_INVON:
+            self.inverted = True
+        elif cmd == CMD_INVOFF:
+            self.inverted = False
+        elif cmd == CMD_DISPON:
+            self.display_on = True
+        elif cmd == CMD_DISPOFF:
+            self.display_on = False
+        elif cmd == CMD_TEOFF:
+            self.te_mode = None
+
+    def _apply_params(self, cmd: int, p: bytes):
+        if cmd == CMD_CASET:
+            x0, y0, x1, y1 = self.window
+            self.window = ((p[0] << 8) | p[1], y0, (p[2] << 8) | p[3], y1)
+        elif cmd == CMD_RASET:
+            x0, y0, x1, y1 = self.window
+            self.window = (x0, (p[0] << 8) | p[1], x1, (p[2] << 8) | p[3])
+        elif cmd == CMD_MADCTL:
+            self.madctl = p[0]
+        elif cmd == CMD_COLMOD:
+            self.colmod = p[0]
+        elif cmd == CMD_VSCRDEF:
+            self.scroll = (
+                (p[0] << 8) | p[1], (p[2] << 8) | p[3], (p[4] << 8) | p[5]
+            )
+        elif cmd == CMD_VSCSAD:
+            self.scroll_start = (p[0] << 8) | p[1]
+            self.scrolling = True
+        elif cmd == CMD_TEON:
+            self.te_mode = p[0] & 0x01
+
+    # --- Pixel data ---
+
+    @property
+    def bits_per_pixel(self) -> int:
+        """Interface pixel format selected by COLMOD."""
+        return {0x3: 12, 0x5: 16, 0x6: 18}.get(self.colmod & 0x7, 18)
+
+    def _write_pixel_bytes(self, data: bytes):
+        data = self._pending + data
+        bpp = self.bits_per_pixel
+        unit = {12: 3, 16: 2, 18: 3}[bpp]  # bytes per decoding unit
+        usable = len(data) - len(data) % unit
+        self._pending = data[usable:]
+        if usable == 0:
+            return
+        raw = np.frombuffer(data, dtype=np.uint8, count=usable)
+
+        if bpp == 16:
+            v = raw.reshape(-1, 2)
+            v = (v[:, 0].astype(np.uint16) << 8) | v[:, 1]
+            r = (v >> 11) & 0x1F
+            g = (v >> 5) & 0x3F
+            b = v & 0x1F
+            rgb = np.stack(
+                ((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)),
+                axis=1
+            ).astype(np.uint8)
+        elif bpp == 12:
+            t = raw.reshape(-1, 3)
+            nib = np.empty((t.shape[0], 6), dtype=np.uint8)
+            nib[:, 0::2] = t >> 4
+            nib[:, 1::2] = t & 0x0F
+            rgb = (nib.reshape(-1, 3) * 17).astype(np.uint8)
+        else:
+            c = raw.reshape(-1, 3) & 0xFC
+            rgb = (c | (c >> 6)).astype(np.uint8)
+
+        self._store(rgb)
+        self.counters['pixels'] += len(rgb)
+
+    def _store(self, rgb: np.ndarray):
+        """Writes pixels at the memory pointer through the MADCTL mapping."""
+        x0, y0, x1, y1 = self.window
+        ww, wh = x1 - x0 + 1, y1 - y0 + 1
+        if ww <= 0 or wh <= 0:
+            return
+        total = ww * wh
+        idx = (self._pointer + np.arange(len(rgb))) % total
+        self._pointer = (self._pointer + len(rgb)) % total
+
+        px, py = self._physical(x0 + idx % ww, y0 + idx // ww)
+        ok = (px >= 0) & (px < self.width) & (py >= 0) & (py < self.height)
+        if len(rgb) > total:
+            # Only the last write to each address survives
+            ok &= np.arange(len(rgb)) >= len(rgb) - total
+        self.gram[py[ok], px[ok]] = rgb[ok]
+
+    def _physical(
+            self, x: np.ndarray, y: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Maps MCU addresses to physical GRAM column/row."""
+        if self.madctl & MADCTL_MV:
+            x, y = y, x
+        if self.madctl & MADCTL_MX:
+            x = self.width - 1 - x
+        if self.madctl & MADCTL_MY:
+            y = self.height - 1 - y
+        return x, y
+
+    # --- Output ---
+
+    @property
+    def screen_size(self) -> Tuple[int, int]:
+        """(width, height) of the logical screen for the current MADCTL."""
+        if self.madctl & MADCTL_MV:
+            return self.height, self.width
+        return self.width, self.height
+
+    def panel_array(self) -> np.ndarray:
+        """
+        Returns what the panel shows, in native orientation, with the
+        vertical scroll applied (rows x columns x RGB).
+        """
+        rows = np.arange(self.height)
+        if self.scrolling:
+            tfa, vsa, _ = self.scroll
+            if vsa > 0:
+                p = np.arange(tfa, min(self.height, tfa + vsa))
+                rows[p] = tfa + (p - tfa + self.scroll_start - tfa) % vsa
+        return self.gram[rows]
+
+    def render(self, logical: bool = True) -> Image.Image:
+        """
+        Renders the panel contents as an RGB image.
+
+        Args:
+            logical: If True, the image is in the driver's screen
+                     orientation (undoing MADCTL), so it can be compared
+                     with the images passed to `ST7789V`. Otherwise it is
+                     the panel in its native orientation.
+        """
+        shown = self.panel_array()
+        if not logical:
+            return Image.fromarray(shown, "RGB")
+        w, h = self.screen_size
+        ys, xs = np.mgrid[0:h, 0:w]
+        px, py = self._physical(xs, ys)
+        return Image.fromarray(shown[py, px], "RGB")
+
+    # --- Statistics ---
+
+    def mark_frame(self) -> Dict[str, int]:
+        """
+        Closes the current frame and returns its counters.
+
+        Keys: bytes, data_bytes, pixel_bytes, pixels, commands, windows
+        (RAMWR count) since the previous call. Frames are also appended to
+        `frames`.
+        """
+        frame = {
+            k: self.counters[k] - self._mark[k]
+            for k in ('bytes', 'data_bytes', 'pixel_bytes', 'pixels',
+                      'commands', 'windows')
+        }
+        self._mark = Counter(self.counters)
+        self.frames.append(frame)
+        return frame
+
+    def reset_counters(self):
+        """Clears all counters and the frame history."""
+        self.counters.clear()
+        self.command_counts.clear()
+        self._mark = Counter()
+        self.frames.clear()
+
+
+
+def save_snapshot(transport, path: str) -> bool:
+    """
+    Saves the emulated screen of an emulator transport as an image file
+    and prints the traffic counters.
+
+    Returns:
+        False (and saves nothing) if `transport` is not an emulator.
+    """
+    device = getattr(transport, 'device', None)
+    if not isinstance(device, ST7789VEmulator):
+        print("--snapshot requires the emulator transport; not saved.")
+        return False
+    device.render().save(path)
+    counters = device.counters
+    print(f"Saved emulated screen to {path} "
+          f"({counters['bytes']} bytes, {counters['commands']} commands, "
+          f"{counters['windows']} windows sent)")
+    return True
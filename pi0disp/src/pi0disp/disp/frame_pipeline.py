@@ -0,0 +1,335 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Asynchronous double-buffered frame pipeline for the ST7789V driver.
+
+A background writer thread performs the RGB565 conversion and SPI transfer
+of frame N while the caller renders frame N+1. Pending frames are kept in a
+bounded queue with a latest-frame-wins drop policy: when the queue is full,
+the oldest pending frame is discarded and its dirty regions are folded into
+the newer frame, so the panel always converges to the latest image and
+latency never grows beyond `max_pending` frames.
+
+Frames are PIL images or pre-converted big-endian RGB565 arrays of the
+screen size (e.g. memory-mapped clip frames), which are sent without
+conversion, or lists of RGB565 rectangles (e.g. from a `Compositor`).
+Rectangle lists carry only what changed, so a dropped one is not lost: its
+rectangles are sent before those of the newer list. A dropped full frame
+followed by a rectangle list becomes an RGB565 copy of the frame with the
+rectangles painted in.
+"""
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Deque, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from ..utils.performance_core import RegionOptimizer
+
+if TYPE_CHECKING:
+    from .st7789v import ST7789V
+
+Region = Tuple[int, int, int, int]
+# A PIL image, a '>u2' RGB565 array of shape (height, width), or a list of
+# (x0, y0, '>u2' pixels) rectangles
+Frame = Union[Image.Image, np.ndarray, List[Tuple[int, int, np.ndarray]]]
+
+
+class FramePipeline:
+    """
+    Overlaps frame rendering with SPI transfer using a writer thread.
+
+    Two ways of feeding frames are supported:
+
+    - `submit(image, regions)`: hand over a finished image. The caller must
+      not modify the image afterwards (create a new one for each frame).
+    - `back_buffer` / `flip(regions)`: draw into the pipeline-owned back
+      buffer and flip it. The returned new back buffer already contains the
+      flipped frame, so incremental drawing keeps working.
+    """
+    def __init__(
+            self,
+            lcd: 'ST7789V',
+            max_pending: int = 1,
+            max_regions: int = 8
+    ):
+        """
+        Args:
+            lcd: The display driver the frames are written to.
+            max_pending: Maximum number of frames waiting for the writer.
+            max_regions: Maximum number of regions sent per frame.
+        """
+        if max_pending < 1:
+            raise ValueError("max_pending must be 1 or greater.")
+
+        self._lcd = lcd
+        self._max_pending = max_pending
+        self._max_regions = max_regions
+
+        self._pending: Deque[Tuple[Frame, Optional[List[Region]]]] = \
+            deque()
+        self._cond = threading.Condition()
+        self._in_flight: Optional[Frame] = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+        self._buffers = [
+            Image.new("RGB", (lcd.width, lcd.height)) for _ in range(2)
+        ]
+        self._back = 0
+
+        self._stats = {'submitted': 0, 'written': 0, 'dropped': 0}
+        self._write_times: Deque[float] = deque(maxlen=60)
+
+    @property
+    def running(self) -> bool:
+        """True while the writer thread is accepting frames."""
+        return self._running
+
+    @property
+    def back_buffer(self) -> Image.Image:
+        """The image the caller should draw the next frame into."""
+        return self._buffers[self._back]
+
+    def start(self):
+        """Starts the writer thread."""
+        with self._cond:
+            if self._running:
+                return
+            self._error = None
+            self._running = True
+            self._thread = threading.Thread(
+                target=self._writer_loop, name="ST7789V-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, drain: bool = True):
+        """
+        Stops the writer thread.
+
+        Args:
+            drain: If True, pending frames are written before stopping.
+                   Otherwise they are discarded.
+        """
+        with self._cond:
+            if not self._running:
+                return
+            if not drain:
+                self._stats['dropped'] += len(self._pending)
+                self._pending.clear()
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(
+            self,
+            image: Frame,
+            regions: Optional[Sequence[Region]] = None
+    ):
+        """
+        Queues a frame for transfer and returns immediately.
+
+        Args:
+            image: A full-screen image or RGB565 array, or a list of
+                   RGB565 rectangles. It must not be modified afterwards.
+            regions: Dirty regions (x0, y0, x1, y1) to send, or None to send
+                     the whole frame. Ignored for rectangle lists.
+        """
+        region_list = list(regions) if regions is not None else None
+        with self._cond:
+            self._raise_if_failed()
+            if not self._running:
+                raise RuntimeError("Frame pipeline is not running.")
+
+            # Latest frame wins: fold dropped frames into the new one
+            while len(self._pending) >= self._max_pending:
+                old_image, old_regions = self._pending.popleft()
+                if isinstance(image, list) and isinstance(old_image, list):
+                    image = old_image + image
+                elif isinstance(image, list):
+                    # The rectangles only cover part of the older frame
+                    region_list = self._union(
+                        old_regions,
+                        [(x, y, x + px.shape[1], y + px.shape[0])
+                         for x, y, px in image]
+                    )
+                    image = self._paint_rects(old_image, image)
+                    self._stats['dropped'] += 1
+                    continue
+                region_list = self._union(old_regions, region_list)
+                self._stats['dropped'] += 1
+
+            self._pending.append((image, region_list))
+            self._stats['submitted'] += 1
+            self._cond.notify_all()
+
+    def flip(
+            self, regions: Optional[Sequence[Region]] = None
+    ) -> Image.Image:
+        """
+        Submits the back buffer and returns the new back buffer.
+
+        Blocks only while the writer is still transferring the buffer that
+        becomes the new back buffer. The new back buffer is brought up to
+        date with the flipped frame before it is returned.
+
+        Args:
+            regions: Regions changed since the previous flip, or None if the
+                     whole frame changed.
+
+        Returns:
+            The image to draw the next frame into.
+        """
+        front = self._buffers[self._back]
+        self.submit(front, regions)
+
+        back_index = 1 - self._back
+        back = self._buffers[back_index]
+        with self._cond:
+            while self._running and self._is_busy(back):
+                self._cond.wait()
+            self._raise_if_failed()
+
+        if regions is None:
+            back.paste(front)
+        else:
+            for r in regions:
+                r = RegionOptimizer.clamp_region(r, front.width, front.height)
+                if r[2] > r[0] and r[3] > r[1]:
+                    back.paste(front.crop(r), r[:2])
+
+        self._back = back_index
+        return back
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until all queued frames have been written.
+
+        Returns:
+            True if the pipeline is idle, False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight is not None:
+                if self._error is not None:
+                    break
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self._cond.wait(remaining)
+            self._raise_if_failed()
+        return True
+
+    def get_stats(self) -> dict:
+        """Returns frame counters and the average write time."""
+        with self._cond:
+            stats: dict = dict(self._stats)
+            stats['pending'] = len(self._pending)
+            times = list(self._write_times)
+        avg = sum(times) / len(times) if times else 0.0
+        stats['avg_write_ms'] = avg * 1000
+        stats['write_fps'] = 1.0 / avg if avg > 0 else 0.0
+        return stats
+
+    def _is_busy(self, image: Frame) -> bool:
+        """True if the writer still holds a reference to `image`."""
+        if self._in_flight is image:
+            return True
+        return any(img is image for img, _ in self._pending)
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise RuntimeError(
+                f"Frame pipeline writer failed: {self._error}"
+            ) from self._error
+
+    def _paint_rects(
+            self,
+            frame: Union[Image.Image, np.ndarray],
+            rects: List[Tuple[int, int, np.ndarray]]
+    ) -> np.ndarray:
+        """Returns an RGB565 copy of a full frame with `rects` drawn on it."""
+        lcd = self._lcd
+        if isinstance(frame, np.ndarray):
+            out = np.array(frame, dtype='>u2')
+        else:
+            if frame.size != (lcd.width, lcd.height):
+                frame = frame.resize((lcd.width, lcd.height))
+            out = lcd._optimizers['color_converter'].rgb_to_rgb565(
+                np.asarray(frame.convert("RGB"))
+            )
+        height, width = out.shape
+        for x, y, pixels in rects:
+            h, w = pixels.shape
+            x0, y0 = max(0, x), max(0, y)
+            x1, y1 = min(width, x + w), min(height, y + h)
+            if x1 > x0 and y1 > y0:
+                out[y0:y1, x0:x1] = pixels[y0 - y:y1 - y, x0 - x:x1 - x]
+        return out
+
+    @staticmethod
+    def _union(
+            a: Optional[List[Region]], b: Optional[List[Region]]
+    ) -> Optional[List[Region]]:
+        """Combines two region lists, where None means the full frame."""
+        if a is None or b is None:
+            return None
+        return a + b
+
+    def _writer_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._pending:
+                    break
+                image, regions = self._pending.popleft()
+                self._in_flight = image
+
+            start = time.monotonic()
+            try:
+                self._write_frame(image, regions)
+            except Exception as e:  # keep the error for the caller
+                with self._cond:
+                    self._error = e
+                    self._running = False
+                    self._pending.clear()
+                    self._in_flight = None
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                self._write_times.append(time.monotonic() - start)
+                self._stats['written'] += 1
+                self._in_flight = None
+                self._cond.notify_all()
+
+    def _write_frame(
+            self, image: Frame, regions: Optional[List[Region]]
+    ):
+        if isinstance(image, list):
+            self._lcd.display_rgb565_rects(image)
+            return
+        is_array = isinstance(image, np.ndarray)
+        if regions is None:
+            if is_array:
+                self._lcd.display_rgb565(image)
+            else:
+                self._lcd.display(image)
+            return
+
+        merged = self._lcd.merge_regions(
+            regions, max_regions=self._max_regions
+        )
+        if is_array:
+            self._lcd.display_rgb565_regions(image, merged)
+        else:
+            self._lcd.display_regions(image, merged)
@@ -0,0 +1,208 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Clip playback on the ST7789V.
+
+- `FramePlayer` plays a memory-mapped `FrameFile`. Frames are already
+  RGB565 (no decoding or conversion at play time), are paged in ahead by a
+  `FramePrefetcher` thread and are handed to the asynchronous frame
+  pipeline, so storage reads, pacing and SPI transfer overlap.
+- `DeltaPlayer` plays a `DeltaAnimation`, sending exactly the stored
+  changed rectangles of each frame.
+"""
+import threading
+from typing import TYPE_CHECKING, List, Optional, Union
+
+from ..utils.delta_anim import DeltaAnimation, Rect
+from ..utils.frame_file import FrameFile, FramePrefetcher
+from ..utils.frame_scheduler import POLICY_DROP, FrameScheduler
+
+if TYPE_CHECKING:
+    from .st7789v import ST7789V
+
+
+class _PacedPlayer:
+    """
+    Paces a clip with a `FrameScheduler`, at the clip's own frame durations
+    or at a fixed rate. Subclasses implement `_show`.
+    """
+    def __init__(
+            self,
+            lcd: 'ST7789V',
+            clip: Union[FrameFile, DeltaAnimation],
+            fps: Optional[float] = None,
+            policy: str = POLICY_DROP
+    ):
+        if (clip.width, clip.height) != (lcd.width, lcd.height):
+            raise ValueError(
+                f"Clip is {clip.width}x{clip.height}, "
+                f"screen is {lcd.width}x{lcd.height}"
+            )
+        self._lcd = lcd
+        self._clip = clip
+        self._fps = fps
+        first_ms = clip.durations_ms[0] or 1
+        self.scheduler = FrameScheduler(fps or 1000 / first_ms, policy)
+        self._stop = threading.Event()
+        self._stats = {'shown': 0, 'skipped': 0, 'loops': 0}
+
+    def stop(self):
+        """Stops playback (from another thread or a signal handler)."""
+        self._stop.set()
+
+    def play(self, loops: int = 1) -> dict:
+        """
+        Plays the clip and returns the playback statistics.
+
+        Args:
+            loops: Number of times to play the clip (0: until `stop()`).
+        """
+        self._stop.clear()
+        self._run(loops)
+        return self.get_stats()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the playback counters (shown, skipped, loops) and the
+        scheduler statistics.
+        """
+        stats: dict = dict(self._stats)
+        stats.update(self.scheduler.get_stats())
+        return stats
+
+    def _run(self, loops: int):
+        clip = self._clip
+        count = len(clip)
+        total = loops * count if loops else None
+        scheduler = self.scheduler
+        n = 0  # frames played, counting across loops
+        while not self._stop.is_set() and (total is None or n < total):
+            if self._fps is None:
+                # Deadline of the next frame = this frame's duration
+                scheduler.period = max(1, clip.durations_ms[n % count]) / 1000
+            dropped = scheduler.get_stats()['dropped']
+            scheduler.tick()
+            # Keep real time: skip the frames whose slots passed, but
+            # always show the last one
+            skip = scheduler.get_stats()['dropped'] - dropped
+            if total is not None:
+                skip = min(skip, total - 1 - n)
+            self._show(n, n + skip)
+            self._stats['skipped'] += skip
+            self._stats['shown'] += 1
+            n += skip + 1
+            self._stats['loops'] = n // count
+
+    def _show(self, first: int, last: int):
+        """Shows frame `last`; frames `first`..`last - 1` were skipped."""
+        raise NotImplementedError
+
+
+class FramePlayer(_PacedPlayer):
+    """
+    Plays a frame file through the frame pipeline.
+
+    Example::
+
+        with FrameFile(path) as clip:
+            FramePlayer(lcd, clip).play(loops=0)  # until stop()
+    """
+    def __init__(
+            self,
+            lcd: 'ST7789V',
+            frames: FrameFile,
+            fps: Optional[float] = None,
+            policy: str = POLICY_DROP,
+            prefetch: int = 8
+    ):
+        """
+        Args:
+            lcd: The display driver.
+            frames: The clip. Its size must match the screen.
+            fps: Fixed frame rate, or None to use the stored durations.
+            policy: Late-frame policy of the `FrameScheduler` ("drop"
+                    skips frames to keep real time, "slow" plays every
+                    frame).
+            prefetch: Number of frames paged in ahead of playback.
+        """
+        super().__init__(lcd, frames, fps, policy)
+        self._prefetch = prefetch
+        self._prefetcher: Optional[FramePrefetcher] = None
+        self._prefetch_stats: dict = {}
+
+    def play(self, loops: int = 1) -> dict:
+        self._stop.clear()
+        self._prefetcher = FramePrefetcher(
+            self._clip, self._prefetch, loop=loops != 1
+        )
+        with self._prefetcher:
+            try:
+                self._run(loops)
+                self._lcd.wait_pipeline()
+            finally:
+                self._prefetch_stats = self._prefetcher.get_stats()
+        return self.get_stats()
+
+    def get_stats(self) -> dict:
+        """
+        Returns the playback counters (shown, skipped, loops), the
+        scheduler statistics, the prefetch hits and the pipeline counters.
+        """
+        stats = super().get_stats()
+        stats['prefetched'] = self._prefetch_stats.get('ready', 0)
+        stats['pipeline'] = self._lcd.get_pipeline_stats()
+        return stats
+
+    def _show(self, first: int, last: int):
+        self._lcd.submit(self._prefetcher.get(last % len(self._clip)))
+
+
+class DeltaPlayer(_PacedPlayer):
+    """
+    Plays a delta animation by sending exactly its stored rectangles.
+
+    Frames skipped to keep real time are not lost: their rectangles are
+    sent together with the next frame, in order, in one batch.
+    """
+    def __init__(
+            self,
+            lcd: 'ST7789V',
+            anim: DeltaAnimation,
+            fps: Optional[float] = None,
+            policy: str = POLICY_DROP
+    ):
+        """
+        Args:
+            lcd: The display driver.
+            anim: The animation. Its size must match the screen.
+            fps: Fixed frame rate, or None to use the stored durations.
+            policy: Late-frame policy of the `FrameScheduler`.
+        """
+        super().__init__(lcd, anim, fps, policy)
+        self._bytes = 0
+
+    def get_stats(self) -> dict:
+        """
+        Returns the playback counters, the scheduler statistics and the
+        average pixel bytes sent per frame.
+        """
+        stats = super().get_stats()
+        frames = stats['shown'] + stats['skipped']
+        stats['pixel_bytes_per_frame'] = self._bytes / frames if frames else 0.0
+        return stats
+
+    def _show(self, first: int, last: int):
+        anim = self._clip
+        count = len(anim)
+        rects: List[Rect] = []
+        if last - first >= count:
+            # Skipped more than a loop: draw the target frame whole
+            rects.append((0, 0, anim.render(last % count)))
+        else:
+            for n in range(first, last + 1):
+                i = n % count
+                rects += anim.loop_rects() if i == 0 and n > 0 \
+                    else anim.rects(i)
+        self._lcd.display_rgb565_rects(rects)
+        self._bytes += sum(p.nbytes for _, _, p in rects)
@@ -0,0 +1,137 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Persistent RGB565 framebuffer with a direct-draw API.
+
+The framebuffer is a big-endian `uint16` NumPy array laid out exactly as the
+ST7789V expects its pixel data, so regions can be sent to the panel as
+`memoryview` slices without any per-frame allocation or conversion.
+"""
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from ..utils.performance_core import ColorConverter, RegionOptimizer
+
+Region = Tuple[int, int, int, int]
+Color = Union[int, Tuple[int, int, int]]
+
+
+class FrameBuffer:
+    """
+    A drawing surface backed by a persistent big-endian RGB565 array.
+
+    Every drawing operation records the region it touched, so
+    `ST7789V.flush()` can send only what changed. Regions use the same
+    (x0, y0, x1, y1) convention as `display_region`: x1 and y1 are
+    exclusive.
+
+    The framebuffer is not thread-safe; draw from one thread only.
+    """
+    def __init__(
+            self,
+            width: int,
+            height: int,
+            converter: Optional[ColorConverter] = None
+    ):
+        """
+        Args:
+            width: Width in pixels.
+            height: Height in pixels.
+            converter: Color converter used by `paste`.
+        """
+        self.width = width
+        self.height = height
+        self.array = np.zeros((height, width), dtype='>u2')
+        self._converter = converter or ColorConverter()
+        self._dirty: List[Region] = []
+
+    def clip(self, region: Region) -> Optional[Region]:
+        """Clamps a region to the framebuffer, or returns None if empty."""
+        r = RegionOptimizer.clamp_region(region, self.width, self.height)
+        if r[2] <= r[0] or r[3] <= r[1]:
+            return None
+        return r
+
+    def view(self, region: Region) -> np.ndarray:
+        """Returns the (writable) array view of a clamped region."""
+        x0, y0, x1, y1 = region
+        return self.array[y0:y1, x0:x1]
+
+    def mark_dirty(self, region: Region):
+        """Records a region that must be sent on the next flush."""
+        r = self.clip(region)
+        if r is not None:
+            self._dirty.append(r)
+
+    def pop_dirty(self) -> List[Region]:
+        """Returns and clears the recorded dirty regions."""
+        dirty, self._dirty = self._dirty, []
+        return dirty
+
+    def fill_rect(self, x0: int, y0: int, x1: int, y1: int, color: Color):
+        """
+        Fills a rectangle with a solid color.
+
+        Args:
+            color: An (r, g, b) tuple or an RGB565 integer.
+        """
+        r = self.clip((x0, y0, x1, y1))
+        if r is None:
+            return
+        self.view(r)[...] = ColorConverter.color_to_rgb565(color)
+        self._dirty.append(r)
+
+    def fill(self, color: Color):
+        """Fills the whole framebuffer with a solid color."""
+        self.fill_rect(0, 0, self.width, self.height, color)
+
+    def blit(self, rgb565: np.ndarray, x: int, y: int):
+        """
+        Copies a pre-converted RGB565 array into the framebuffer.
+
+        Args:
+            rgb565: A 2D uint16 array (any byte order) of RGB565 pixels.
+            x, y: Destination of the array's top-left pixel.
+        """
+        h, w = rgb565.shape[:2]
+        r = self.clip((x, y, x + w, y + h))
+        if r is None:
+            return
+        src = rgb565[r[1] - y:r[3] - y, r[0] - x:r[2] - x]
+        np.copyto(self.view(r), src, casting='unsafe')
+        self._dirty.append(r)
+
+    def paste(
+            self,
+            image: Image.Image,
+            x: int = 0,
+            y: int = 0,
+            box: Optional[Region] = None,
+            track: bool = True
+    ):
+        """
+        Converts a PIL image (or part of it) straight into the framebuffer.
+
+        Args:
+            image: Source image. Non-RGB images are converted first.
+            x, y: Destination of the source's top-left pixel.
+            box: Optional (x0, y0, x1, y1) area of `image` to paste.
+            track: If False, the region is not recorded as dirty (used
+                   when the caller sends it to the panel immediately).
+        """
+        if box is not None:
+            image = image.crop(box)
+        r = self.clip((x, y, x + image.width, y + image.height))
+        if r is None:
+            return
+        if (r[0] - x, r[1] - y, r[2] - x, r[3] - y) != \
+                (0, 0, image.width, image.height):
+            image = image.crop((r[0] - x, r[1] - y, r[2] - x, r[3] - y))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        self._converter.rgb_to_rgb565(np.asarray(image), out=self.view(r))
+        if track:
+            self._dirty.append(r)
@@ -0,0 +1,252 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Several ST7789V panels on one SPI bus.
+
+`MultiDisplay` drives one `ST7789V` per chip select (e.g. one panel per
+robot eye on CE0 and CE1). The panels share one pigpio daemon connection,
+and a reset line wired to several panels is pulsed once. Panels that share
+the D/C pin also share a lock that keeps every D/C level + SPI write
+sequence atomic, so their transfers can run from different threads.
+
+Frames for all panels can be drawn in one pass on a side-by-side canvas.
+Each panel has its own frame pipeline, so one panel converts its next
+frame while the other one transfers, instead of the panels being written
+one after the other.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple, Union
+
+from PIL import Image
+
+from .st7789v import ST7789V
+from .transport import TRANSPORTS, PigpioTransport, Transport, create_transport
+
+Region = Tuple[int, int, int, int]
+# One GPIO for all panels, or one per panel
+Pins = Union[int, Sequence[int]]
+
+
+def _per_panel(pins: Pins, count: int, name: str) -> List[int]:
+    if isinstance(pins, int):
+        return [pins] * count
+    pins = list(pins)
+    if len(pins) != count:
+        raise ValueError(f"{name} needs one pin or {count} pins.")
+    return pins
+
+
+class MultiDisplay:
+    """
+    Drives several identical panels on CE0/CE1 as one unit.
+
+    Example (two eyes drawn on one canvas)::
+
+        with MultiDisplay(channels=(0, 1), backlight_pin=20) as eyes:
+            canvas = eyes.new_canvas()
+            draw_eyes(ImageDraw.Draw(canvas))
+            eyes.display(canvas)
+
+    Individual panels are available as `eyes[0]`, `eyes[1]`.
+    """
+    def __init__(
+            self,
+            channels: Sequence[int] = (0, 1),
+            rst_pin: Pins = 19,
+            dc_pin: Pins = 18,
+            backlight_pin: Pins = 20,
+            speed_hz: int = 32_000_000,
+            width: int = 240,
+            height: int = 320,
+            rotation: int = 90,
+            transport: Union[str, Sequence[Transport]] = "pigpio",
+            **kwargs
+    ):
+        """
+        Args:
+            channels: SPI chip select of each panel.
+            rst_pin: Reset GPIO, shared or one per panel.
+            dc_pin: D/C GPIO, shared or one per panel.
+            backlight_pin: Backlight GPIO, shared or one per panel.
+            speed_hz: SPI clock speed in Hz.
+            width: Native width of each panel.
+            height: Native height of each panel.
+            rotation: Rotation of every panel.
+            transport: Backend name from `TRANSPORTS`, or one `Transport`
+                       instance per panel.
+            **kwargs: Passed to every `ST7789V` (e.g. `color_depth`).
+        """
+        count = len(channels)
+        if count == 0:
+            raise ValueError("At least one channel is required.")
+        rst_pins = _per_panel(rst_pin, count, "rst_pin")
+        dc_pins = _per_panel(dc_pin, count, "dc_pin")
+        backlight_pins = _per_panel(backlight_pin, count, "backlight_pin")
+        if isinstance(transport, str):
+            transports: Sequence[Union[str, Transport]] = [transport] * count
+        else:
+            transports = list(transport)
+            if len(transports) != count:
+                raise ValueError(f"transport needs {count} instances.")
+
+        # One lock per D/C pin: panels sharing it must not interleave
+        spi_locks = {pin: threading.RLock() for pin in set(dc_pins)}
+        reset_pins = set()
+        self.displays: List[ST7789V] = []
+        try:
+            for i, channel in enumerate(channels):
+                rst = rst_pins[i]
+                self.displays.append(ST7789V(
+                    channel=channel,
+                    rst_pin=None if rst in reset_pins else rst,
+                    dc_pin=dc_pins[i],
+                    backlight_pin=backlight_pins[i],
+                    speed_hz=speed_hz,
+                    width=width,
+                    height=height,
+                    rotation=rotation,
+                    transport=self._transport(
+                        transports[i], channel, speed_hz, width, height
+                    ),
+                    spi_lock=spi_locks[dc_pins[i]],
+                    **kwargs
+                ))
+                reset_pins.add(rst)
+        except Exception:
+            self.close()
+            raise
+        self._executor = ThreadPoolExecutor(
+            max_workers=count, thread_name_prefix="multi-display"
+        )
+
+    def _transport(
+            self, transport: Union[str, Transport], channel: int,
+            speed_hz: int, width: int, height: int
+    ) -> Transport:
+        """Creates a panel's transport, sharing the pigpio connection."""
+        if isinstance(transport, Transport):
+            return transport
+        cls = TRANSPORTS.get(transport)
+        shared = next(
+            (lcd.transport.pi for lcd in self.displays
+             if isinstance(lcd.transport, PigpioTransport)), None
+        )
+        if shared is not None and cls is not None \
+                and issubclass(cls, PigpioTransport):
+            return cls(channel=channel, speed_hz=speed_hz, pi=shared)
+        return create_transport(transport, channel, speed_hz, width, height)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.displays)
+
+    def __getitem__(self, index: int) -> ST7789V:
+        return self.displays[index]
+
+    def __iter__(self):
+        return iter(self.displays)
+
+    @property
+    def width(self) -> int:
+        """Width of one panel in the current rotation."""
+        return self.displays[0].width
+
+    @property
+    def height(self) -> int:
+        """Height of one panel in the current rotation."""
+        return self.displays[0].height
+
+    @property
+    def canvas_size(self) -> Tuple[int, int]:
+        """Size of the side-by-side canvas covering all panels."""
+        return (self.width * len(self.displays), self.height)
+
+    def new_canvas(self, color=(0, 0, 0)) -> Image.Image:
+        """Returns an RGB image to draw all panels in one pass."""
+        return Image.new("RGB", self.canvas_size, color)
+
+    def split(self, canvas: Image.Image) -> List[Image.Image]:
+        """Cuts a side-by-side canvas into one image per panel."""
+        w, h = self.width, self.height
+        return [
+            canvas.crop((i * w, 0, (i + 1) * w, h))
+            for i in range(len(self.displays))
+        ]
+
+    def display(
+            self,
+            frames: Union[Image.Image, Sequence[Image.Image]],
+            regions: Optional[Sequence[Optional[Sequence[Region]]]] = None,
+            wait: bool = True
+    ):
+        """
+        Sends a frame to every panel through their pipelines.
+
+        The panels' pipelines work in parallel: while one panel's frame is
+        on the bus, the next panel's frame is being converted.
+
+        Args:
+            frames: A side-by-side canvas (see `new_canvas`), or one image
+                    per panel. Images must not be modified afterwards.
+            regions: Per panel, the changed regions in panel coordinates,
+                     or None for the whole panel.
+            wait: Return only when all panels are updated; otherwise the
+                  next frame can be drawn while these are being sent.
+        """
+        if isinstance(frames, Image.Image):
+            frames = self.split(frames)
+        if len(frames) != len(self.displays):
+            raise ValueError(f"Expected {len(self.displays)} frames.")
+        for i, (lcd, frame) in enumerate(zip(self.displays, frames)):
+            lcd.submit(frame, None if regions is None else regions[i])
+        if wait:
+            self.wait()
+
+    def flush(self, max_regions: int = 8):
+        """
+        Sends the drawing done in each panel's framebuffer, all panels at
+        the same time (see `ST7789V.flush`).
+        """
+        futures = [
+            self._executor.submit(lcd.flush, None, max_regions)
+            for lcd in self.displays
+        ]
+        for future in futures:
+            future.result()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until all submitted frames are on the panels."""
+        return all(lcd.wait_pipeline(timeout) for lcd in self.displays)
+
+    def set_brightness(self, level: float):
+        """Sets the backlight brightness of every panel."""
+        for lcd in self.displays:
+            lcd.set_brightness(level)
+
+    def fade_to(self, level: float, duration: float = 0.5, wait: bool = True):
+        """Fades every panel's backlight at the same time."""
+        for lcd in self.displays:
+            lcd.fade_to(level, duration, wait=False)
+        if wait:
+            for lcd in self.displays:
+                lcd.wait_fade()
+
+    def get_stats(self) -> List[dict]:
+        """Returns the pipeline counters of each panel."""
+        return [lcd.get_pipeline_stats() for lcd in self.displays]
+
+    def close(self):
+        """Closes the panels, the pigpio connection owner last."""
+        executor = getattr(self, '_executor', None)
+        if executor is not None:
+            executor.shutdown()
+        for lcd in reversed(self.displays):
+            lcd.close()
+        self.displays = []
@@ -8,14 +8,26 @@ This module provides a high-performance driver for ST7789V-based displays,
 optimized for Raspberry Pi environments. It leverages the `performance_core`
 module to achieve high frame rates with low CPU usage.
 """
+import contextlib
+import threading
 import time
-from typing import Optional, Tuple, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
-import pigpio
 from PIL import Image
 
-from ..utils.performance_core import create_optimizer_pack
+from ..utils.performance_core import (
+    AdaptiveChunking, ColorConverter, create_optimizer_pack, load_json_cache,
+    save_json_cache, upscale_nearest
+)
+from .frame_pipeline import FramePipeline
+from .framebuffer import FrameBuffer
+from .te_sync import TeSource, TeSync
+from .transport import Transport, create_transport
+
+CHUNK_CACHE_FILE = "chunking.json"
+FILL_BUFFER_COLORS = 4  # solid-fill source buffers kept, one per color
+FADE_STEPS_PER_SEC = 100  # backlight duty cycle updates during a fade
 
 # --- ST7789V Commands ---
 CMD_SWRESET = 0x01
@@ -28,9 +40,23 @@ CMD_DISPON = 0x29
 CMD_CASET = 0x2A
 CMD_RASET = 0x2B
 CMD_RAMWR = 0x2C
+CMD_VSCRDEF = 0x33
+CMD_TEOFF = 0x34
+CMD_TEON = 0x35
 CMD_MADCTL = 0x36
+CMD_VSCSAD = 0x37
 CMD_COLMOD = 0x3A
 
+# COLMOD values per interface color depth (bits per pixel)
+COLOR_DEPTHS = {16: 0x55, 12: 0x53}
+
+# Pixel data of a region: a '>u2' array, or an RGB565 value for a solid fill
+Pixels = Union[np.ndarray, int]
+
+# Hardware scrolling moves GRAM rows (the native long axis). Per rotation:
+# the screen axis they appear on, and whether it runs against GRAM order.
+SCROLL_AXIS = {0: ('y', False), 90: ('x', False), 180: ('y', True), 270: ('x', True)}
+
 class ST7789V:
     """
     An optimized driver for ST7789V-based SPI displays.
@@ -41,62 +67,135 @@ class ST7789V:
     """
     def __init__(self, 
             channel: int = 0, 
-            rst_pin: int = 19, 
+            rst_pin: Optional[int] = 19, 
             dc_pin: int = 18, 
             backlight_pin: int = 20,
             speed_hz: int = 32_000_000, 
             width: int = 240, 
             height: int = 320, 
-            rotation: int = 90
+            rotation: int = 90,
+            transport: Union[str, Transport] = "pigpio",
+            conversion_workers: int = 1,
+            color_depth: int = 16,
+            backlight_frequency: int = 1000,
+            te_pin: Optional[int] = None,
+            spi_lock: Optional[threading.RLock] = None
     ):
         """
         Initializes the display driver.
 
         Args:
             channel: SPI channel (0 or 1).
-            rst_pin: GPIO pin for Reset.
+            rst_pin: GPIO pin for Reset, or None to skip the hardware
+                     reset (e.g. when a display sharing the reset line
+                     has already pulsed it).
             dc_pin: GPIO pin for Data/Command select.
             backlight_pin: GPIO pin for the backlight.
             speed_hz: SPI clock speed in Hz.
             width: The native width of the display.
             height: The native height of the display.
             rotation: Initial rotation (0, 90, 180, or 270 degrees).
+            transport: SPI backend: "pigpio" (daemon socket), "spidev"
+                       (kernel SPI for pixel data), "memory" (no hardware),
+                       or a `Transport` instance.
+            conversion_workers: Threads converting large images to RGB565
+                                in horizontal bands (0: one per CPU core).
+            color_depth: Bits per pixel on the SPI bus: 16 (RGB565) or 12
+                         (RGB444, 25% fewer bytes; see `set_color_depth`).
+            backlight_frequency: PWM frequency in Hz used when the
+                                 backlight is dimmed (see `set_brightness`).
+            te_pin: GPIO wired to the panel's TE output. If given,
+                    transfers are synchronized to vertical blanking (see
+                    `enable_te_sync`).
+            spi_lock: Lock shared with other displays whose transfers
+                      must not interleave, i.e. panels on one bus that
+                      share the D/C pin (see `MultiDisplay`).
         """
+        if color_depth not in COLOR_DEPTHS:
+            raise ValueError(
+                f"color_depth must be one of {sorted(COLOR_DEPTHS)}."
+            )
         self._native_width = width
         self._native_height = height
         self.width = width
         self.height = height
         self._rotation = rotation
+        self.color_depth = color_depth
         
         # Initialize the optimizer pack
-        self._optimizers = create_optimizer_pack()
+        self._optimizers = create_optimizer_pack(conversion_workers)
         
-        # Initialize pigpio
-        self.pi = pigpio.pi()
-        if not self.pi.connected:
-            raise RuntimeError(
-                "Could not connect to pigpio daemon. Is it running?"
-            )
+        # Open the SPI/GPIO backend
+        self.transport = create_transport(
+            transport, channel, speed_hz, width, height
+        )
+        self.pi = getattr(self.transport, 'pi', None)
+        self.speed_hz = speed_hz
+
+        # Chunk sizes are learned per transport and SPI speed
+        self._chunk_key = f"{self.transport.name}:{speed_hz}"
+        chunking = AdaptiveChunking(
+            max_size=self.transport.max_chunk_size
+        )
+        if self.transport.persist_tuning:
+            state = load_json_cache(CHUNK_CACHE_FILE).get(self._chunk_key)
+            if isinstance(state, dict):
+                chunking.load_state(state)
+        self._optimizers['adaptive_chunking'] = chunking
+        # Until throughput is measured, assume the raw SPI clock rate
+        self._optimizers['region_merger'].update_costs(
+            bytes_per_sec=speed_hz / 8
+        )
 
         self.rst_pin = rst_pin
         self.dc_pin = dc_pin
         self.backlight_pin = backlight_pin
+        self.backlight_frequency = backlight_frequency
+        # Backlight duty cycle, restored by wake()
+        self.brightness = 1.0
+        self._fade: Optional[Tuple[threading.Thread, threading.Event]] = None
 
         # Configure GPIO pins
-        for pin in [self.rst_pin, self.dc_pin, self.backlight_pin]:
-            self.pi.set_mode(pin, pigpio.OUTPUT)
-
-        # Open SPI handle
-        self.spi_handle = self.pi.spi_open(channel, speed_hz, 0)
-        if self.spi_handle < 0:
-            raise RuntimeError(
-                f"Failed to open SPI bus: handle={self.spi_handle}"
-            )
+        self.transport.setup_pins(
+            self.dc_pin, self.rst_pin, self.backlight_pin
+        )
 
         self._last_window: Optional[Tuple[int, int, int, int]] = None
+
+        # Batched region transfer statistics
+        self._batch_stats = {
+            'batches': 0, 'regions': 0, 'fills': 0, 'round_trips': 0,
+            'region_overhead_us': 0.0,
+        }
+        # Repeating RGB565 chunks that solid fills are streamed from
+        self._fill_buffers: Dict[int, memoryview] = {}
+
+        # Serializes bus access between the caller and the pipeline writer
+        self._bus_lock = threading.RLock()
+        # Keeps each D/C level + SPI write sequence atomic on a shared bus
+        self._spi_lock = spi_lock or threading.RLock()
+        self._pipeline: Optional[FramePipeline] = None
+
+        # Persistent RGB565 framebuffer (re-created by set_rotation)
+        self.framebuffer: FrameBuffer = FrameBuffer(
+            self.width, self.height, self._optimizers['color_converter']
+        )
+
+        # Shadow copy of the panel contents used by display_diff
+        self._shadow = np.zeros((self.height, self.width), dtype='>u2')
+        self._shadow_valid = False
+
+        # Hardware scroll state: (start, end) along the scroll axis
+        self._scroll_area: Optional[Tuple[int, int]] = None
+        self._scroll_offset = 0
+
+        # Tearing-effect synchronization (see enable_te_sync)
+        self.te_sync: Optional[TeSync] = None
         
         self._init_display()
         self.set_rotation(self._rotation)
+        if te_pin is not None:
+            self.enable_te_sync(te_pin)
 
     def __enter__(self):
         return self
@@ -106,26 +205,29 @@ class ST7789V:
 
     def _write_command(self, command: int):
         """Sends a command byte to the display."""
-        self.pi.write(self.dc_pin, 0)  # D/C pin low for command
-        self.pi.spi_write(self.spi_handle, [command])
+        with self._spi_lock:
+            self.transport.gpio_write(self.dc_pin, 0)  # D/C low for command
+            self.transport.spi_write([command])
 
     def _write_data(self, data: Union[int, bytes, list]):
         """Sends a data byte or buffer to the display."""
-        self.pi.write(self.dc_pin, 1)  # D/C pin high for data
-        if isinstance(data, int):
-            self.pi.spi_write(self.spi_handle, [data])
-        else:
-            self.pi.spi_write(self.spi_handle, data)
+        with self._spi_lock:
+            self.transport.gpio_write(self.dc_pin, 1)  # D/C high for data
+            if isinstance(data, int):
+                self.transport.spi_write([data])
+            else:
+                self.transport.spi_write(data)
 
     def _init_display(self):
         """Performs the hardware initialization sequence for the ST7789V."""
         # Hardware reset
-        self.pi.write(self.rst_pin, 1)
-        time.sleep(0.01)
-        self.pi.write(self.rst_pin, 0)
-        time.sleep(0.01)
-        self.pi.write(self.rst_pin, 1)
-        time.sleep(0.150)
+        if self.rst_pin is not None:
+            self.transport.gpio_write(self.rst_pin, 1)
+            time.sleep(0.01)
+            self.transport.gpio_write(self.rst_pin, 0)
+            time.sleep(0.01)
+            self.transport.gpio_write(self.rst_pin, 1)
+            time.sleep(0.150)
 
         # Initialization sequence
         self._write_command(CMD_SWRESET)
@@ -133,13 +235,34 @@ class ST7789V:
         self._write_command(CMD_SLPOUT)
         time.sleep(0.5)
         self._write_command(CMD_COLMOD)
-        self._write_data(0x55)  # 16 bits per pixel
+        self._write_data(COLOR_DEPTHS[self.color_depth])
         self._write_command(CMD_INVON)
         self._write_command(CMD_NORON)
         self._write_command(CMD_DISPON)
         time.sleep(0.1)
 
-        self.pi.write(self.backlight_pin, 1)
+        self._drive_backlight(self.brightness)
+
+    def set_color_depth(self, bits: int):
+        """
+        Selects the pixel format used on the SPI bus.
+
+        At 12 bits (RGB444) two pixels take three bytes instead of four,
+        so every transfer is 25% shorter. The framebuffer and all APIs stay
+        RGB565; pixels are packed on the way out and lose their lowest
+        color bits on the panel. Good for flat-color UIs.
+
+        Args:
+            bits: 16 or 12.
+        """
+        if bits not in COLOR_DEPTHS:
+            raise ValueError(f"bits must be one of {sorted(COLOR_DEPTHS)}.")
+        with self._bus_lock:
+            self._write_command(CMD_COLMOD)
+            self._write_data(COLOR_DEPTHS[bits])
+            self.color_depth = bits
+            self._fill_buffers.clear()  # fill patterns depend on the format
+            self._last_window = None  # next pixels need a fresh RAMWR
 
     def set_rotation(self, rotation: int):
         """
@@ -152,14 +275,28 @@ class ST7789V:
         if rotation not in madctl_values:
             raise ValueError("Rotation must be 0, 90, 180, or 270.")
 
-        self._write_command(CMD_MADCTL)
-        self._write_data(madctl_values[rotation])
+        # Pipeline buffers are sized for the current orientation
+        self.stop_pipeline()
+        # The scroll axis depends on the orientation
+        self.reset_scroll()
+
+        with self._bus_lock:
+            self._write_command(CMD_MADCTL)
+            self._write_data(madctl_values[rotation])
 
         # Swap width and height for portrait/landscape modes
         if rotation in (90, 270):
             self.width, self.height = self._native_height, self._native_width
         else:
             self.width, self.height = self._native_width, self._native_height
+
+        if (self.framebuffer.width, self.framebuffer.height) != \
+                (self.width, self.height):
+            self.framebuffer = FrameBuffer(
+                self.width, self.height, self._optimizers['color_converter']
+            )
+            self._shadow = np.zeros((self.height, self.width), dtype='>u2')
+        self._shadow_valid = False  # GRAM mapping changed
         
         self._rotation = rotation
         self._last_window = None  # Invalidate window cache
@@ -183,24 +320,89 @@ class ST7789V:
         
         self._last_window = window
 
-    def write_pixels(self, pixel_bytes: bytes):
+    def write_pixels(self, pixel_bytes: Union[bytes, memoryview]):
         """
-        Writes a raw buffer of pixel data to the current window.
-        Uses adaptive chunking to optimize transfer speed.
+        Writes a raw buffer of pixel data, in the format selected by
+        `color_depth`, to the current window.
+        Uses adaptive chunking to optimize transfer speed; every chunk is
+        timed and fed back into the chunk size selection.
         """
-        chunk_size = self._optimizers['adaptive_chunking'].get_chunk_size()
+        chunking = self._optimizers['adaptive_chunking']
+        chunk_size = chunking.get_chunk_size()
         data_len = len(pixel_bytes)
-        
-        self.pi.write(self.dc_pin, 1) # Set D/C high for data
-        
-        if data_len <= chunk_size:
-            self.pi.spi_write(self.spi_handle, pixel_bytes)
-        else:
+        spi_write = self.transport.spi_write
+
+        with self._spi_lock:
+            self.transport.gpio_write(self.dc_pin, 1) # Set D/C high for data
+
             for i in range(0, data_len, chunk_size):
-                self.pi.spi_write(
-                    self.spi_handle, pixel_bytes[i:i + chunk_size]
+                chunk = pixel_bytes[i:i + chunk_size]
+                start = time.perf_counter()
+                spi_write(chunk)
+                chunking.record_transfer(
+                    len(chunk), time.perf_counter() - start
                 )
 
+    @property
+    def chunk_size(self) -> int:
+        """The SPI chunk size currently used for pixel data."""
+        return self._optimizers['adaptive_chunking'].get_chunk_size()
+
+    def get_transfer_stats(self) -> dict:
+        """
+        Returns the adaptive transfer state: current and best chunk size,
+        the measured pixel throughput in bytes per second, and the batched
+        region counters (`fills`: regions sent as solid fills) with the
+        estimated per-region overhead in microseconds
+        (`region_overhead_us`).
+        """
+        chunking = self._optimizers['adaptive_chunking']
+        stats = {
+            'transport': self.transport.name,
+            'speed_hz': self.speed_hz,
+            'chunk_size': chunking.get_chunk_size(),
+            'best_chunk_size': chunking.best_chunk_size,
+            'bytes_per_sec': chunking.bytes_per_sec,
+        }
+        stats.update(self._batch_stats)
+        return stats
+
+    def merge_regions(
+            self,
+            regions: Sequence[Tuple[int, int, int, int]],
+            max_regions: Optional[int] = 8
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Merges dirty regions into the cheapest set of windows to send.
+
+        Uses the cost-model `RegionMerger`, updated with the measured
+        pixel throughput and per-region overhead when the transport drives
+        a real bus.
+
+        Args:
+            regions: Regions (x0, y0, x1, y1) to merge.
+            max_regions: Upper bound on the number of regions, or None.
+        """
+        merger = self._optimizers['region_merger']
+        if self.transport.persist_tuning:
+            merger.update_costs(
+                window_overhead_us=self._batch_stats['region_overhead_us'],
+                bytes_per_sec=self._optimizers['adaptive_chunking']
+                .bytes_per_sec
+            )
+        return merger.merge(regions, max_regions=max_regions)
+
+    def _save_chunk_profile(self):
+        """Persists the learned chunk size for this transport and speed."""
+        if not self.transport.persist_tuning:
+            return
+        state = self._optimizers['adaptive_chunking'].get_state()
+        if state['bytes_per_sec'] <= 0:
+            return  # nothing measured
+        profiles = load_json_cache(CHUNK_CACHE_FILE)
+        profiles[self._chunk_key] = state
+        save_json_cache(CHUNK_CACHE_FILE, profiles)
+
     def display(self, image: Image.Image):
         """
         Displays a full PIL Image on the screen.
@@ -209,12 +411,10 @@ class ST7789V:
         if image.size != (self.width, self.height):
             image = image.resize((self.width, self.height))
 
-        pixel_bytes = self._optimizers['color_converter'].rgb_to_rgb565_bytes(
-            np.array(image)
-        )
-        
-        self.set_window(0, 0, self.width - 1, self.height - 1)
-        self.write_pixels(pixel_bytes)
+        with self._bus_lock:
+            self.framebuffer.paste(image)
+            self.framebuffer.pop_dirty()
+            self._send_framebuffer((0, 0, self.width, self.height))
 
     def display_region(
             self, image: Image.Image, x0: int, y0: int, x1: int, y1: int
@@ -233,37 +433,913 @@ class ST7789V:
         if region[2] <= region[0] or region[3] <= region[1]:
             return # Skip zero- or negative-sized regions
 
-        # Crop the image to the specified region and convert to pixel data
+        # Convert into a pooled contiguous buffer, send it, and keep the
+        # framebuffer in sync
+        w, h = region[2] - region[0], region[3] - region[1]
         region_img = image.crop(region)
-        pixel_bytes = self._optimizers['color_converter'].rgb_to_rgb565_bytes(
-            np.array(region_img)
-        )
+        if region_img.mode != "RGB":
+            region_img = region_img.convert("RGB")
+
+        pool = self._optimizers['memory_pool']
+        buf = pool.get_buffer(w * h * 2)
+        try:
+            pixels = np.frombuffer(buf, dtype='>u2', count=w * h)
+            pixels = pixels.reshape(h, w)
+            self._optimizers['color_converter'].rgb_to_rgb565(
+                np.asarray(region_img), out=pixels
+            )
+            with self._bus_lock:
+                self._send_pixels(region, pixels)
+                self.framebuffer.view(region)[...] = pixels
+        finally:
+            pool.return_buffer(buf)
+
+    def display_regions(
+            self,
+            image: Image.Image,
+            regions: Sequence[Tuple[int, int, int, int]]
+    ):
+        """
+        Displays several regions of a PIL image as one batched transfer.
+
+        All window commands and pixel data are queued and handed to the
+        transport at once, which on pigpio costs a single daemon round trip
+        instead of about eight per region.
+
+        Args:
+            image: The source image in screen coordinates.
+            regions: Regions (x0, y0, x1, y1) to send.
+        """
+        pool = self._optimizers['memory_pool']
+        converter = self._optimizers['color_converter']
+        buffers = []
+        items = []
+        try:
+            for region in regions:
+                region = self.framebuffer.clip(region)
+                if region is None:
+                    continue
+                w, h = region[2] - region[0], region[3] - region[1]
+                region_img = image.crop(region)
+                if region_img.mode != "RGB":
+                    region_img = region_img.convert("RGB")
+
+                buf = pool.get_buffer(w * h * 2)
+                buffers.append(buf)
+                pixels = np.frombuffer(buf, dtype='>u2', count=w * h)
+                pixels = pixels.reshape(h, w)
+                converter.rgb_to_rgb565(np.asarray(region_img), out=pixels)
+                items.append((region, pixels))
+
+            with self._bus_lock:
+                self._send_batch(items)
+                for region, pixels in items:
+                    self.framebuffer.view(region)[...] = pixels
+        finally:
+            for buf in buffers:
+                pool.return_buffer(buf)
+
+    def display_rgb565(
+            self,
+            pixels: np.ndarray,
+            x0: int = 0,
+            y0: int = 0
+    ):
+        """
+        Displays pre-converted big-endian RGB565 pixels without conversion.
+
+        The array (e.g. a memory-mapped `ImageCache` entry) is sent as-is
+        in one batched transfer.
 
-        # Set window and write data
-        self.set_window(region[0], region[1], region[2] - 1, region[3] - 1)
-        self.write_pixels(pixel_bytes)
+        Args:
+            pixels: '>u2' array of shape (height, width).
+            x0: Left edge on the screen.
+            y0: Top edge on the screen.
+        """
+        self.display_rgb565_rects([(x0, y0, pixels)])
+
+    def display_rgb565_rects(
+            self, rects: Sequence[Tuple[int, int, np.ndarray]]
+    ):
+        """
+        Displays several pre-converted RGB565 rectangles, in order, as one
+        batched transfer.
+
+        Each rectangle is sent exactly as given (no merging); contiguous
+        arrays such as slices of a memory-mapped file are not copied.
+
+        Args:
+            rects: (x0, y0, pixels) tuples, where `pixels` is a '>u2' array
+                   of shape (height, width) placed at (x0, y0).
+        """
+        items = []
+        for x0, y0, pixels in rects:
+            h, w = pixels.shape
+            region = self.framebuffer.clip((x0, y0, x0 + w, y0 + h))
+            if region is None:
+                continue
+            rx0, ry0, rx1, ry1 = region
+            pixels = pixels[ry0 - y0:ry1 - y0, rx0 - x0:rx1 - x0]
+            color = _solid_color(pixels)
+            if color is not None:
+                items.append((region, color))
+                continue
+            if pixels.dtype != np.dtype('>u2'):
+                pixels = pixels.astype('>u2')
+            items.append((region, np.ascontiguousarray(pixels)))
+
+        with self._bus_lock:
+            self._send_batch(items)
+            for region, pixels in items:
+                self.framebuffer.view(region)[...] = pixels
+
+    def fill_rect(
+            self,
+            x0: int,
+            y0: int,
+            x1: int,
+            y1: int,
+            color: Union[int, Tuple[int, int, int]]
+    ):
+        """
+        Fills a region (x1/y1 exclusive) with a solid color.
+
+        No image is built and nothing is converted: the pixel data is
+        streamed from a small repeating RGB565 buffer.
+
+        Args:
+            color: An (r, g, b) tuple or an RGB565 integer.
+        """
+        self.fill_rects([((x0, y0, x1, y1), color)])
+
+    def fill_rects(
+            self,
+            rects: Sequence[Tuple[
+                Tuple[int, int, int, int], Union[int, Tuple[int, int, int]]
+            ]]
+    ):
+        """
+        Fills several regions with solid colors as one batched transfer.
+
+        Args:
+            rects: (region, color) pairs, sent in order.
+        """
+        items = []
+        for region, color in rects:
+            region = self.framebuffer.clip(region)
+            if region is not None:
+                items.append((region, ColorConverter.color_to_rgb565(color)))
+
+        with self._bus_lock:
+            self._send_batch(items)
+            for region, value in items:
+                self.framebuffer.view(region)[...] = value
+
+    def fill_screen(self, color: Union[int, Tuple[int, int, int]]):
+        """Fills the whole screen with a solid color."""
+        self.fill_rect(0, 0, self.width, self.height, color)
+
+    def display_rgb565_regions(
+            self,
+            pixels: np.ndarray,
+            regions: Sequence[Tuple[int, int, int, int]]
+    ):
+        """
+        Displays regions of a full-screen RGB565 array as one batched
+        transfer.
+
+        Args:
+            pixels: '>u2' array of shape (height, width) in screen
+                    coordinates.
+            regions: Regions (x0, y0, x1, y1) to send.
+        """
+        with self._bus_lock:
+            clipped = []
+            for region in regions:
+                region = self.framebuffer.clip(region)
+                if region is None:
+                    continue
+                x0, y0, x1, y1 = region
+                self.framebuffer.view(region)[...] = pixels[y0:y1, x0:x1]
+                clipped.append(region)
+            self._send_framebuffer_regions(clipped)
+
+    def scaled_size(self, scale: int) -> Tuple[int, int]:
+        """Size of the surface to draw into for `display_scaled`."""
+        return (-(-self.width // scale), -(-self.height // scale))
+
+    def display_scaled(
+            self,
+            image: Image.Image,
+            scale: int = 2,
+            regions: Optional[Sequence[Tuple[int, int, int, int]]] = None,
+            max_regions: int = 8
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Displays a low-resolution image enlarged by an integer factor.
+
+        Drawing at half (or a third of) the resolution costs a quarter
+        (a ninth) as much. Only the low-resolution pixels are converted to
+        RGB565; they are then replicated into the framebuffer and the
+        enlarged regions are sent as one batch.
+
+        Args:
+            image: Image of `scaled_size(scale)`.
+            scale: Enlargement factor.
+            regions: Changed regions in `image` coordinates, or None for
+                     the whole image.
+            max_regions: Maximum number of regions after merging.
+
+        Returns:
+            The screen regions that were sent.
+        """
+        size = self.scaled_size(scale)
+        if image.size != size:
+            raise ValueError(
+                f"Image is {image.size[0]}x{image.size[1]}, expected "
+                f"{size[0]}x{size[1]} for scale {scale}"
+            )
+        if regions is None:
+            regions = [(0, 0) + size]
+        converter = self._optimizers['color_converter']
+        with self._bus_lock:
+            screen_regions = []
+            for region in regions:
+                x0, y0, x1, y1 = self._optimizers['region_optimizer'] \
+                    .clamp_region(region, size[0], size[1])
+                if x1 <= x0 or y1 <= y0:
+                    continue
+                crop = image.crop((x0, y0, x1, y1))
+                if crop.mode != "RGB":
+                    crop = crop.convert("RGB")
+                pixels = converter.rgb_to_rgb565(np.asarray(crop))
+                target = (
+                    x0 * scale, y0 * scale,
+                    min(self.width, x1 * scale), min(self.height, y1 * scale)
+                )
+                upscale_nearest(pixels, scale, self.framebuffer.view(target))
+                screen_regions.append(target)
+            merged = self.merge_regions(screen_regions, max_regions=max_regions)
+            self._send_framebuffer_regions(merged)
+        return merged
+
+    def display_diff(
+            self, image: Image.Image, max_regions: int = 8
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Displays a full PIL image, sending only the tiles that changed.
+
+        The image is compared tile by tile against a shadow copy of the
+        panel contents, and the changed tiles are merged into at most
+        `max_regions` regions. The first call sends the whole frame.
+
+        Returns:
+            The regions that were sent.
+        """
+        if image.size != (self.width, self.height):
+            image = image.resize((self.width, self.height))
+
+        with self._bus_lock:
+            self.framebuffer.paste(image)
+            self.framebuffer.pop_dirty()
+
+            if not self._shadow_valid:
+                full = (0, 0, self.width, self.height)
+                self._send_framebuffer(full)
+                return [full]
+
+            detector = self._optimizers['tile_detector']
+            regions = detector.changed_regions(
+                self._shadow, self.framebuffer.array
+            )
+            regions = self.merge_regions(regions, max_regions=max_regions)
+            self._send_framebuffer_regions(regions)
+            return regions
+
+    def flush(
+            self,
+            regions: Optional[Sequence[Tuple[int, int, int, int]]] = None,
+            max_regions: int = 8
+    ):
+        """
+        Sends framebuffer contents to the panel.
+
+        Args:
+            regions: Regions to send. If None, the regions touched by
+                     framebuffer drawing operations since the last flush
+                     are merged and sent.
+            max_regions: Maximum number of regions after merging.
+        """
+        with self._bus_lock:
+            dirty = self.framebuffer.pop_dirty()
+            if regions is None:
+                regions = self.merge_regions(dirty, max_regions=max_regions)
+            clipped = [self.framebuffer.clip(r) for r in regions]
+            self._send_framebuffer_regions(
+                [r for r in clipped if r is not None]
+            )
+
+    def _send_framebuffer(self, region: Tuple[int, int, int, int]):
+        """
+        Sends a clamped framebuffer region without converting it.
+
+        Full-width regions are contiguous in memory and are sent as a
+        zero-copy memoryview. Narrower regions are gathered into a pooled
+        staging buffer first.
+        """
+        x0, y0, x1, y1 = region
+        w, h = x1 - x0, y1 - y0
+        color = _solid_color(self.framebuffer.view(region))
+        if color is not None:
+            self._send_batch([(region, color)])
+            return
+        if w == self.width:
+            self._send_pixels(region, self.framebuffer.array[y0:y1])
+            return
+
+        pool = self._optimizers['memory_pool']
+        buf = pool.get_buffer(w * h * 2)
+        try:
+            pixels = np.frombuffer(buf, dtype='>u2', count=w * h)
+            pixels = pixels.reshape(h, w)
+            np.copyto(pixels, self.framebuffer.view(region))
+            self._send_pixels(region, pixels)
+        finally:
+            pool.return_buffer(buf)
+
+    def _send_framebuffer_regions(
+            self, regions: Sequence[Tuple[int, int, int, int]]
+    ):
+        """
+        Sends clamped framebuffer regions as one batched transfer.
+        Uniform regions are sent as solid fills.
+        """
+        pool = self._optimizers['memory_pool']
+        buffers: list = []
+        items: List[Tuple[Tuple[int, int, int, int], Pixels]] = []
+        try:
+            for region in regions:
+                x0, y0, x1, y1 = region
+                w, h = x1 - x0, y1 - y0
+                color = _solid_color(self.framebuffer.view(region))
+                if color is not None:
+                    items.append((region, color))
+                    continue
+                if w == self.width:
+                    items.append((region, self.framebuffer.array[y0:y1]))
+                    continue
+                buf = pool.get_buffer(w * h * 2)
+                buffers.append(buf)
+                pixels = np.frombuffer(buf, dtype='>u2', count=w * h)
+                pixels = pixels.reshape(h, w)
+                np.copyto(pixels, self.framebuffer.view(region))
+                items.append((region, pixels))
+            self._send_batch(items)
+        finally:
+            for buf in buffers:
+                pool.return_buffer(buf)
+
+    def _send_batch(
+            self,
+            items: Sequence[Tuple[Tuple[int, int, int, int], Pixels]]
+    ):
+        """
+        Sends (region, pixels) pairs with a single `write_batch` call and
+        records them in the shadow copy of the panel. `pixels` is a '>u2'
+        array, or an RGB565 integer for a solid fill.
+
+        Pixel data is cut at the adaptive chunk size, like `write_pixels`.
+        The time not explained by the pixel throughput is attributed to the
+        per-region command overhead and kept as a moving average; the rest
+        is fed back to the chunk size selection.
+        """
+        if not items:
+            return
+        chunking = self._optimizers['adaptive_chunking']
+        chunk = min(chunking.get_chunk_size(), self.transport.max_chunk_size)
+        # Solid fills repeat one buffer, so their chunks must hold whole
+        # pixels (two pixels are three bytes in RGB444)
+        fill_step = chunk - chunk % 3 if self.color_depth == 12 else chunk
+        ops: list = []
+        pixel_bytes = 0
+        for (x0, y0, x1, y1), pixels in items:
+            xe, ye = x1 - 1, y1 - 1
+            ops += [
+                (0, bytes([CMD_CASET])),
+                (1, bytes([x0 >> 8, x0 & 0xFF, xe >> 8, xe & 0xFF])),
+                (0, bytes([CMD_RASET])),
+                (1, bytes([y0 >> 8, y0 & 0xFF, ye >> 8, ye & 0xFF])),
+                (0, bytes([CMD_RAMWR])),
+            ]
+            if isinstance(pixels, np.ndarray):
+                data = self._wire(pixels)
+                size = len(data)
+                ops += [(1, data[i:i + chunk]) for i in range(0, size, chunk)]
+            else:
+                # Solid fill: send the same preallocated chunk repeatedly
+                fill = self._fill_buffer(pixels)
+                size = self._wire_size((x1 - x0) * (y1 - y0))
+                step = min(len(fill), fill_step)
+                ops += [
+                    (1, fill[:min(step, size - i)])
+                    for i in range(0, size, step)
+                ]
+                self._batch_stats['fills'] += 1
+            pixel_bytes += size
+
+        with self._spi_lock, self._te_transfer():
+            start = time.perf_counter()
+            round_trips = self.transport.write_batch(ops)
+            elapsed = time.perf_counter() - start
+
+        x0, y0, x1, y1 = items[-1][0]
+        self._last_window = (x0, y0, x1 - 1, y1 - 1)
+        for (x0, y0, x1, y1), pixels in items:
+            self._shadow[y0:y1, x0:x1] = pixels
+            if x1 - x0 == self.width and y1 - y0 == self.height:
+                self._shadow_valid = True
+
+        stats = self._batch_stats
+        if stats['batches']:
+            pixel_time = elapsed - \
+                len(items) * stats['region_overhead_us'] / 1e6
+            chunking.record_batch(pixel_bytes, pixel_time, chunk)
+        bytes_per_sec = chunking.bytes_per_sec or self.speed_hz / 8
+        overhead_us = max(
+            0.0, elapsed - pixel_bytes / bytes_per_sec
+        ) / len(items) * 1e6
+        if stats['batches'] == 0:
+            stats['region_overhead_us'] = overhead_us
+        else:
+            stats['region_overhead_us'] += \
+                0.2 * (overhead_us - stats['region_overhead_us'])
+        stats['batches'] += 1
+        stats['regions'] += len(items)
+        stats['round_trips'] += round_trips
+
+    def _fill_buffer(self, value: int) -> memoryview:
+        """
+        Returns a chunk of repeated RGB565 `value` (as bytes) for solid
+        fills. Buffers of the most recently used colors are kept.
+        """
+        buffers = self._fill_buffers
+        buf = buffers.pop(value, None)
+        if buf is None:
+            if len(buffers) >= FILL_BUFFER_COLORS:
+                del buffers[next(iter(buffers))]  # least recently used
+            count = min(
+                self.transport.max_chunk_size // 2,
+                self._native_width * self._native_height
+            ) // 2 * 2  # whole RGB444 pixel pairs
+            buf = self._wire(np.full(count, value, dtype='>u2'))
+        buffers[value] = buf
+        return buf
+
+    def _wire(self, pixels: np.ndarray) -> memoryview:
+        """Returns C-contiguous '>u2' pixels as bytes in the bus format."""
+        if self.color_depth == 12:
+            packed = self._optimizers['color_converter'].rgb565_to_rgb444(
+                pixels
+            )
+            return memoryview(packed)
+        return memoryview(pixels).cast('B')
+
+    def _wire_size(self, count: int) -> int:
+        """Bytes that `count` pixels take on the bus."""
+        if self.color_depth == 12:
+            return (count + 1) // 2 * 3
+        return count * 2
+
+    def _send_pixels(
+            self, region: Tuple[int, int, int, int], pixels: np.ndarray
+    ):
+        """
+        Sends a C-contiguous '>u2' array to a clamped region and records it
+        in the shadow copy of the panel.
+        """
+        x0, y0, x1, y1 = region
+        data = self._wire(pixels)
+        with self._spi_lock, self._te_transfer():
+            self.set_window(x0, y0, x1 - 1, y1 - 1)
+            self.write_pixels(data)
+
+        self._shadow[y0:y1, x0:x1] = pixels
+        if x1 - x0 == self.width and y1 - y0 == self.height:
+            self._shadow_valid = True
+
+    # --- Tearing effect ---
+
+    def enable_te_sync(
+            self,
+            pin: Optional[int] = None,
+            source: Optional[TeSource] = None,
+            window: float = 0.001
+    ) -> TeSync:
+        """
+        Turns on the panel's TE output and synchronizes transfers to it.
+
+        Every transfer then starts right after the TE edge that marks the
+        vertical blanking, so full frames no longer tear. Pass
+        `te_sync.wait` to `FrameScheduler(vsync=...)` to pace an animation
+        on the panel refresh as well. The memory and emulator transports
+        simulate a 60 Hz panel.
+
+        The SPI lock is taken before waiting for the edge, so a panel
+        sharing the D/C pin (`MultiDisplay`) cannot start a transfer in
+        between; it waits for this panel's blanking window instead.
+
+        Args:
+            pin: GPIO wired to TE (read through the transport).
+            source: An edge source to use instead of `pin`, e.g. a
+                    `MockTeSource`.
+            window: See `TeSync`.
+
+        Returns:
+            The `TeSync`, also available as `te_sync`; its `get_stats()`
+            counts the transfers that made the blanking window.
+        """
+        if source is None:
+            if pin is None:
+                raise ValueError("Either pin or source is required.")
+            source = self.transport.create_te_source(pin)
+        self.disable_te_sync()
+        with self._bus_lock:
+            self._write_command(CMD_TEON)
+            self._write_data(0x00)  # V-blanking information only
+            self.te_sync = TeSync(source, window)
+        return self.te_sync
+
+    def disable_te_sync(self):
+        """Turns the TE output off; transfers start immediately again."""
+        if self.te_sync is None:
+            return
+        with self._bus_lock:
+            self._write_command(CMD_TEOFF)
+            self.te_sync.close()
+            self.te_sync = None
+
+    def _te_transfer(self):
+        """Context that aligns the enclosed transfer to vertical blanking."""
+        if self.te_sync is None:
+            return contextlib.nullcontext()
+        return self.te_sync.transfer()
+
+    # --- Hardware scrolling ---
+
+    def set_scroll_area(self, start: int = 0, end: Optional[int] = None):
+        """
+        Defines the hardware scrolling area and resets the offset to 0.
+
+        The controller scrolls along the panel's long axis: rows in
+        rotation 0/180, columns in rotation 90/270. Lines outside
+        [start, end) stay fixed.
+
+        While the offset is non-zero, the other drawing methods address
+        the panel memory unscrolled; use `scroll_in` to draw the lines
+        that scroll into view, and `reset_scroll` before returning to
+        regular full-frame updates.
+
+        Args:
+            start: First scrolling line in screen coordinates.
+            end: End (exclusive) of the scrolling lines, or None for the
+                 end of the screen.
+        """
+        length = self._native_height
+        end = length if end is None else end
+        if not 0 <= start < end <= length:
+            raise ValueError(
+                f"Invalid scroll area [{start}, {end}) for {length} lines."
+            )
+        _, reverse = SCROLL_AXIS[self._rotation]
+        top, bottom = (length - end, start) if reverse else \
+            (start, length - end)
+        scroll = end - start
+
+        with self._bus_lock:
+            self._write_command(CMD_VSCRDEF)
+            self._write_data([
+                top >> 8, top & 0xFF,
+                scroll >> 8, scroll & 0xFF,
+                bottom >> 8, bottom & 0xFF,
+            ])
+            self._scroll_area = (start, end)
+            self._scroll_offset = 0
+            self._write_scroll_start()
+
+    @property
+    def scroll_offset(self) -> int:
+        """Lines the scrolling area is shifted towards its start."""
+        return self._scroll_offset
+
+    def scroll_to(self, offset: int):
+        """
+        Sets the scroll offset without transferring any pixels.
+
+        Screen line `start + k` of the scrolling area then shows the
+        unscrolled line `start + (k + offset) % (end - start)`, so growing
+        offsets move the content up (or left in landscape).
+        """
+        if self._scroll_area is None:
+            self.set_scroll_area()
+        start, end = self._scroll_area
+        with self._bus_lock:
+            self._scroll_offset = offset % (end - start)
+            self._write_scroll_start()
+
+    def scroll_by(self, lines: int) -> int:
+        """
+        Advances the scroll offset by `lines` (negative scrolls back).
+
+        Returns:
+            The new scroll offset.
+        """
+        self.scroll_to(self._scroll_offset + lines)
+        return self._scroll_offset
+
+    def reset_scroll(self):
+        """Restores the unscrolled full-screen mapping."""
+        if self._scroll_area is None:
+            return
+        self.set_scroll_area()
+        self._scroll_area = None
+
+    def scroll_in(self, strip: Image.Image):
+        """
+        Scrolls by the strip's thickness and streams only the new lines.
+
+        The strip is drawn into the panel memory lines that wrapped around
+        from the start of the scrolling area, so it appears at its end.
+        Use it for tickers and logs: each step transfers only the strip.
+
+        Args:
+            strip: The new lines. For the row axis (rotation 0/180) an image
+                   `width` pixels wide; for the column axis (rotation
+                   90/270) an image `height` pixels tall.
+        """
+        if self._scroll_area is None:
+            self.set_scroll_area()
+        start, end = self._scroll_area
+        axis, _ = SCROLL_AXIS[self._rotation]
+
+        if strip.mode != "RGB":
+            strip = strip.convert("RGB")
+        rgb565 = self._optimizers['color_converter'].rgb_to_rgb565(
+            np.asarray(strip)
+        ).reshape(strip.height, strip.width)
+        if axis == 'x':
+            rgb565 = rgb565.T  # lines along the first axis
+        lines, span = rgb565.shape
+        cross = self.width if axis == 'y' else self.height
+        if span != cross:
+            raise ValueError(
+                f"Strip must span {cross} pixels across the scroll axis."
+            )
+        if not 0 < lines <= end - start:
+            raise ValueError(
+                f"Strip must have 1 to {end - start} lines."
+            )
+
+        with self._bus_lock:
+            first = self._scroll_offset
+            self.scroll_by(lines)
+
+            # The new lines occupy unscrolled lines first, first + 1, ...
+            # which wrap at most once
+            size = end - start
+            runs = [(first, min(size, first + lines))]
+            if first + lines > size:
+                runs.append((0, first + lines - size))
+
+            items = []
+            j = 0
+            for u0, u1 in runs:
+                part = rgb565[j:j + u1 - u0]
+                j += u1 - u0
+                if axis == 'y':
+                    region = (0, start + u0, self.width, start + u1)
+                else:
+                    region = (start + u0, 0, start + u1, self.height)
+                    part = part.T
+                part = np.ascontiguousarray(part, dtype='>u2')
+                self.framebuffer.view(region)[...] = part
+                items.append((region, part))
+            self._send_batch(items)
+
+    def _write_scroll_start(self):
+        """Sends VSCSAD for the current scroll area and offset."""
+        start, end = self._scroll_area
+        length = self._native_height
+        _, reverse = SCROLL_AXIS[self._rotation]
+        top = length - end if reverse else start
+        offset = -self._scroll_offset if reverse else self._scroll_offset
+        line = top + offset % (end - start)
+        self._write_command(CMD_VSCSAD)
+        self._write_data([line >> 8, line & 0xFF])
+
+    def get_memory_stats(self) -> dict:
+        """Returns the buffer pool statistics (hits, misses, hit_rate...)."""
+        return self._optimizers['memory_pool'].get_stats()
+
+    # --- Asynchronous submit/flip mode ---
+
+    def start_pipeline(
+            self, max_pending: int = 1, max_regions: int = 8
+    ) -> FramePipeline:
+        """
+        Starts the background writer used by `submit` and `flip`.
+
+        While the writer transfers frame N, the caller can render frame N+1.
+        Calling this again returns the running pipeline.
+
+        Args:
+            max_pending: Maximum number of queued frames. When the queue is
+                         full, the oldest frame is dropped (latest wins).
+            max_regions: Maximum number of regions sent per frame.
+        """
+        if self._pipeline is None or not self._pipeline.running:
+            self._pipeline = FramePipeline(self, max_pending, max_regions)
+            self._pipeline.start()
+        return self._pipeline
+
+    def stop_pipeline(self, drain: bool = True):
+        """Stops the background writer, optionally writing pending frames."""
+        if self._pipeline is not None:
+            self._pipeline.stop(drain=drain)
+            self._pipeline = None
+
+    def submit(
+            self,
+            image: Union[
+                Image.Image, np.ndarray, List[Tuple[int, int, np.ndarray]]
+            ],
+            regions: Optional[Sequence[Tuple[int, int, int, int]]] = None
+    ):
+        """
+        Queues a frame for asynchronous transfer and returns immediately.
+
+        The image must not be modified after submission. The pipeline is
+        started on first use.
+
+        Args:
+            image: A full-screen PIL image, a '>u2' RGB565 array of
+                   shape (height, width) that is sent without conversion,
+                   or a list of (x0, y0, pixels) RGB565 rectangles (see
+                   `display_rgb565_rects`).
+            regions: Dirty regions to send, or None for the whole frame.
+        """
+        self.start_pipeline().submit(image, regions)
+
+    @property
+    def back_buffer(self) -> Image.Image:
+        """The pipeline-owned image to draw the next frame into."""
+        return self.start_pipeline().back_buffer
+
+    def flip(
+            self,
+            regions: Optional[Sequence[Tuple[int, int, int, int]]] = None
+    ) -> Image.Image:
+        """
+        Submits `back_buffer` and returns the next buffer to draw into.
+
+        Args:
+            regions: Regions changed since the previous flip, or None.
+        """
+        return self.start_pipeline().flip(regions)
+
+    def wait_pipeline(self, timeout: Optional[float] = None) -> bool:
+        """Waits until all submitted frames are on the panel."""
+        if self._pipeline is None:
+            return True
+        return self._pipeline.wait(timeout)
+
+    def get_pipeline_stats(self) -> dict:
+        """Returns the pipeline counters (submitted, written, dropped...)."""
+        if self._pipeline is None:
+            return {}
+        return self._pipeline.get_stats()
 
     def close(self):
         """Cleans up resources (turns off backlight, closes SPI handle)."""
         try:
-            self.pi.write(self.backlight_pin, 0)
-            if hasattr(self, 'spi_handle') and self.spi_handle >= 0:
-                self.pi.spi_close(self.spi_handle)
+            self.stop_pipeline()
+            self._save_chunk_profile()
+            self.disable_te_sync()
+            self._stop_fade()
+            self._drive_backlight(0)
         finally:
-            if self.pi.connected:
-                self.pi.stop()
+            self._optimizers['color_converter'].close()
+            self.transport.close()
 
     def dispoff(self):
         """DISPOFF."""
         self._write_command(CMD_DISPOFF)
-        self.pi.write(self.backlight_pin, 0)
+        self._stop_fade()
+        self._drive_backlight(0)
 
     def sleep(self):
         """Puts the display into sleep mode."""
         self._write_command(CMD_SLPIN)
-        self.pi.write(self.backlight_pin, 0)
+        self._stop_fade()
+        self._drive_backlight(0)
 
     def wake(self):
         """Wakes the display from sleep mode."""
         self._write_command(CMD_SLPOUT)
-        self.pi.write(self.backlight_pin, 1)
+        self._drive_backlight(self.brightness)
+
+    # --- Backlight ---
+
+    def set_brightness(self, level: float):
+        """
+        Sets the backlight brightness with PWM on the backlight pin.
+
+        Only the GPIO is touched: no pixel data is sent, so dimming costs
+        nothing on the SPI bus. A running fade is stopped. Transports
+        without PWM turn the backlight fully on for any level above 0.
+
+        Args:
+            level: Duty cycle from 0.0 (off) to 1.0 (full brightness).
+        """
+        self._stop_fade()
+        self.brightness = min(1.0, max(0.0, float(level)))
+        self._drive_backlight(self.brightness)
+
+    def fade_to(self, level: float, duration: float = 0.5, wait: bool = True):
+        """
+        Changes the backlight brightness gradually.
+
+        The duty cycle is updated `FADE_STEPS_PER_SEC` times per second by a
+        background thread, so frames can be drawn during a fade (e.g. to
+        fade in a new screen). Starting another fade, `set_brightness` or
+        `sleep` stops the running one where it is.
+
+        Args:
+            level: Target duty cycle from 0.0 to 1.0.
+            duration: Fade time in seconds.
+            wait: Return only when the fade is finished.
+        """
+        self._stop_fade()
+        level = min(1.0, max(0.0, float(level)))
+        if duration <= 0 or level == self.brightness:
+            self.set_brightness(level)
+            return
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._run_fade,
+            args=(self.brightness, level, duration, stop),
+            name="st7789v-fade",
+            daemon=True,
+        )
+        self._fade = (thread, stop)
+        thread.start()
+        if wait:
+            thread.join()
+
+    def wait_fade(self, timeout: Optional[float] = None) -> bool:
+        """Waits for a running fade; returns False on timeout."""
+        if self._fade is None:
+            return True
+        thread = self._fade[0]
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def _run_fade(
+            self, start: float, end: float, duration: float,
+            stop: threading.Event
+    ):
+        began = time.monotonic()
+        while True:
+            t = min(1.0, (time.monotonic() - began) / duration)
+            self.brightness = start + (end - start) * t
+            self._drive_backlight(self.brightness)
+            if t >= 1.0 or stop.wait(1.0 / FADE_STEPS_PER_SEC):
+                return
+
+    def _stop_fade(self):
+        """Stops a running fade at its current brightness."""
+        if self._fade is None:
+            return
+        thread, stop = self._fade
+        stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+        self._fade = None
+
+    def _drive_backlight(self, duty: float):
+        self.transport.set_pwm(
+            self.backlight_pin, duty, self.backlight_frequency
+        )
+
+
+def _solid_color(pixels: np.ndarray) -> Optional[int]:
+    """Returns the RGB565 value if all pixels are the same, else None."""
+    if pixels.size == 0:
+        return None
+    first = pixels[0, 0]
+    # The corners reject most non-uniform regions without a full scan
+    if pixels[-1, -1] != first or pixels[0, -1] != first \
+            or pixels[-1, 0] != first:
+        return None
+    if not (pixels == first).all():
+        return None
+    return int(first)
@@ -0,0 +1,283 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Tearing-effect (TE) line synchronization.
+
+After TEON, the ST7789V raises its TE output when the panel enters
+vertical blanking. `TeSync` timestamps those edges so the driver can start
+each transfer right after one (the panel then never shows a half-written
+frame), and so a `FrameScheduler` can pace frames on the panel's own
+refresh clock instead of fixed sleeps.
+
+Edge sources:
+
+- `PigpioTeSource`: a pigpio edge callback on the GPIO wired to TE, timed
+  with pigpio's own edge tick.
+- `MockTeSource`: a thread producing edges at a fixed refresh rate, used
+  by the memory and emulator transports and for tests.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, Optional, Tuple
+
+# Receives the time of a rising TE edge (time.monotonic seconds)
+EdgeCallback = Callable[[float], None]
+
+
+class TeSource:
+    """Base class of the TE edge sources."""
+
+    def start(self, callback: EdgeCallback):
+        """Starts calling `callback` on every rising TE edge."""
+        raise NotImplementedError
+
+    def stop(self):
+        """Stops delivering edges."""
+
+
+class PigpioTeSource(TeSource):
+    """
+    Rising edges of a GPIO, through a pigpio callback.
+
+    Callbacks arrive over the daemon socket, often more than a blanking
+    window after the edge. Edges are therefore timed with the tick pigpio
+    recorded (a wrapping 32-bit microsecond counter), mapped to
+    `time.monotonic` through an anchor pair of (tick, monotonic) that is
+    refreshed about once per second to follow the drift between the
+    clocks.
+    """
+    # Seconds between anchor refreshes
+    ANCHOR_INTERVAL = 1.0
+    # Longest get_current_tick round trip accepted for an anchor
+    ANCHOR_MAX_RTT = 0.001
+
+    def __init__(self, pi, pin: int):
+        """
+        Args:
+            pi: A connected `pigpio.pi`.
+            pin: GPIO wired to the panel's TE output.
+        """
+        import pigpio
+
+        self._pigpio = pigpio
+        self.pi = pi
+        self.pin = pin
+        self._callback = None
+        self._anchor: Optional[Tuple[int, float]] = None
+        self._anchor_time = 0.0
+
+    def start(self, callback: EdgeCallback):
+        pigpio = self._pigpio
+        self.pi.set_mode(self.pin, pigpio.INPUT)
+        self.pi.set_pull_up_down(self.pin, pigpio.PUD_OFF)
+        self._reanchor()
+
+        def on_edge(gpio, level, tick):
+            callback(self.tick_to_monotonic(tick))
+
+        self._callback = self.pi.callback(
+            self.pin, pigpio.RISING_EDGE, on_edge
+        )
+
+    def _reanchor(self):
+        """Pairs the current pigpio tick with `time.monotonic`."""
+        before = time.monotonic()
+        tick = self.pi.get_current_tick()
+        after = time.monotonic()
+        # A slow round trip (e.g. the socket was busy) gives a poor pair
+        if after - before <= self.ANCHOR_MAX_RTT or self._anchor is None:
+            self._anchor = (tick, (before + after) / 2)
+        self._anchor_time = after
+
+    def tick_to_monotonic(self, tick: int) -> float:
+        """
+        Converts a pigpio tick to `time.monotonic` seconds. Ticks within
+        about 35 minutes of the anchor convert correctly across a wrap.
+        """
+        now = time.monotonic()
+        if now - self._anchor_time > self.ANCHOR_INTERVAL:
+            self._reanchor()
+        anchor_tick, anchor_time = self._anchor
+        # Signed 32-bit difference, so a counter wrap is harmless
+        diff = (tick - anchor_tick + (1 << 31)) % (1 << 32) - (1 << 31)
+        return min(anchor_time + diff / 1e6, now)
+
+    def stop(self):
+        if self._callback is not None:
+            self._callback.cancel()
+            self._callback = None
+
+
+class MockTeSource(TeSource):
+    """Edges at a fixed rate from a background thread (no hardware)."""
+
+    def __init__(self, refresh_hz: float = 60.0):
+        """
+        Args:
+            refresh_hz: Simulated panel refresh rate.
+        """
+        if refresh_hz <= 0:
+            raise ValueError("refresh_hz must be greater than 0.")
+        self.period = 1.0 / refresh_hz
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, callback: EdgeCallback):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(callback,), name="mock-te", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, callback: EdgeCallback):
+        next_edge = time.monotonic() + self.period
+        while not self._stop.wait(max(0.0, next_edge - time.monotonic())):
+            callback(time.monotonic())
+            next_edge += self.period
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class TeSync:
+    """
+    Tracks TE edges and books transfers against them.
+
+    A transfer is "in window" when it starts within `window` seconds of a
+    TE edge and ends before the next one. Transfers that start later can
+    show a tear line. Transfers that last longer than a refresh period are
+    overrun by the scan.
+    """
+    def __init__(
+            self,
+            source: TeSource,
+            window: float = 0.001,
+            timeout: float = 0.1
+    ):
+        """
+        Args:
+            source: Where the edges come from.
+            window: Seconds after an edge in which a transfer may start.
+                    The default is about the blanking time with the
+                    controller's default porches at 60 Hz.
+            timeout: Longest wait for an edge. A transfer then goes ahead
+                     unsynchronized, so a dead TE line never blocks drawing.
+        """
+        self.source = source
+        self.window = window
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._edge: Optional[float] = None
+        self._edges = 0
+        self._recent: Deque[float] = deque(maxlen=61)
+        self._period: Optional[float] = None
+        self._stats: Dict[str, float] = {
+            'transfers': 0, 'in_window': 0, 'late_starts': 0,
+            'overruns': 0, 'timeouts': 0, 'total_wait': 0.0,
+        }
+        source.start(self._on_edge)
+
+    def _on_edge(self, when: float):
+        with self._cond:
+            recent = self._recent
+            recent.append(when)
+            if len(recent) > 1:
+                # Mean over the last edges: callback jitter cancels out
+                self._period = (recent[-1] - recent[0]) / (len(recent) - 1)
+            self._edge = when
+            self._edges += 1
+            self._cond.notify_all()
+
+    @property
+    def refresh_hz(self) -> float:
+        """Panel refresh rate measured from the edges (0 until known)."""
+        period = self._period
+        return 1.0 / period if period else 0.0
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Waits for the next edge.
+
+        Returns:
+            The edge time (time.monotonic), or None on timeout.
+        """
+        with self._cond:
+            count = self._edges
+            if not self._cond.wait_for(
+                    lambda: self._edges != count, timeout
+            ):
+                return None
+            return self._edge
+
+    def wait_window(self) -> Optional[float]:
+        """
+        Returns at once if the last edge is less than `window` ago,
+        otherwise waits for the next edge (at most `timeout`).
+
+        Returns:
+            The edge the transfer is aligned to, or None on timeout.
+        """
+        began = time.monotonic()
+        with self._cond:
+            edge = self._edge
+            if edge is None or began - edge > self.window:
+                count = self._edges
+                if self._cond.wait_for(
+                        lambda: self._edges != count, self.timeout
+                ):
+                    edge = self._edge
+                else:
+                    edge = None
+                    self._stats['timeouts'] += 1
+        self._stats['total_wait'] += time.monotonic() - began
+        return edge
+
+    @contextmanager
+    def transfer(self) -> Iterator[Optional[float]]:
+        """
+        Waits for the blanking window, then books the enclosed transfer::
+
+            with te.transfer():
+                send_frame()
+        """
+        edge = self.wait_window()
+        start = time.monotonic()
+        yield edge
+        end = time.monotonic()
+
+        stats = self._stats
+        stats['transfers'] += 1
+        if edge is None:
+            return
+        if start - edge > self.window:
+            stats['late_starts'] += 1
+        elif self._period is not None and end - edge > self._period:
+            stats['overruns'] += 1
+        else:
+            stats['in_window'] += 1
+
+    def get_stats(self) -> dict:
+        """
+        Returns the edge and transfer counters.
+
+        Keys: edges, refresh_hz, transfers, in_window, late_starts,
+        overruns, timeouts, avg_wait_ms (time spent waiting for blanking).
+        """
+        stats = dict(self._stats)
+        total_wait = stats.pop('total_wait')
+        transfers = stats['transfers']
+        stats['avg_wait_ms'] = total_wait / transfers * 1000 \
+            if transfers else 0.0
+        stats['edges'] = self._edges
+        stats['refresh_hz'] = self.refresh_hz
+        return stats
+
+    def close(self):
+        """Stops the edge source."""
+        self.source.stop()
@@ -0,0 +1,538 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+SPI/GPIO transport backends for the ST7789V driver.
+
+The driver only needs three primitives: drive a GPIO pin, write bytes to
+the SPI bus, and stream a large pixel buffer (plus, optionally, PWM on the
+backlight pin). Each backend implements them differently:
+
+- `PigpioTransport`: everything through the pigpio daemon socket
+  (the original behavior).
+- `SpidevTransport`: pixel data through the kernel `/dev/spidev` driver
+  with large single ioctl transfers; DC/RST/backlight through pigpio.
+- `MemoryTransport`: no hardware; records traffic for tests and
+  benchmarks.
+- `EmulatorTransport`: no hardware; interprets the traffic with a virtual
+  ST7789V (see `emulator`) so the resulting picture can be inspected.
+"""
+import struct
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from .te_sync import MockTeSource, PigpioTeSource, TeSource
+
+Buffer = Union[bytes, bytearray, memoryview, list]
+# One batched write: (D/C level, payload)
+BatchOp = Tuple[int, Buffer]
+
+# GPIOs with a hardware PWM channel on the Raspberry Pi
+HARDWARE_PWM_PINS = (12, 13, 18, 19)
+# Duty cycle resolution of pigpio's DMA-timed PWM on the other pins
+SOFT_PWM_RANGE = 1000
+
+
+class Transport:
+    """Base class of the transport backends."""
+    name = "base"
+    dc_pin: Optional[int] = None
+    # Largest single SPI write the backend accepts
+    max_chunk_size = 16384
+    # Whether measured throughput reflects a real bus and is worth caching
+    persist_tuning = True
+    # Whether the constructor takes the panel's native width/height
+    needs_geometry = False
+
+    def setup_pins(
+            self, dc_pin: int, rst_pin: Optional[int], backlight_pin: int
+    ):
+        """
+        Remembers the control pins and configures them as outputs
+        (`rst_pin` may be None when the reset line is driven elsewhere).
+        """
+        self.dc_pin = dc_pin
+        self.setup_output(
+            [p for p in (rst_pin, dc_pin, backlight_pin) if p is not None]
+        )
+
+    def setup_output(self, pins: Iterable[int]):
+        """Configures the given GPIO pins as outputs."""
+        raise NotImplementedError
+
+    def gpio_write(self, pin: int, level: int):
+        """Drives a GPIO pin low (0) or high (1)."""
+        raise NotImplementedError
+
+    def set_pwm(self, pin: int, duty: float, frequency: int = 1000):
+        """
+        Drives a GPIO pin with a PWM signal.
+
+        Backends without PWM switch the pin fully on for any duty above 0.
+
+        Args:
+            pin: GPIO pin.
+            duty: Duty cycle from 0.0 (low) to 1.0 (high).
+            frequency: PWM frequency in Hz.
+        """
+        self.gpio_write(pin, 1 if duty > 0 else 0)
+
+    def create_te_source(self, pin: int) -> TeSource:
+        """Returns a source of the TE edges on `pin`."""
+        raise RuntimeError(f"The {self.name} transport cannot read a TE pin.")
+
+    def spi_write(self, data: Buffer):
+        """Writes one SPI transfer."""
+        raise NotImplementedError
+
+    def write_batch(self, ops: Sequence[BatchOp]) -> int:
+        """
+        Writes a sequence of SPI transfers, each with its D/C level.
+
+        The D/C pin is only driven when the level changes. Backends
+        override this to coalesce the whole sequence into fewer calls.
+
+        Returns:
+            The number of backend round trips used.
+        """
+        level = None
+        calls = 0
+        for dc, data in ops:
+            if dc != level:
+                self.gpio_write(self.dc_pin, dc)
+                level = dc
+                calls += 1
+            self.spi_write(data)
+            calls += 1
+        return calls
+
+    def close(self):
+        """Releases the SPI and GPIO resources."""
+
+
+class PigpioTransport(Transport):
+    """
+    SPI and GPIO through the pigpio daemon.
+
+    `write_batch` pipelines the daemon socket: the command packets of a
+    whole batch are sent back to back and the replies are read afterwards,
+    so a batch costs one round trip instead of one per GPIO toggle and SPI
+    write. The daemon executes the commands of a socket in order.
+
+    This goes below the pigpio Python API, to the daemon's socket protocol
+    (checked with pigpio 1.78): a command is four uint32 `cmd, p1, p2, p3`
+    followed by `p3` extension bytes, and each reply is 16 bytes echoing
+    `cmd, p1, p2` with the int32 result last. The socket and its lock are
+    `pi.sl.s` / `pi.sl.l`, the command codes `pigpio._PI_CMD_*`. If a
+    pigpio release lacks any of these, `write_batch` falls back to one
+    API call per operation.
+    """
+    name = "pigpio"
+    max_chunk_size = 32768  # well below the 64 KB command extension limit
+    # Commands in flight before the replies are read; bounds the reply
+    # backlog so the daemon never blocks on a full socket buffer
+    pipeline_depth = 256
+
+    def __init__(
+            self,
+            channel: int = 0,
+            speed_hz: int = 32_000_000,
+            pi=None
+    ):
+        """
+        Args:
+            channel: SPI channel (chip select) 0 or 1.
+            speed_hz: SPI clock speed in Hz.
+            pi: A connected `pigpio.pi` to share (e.g. between the panels
+                on CE0 and CE1); it is not stopped by `close`. Default: a
+                new connection.
+        """
+        self._init_pigpio(pi)
+        self._pipelined = self._can_pipeline()
+
+        self.spi_handle = self.pi.spi_open(channel, speed_hz, 0)
+        if self.spi_handle < 0:
+            self._disconnect()
+            raise RuntimeError(
+                f"Failed to open SPI bus: handle={self.spi_handle}"
+            )
+
+    def _init_pigpio(self, pi):
+        """
+        Sets up the pigpio connection and the GPIO state. Every transport
+        using pigpio for its GPIOs calls this from `__init__`.
+
+        Args:
+            pi: A connected `pigpio.pi` to share, or None to open a new
+                connection owned by this transport.
+        """
+        import pigpio
+
+        self._pigpio = pigpio
+        self._owns_pi = pi is None
+        self.pi = pigpio.pi() if pi is None else pi
+        if not self.pi.connected:
+            raise RuntimeError(
+                "Could not connect to pigpio daemon. Is it running?"
+            )
+        # Software PWM frequency configured per pin
+        self._pwm_frequency: Dict[int, int] = {}
+
+    def _can_pipeline(self) -> bool:
+        """Checks for the pigpio internals used by `write_batch`."""
+        sl = getattr(self.pi, 'sl', None)
+        sock = getattr(sl, 's', None)
+        return (
+            hasattr(sock, 'sendall') and hasattr(sock, 'recv')
+            and hasattr(getattr(sl, 'l', None), '__enter__')
+            and isinstance(getattr(self._pigpio, '_PI_CMD_WRITE', None), int)
+            and isinstance(getattr(self._pigpio, '_PI_CMD_SPIW', None), int)
+        )
+
+    def _disconnect(self):
+        if self._owns_pi and self.pi.connected:
+            self.pi.stop()
+
+    def setup_output(self, pins: Iterable[int]):
+        for pin in pins:
+            self.pi.set_mode(pin, self._pigpio.OUTPUT)
+
+    def gpio_write(self, pin: int, level: int):
+        self._pwm_frequency.pop(pin, None)  # a plain write stops PWM
+        self.pi.write(pin, level)
+
+    def set_pwm(self, pin: int, duty: float, frequency: int = 1000):
+        """
+        Uses the hardware PWM channel on GPIO 12/13/18/19 and pigpio's
+        DMA-timed PWM on other pins; neither needs CPU time once set.
+        Duty cycles of 0 and 1 are plain GPIO writes.
+        """
+        if duty <= 0 or duty >= 1:
+            self.gpio_write(pin, 1 if duty >= 1 else 0)
+        elif pin in HARDWARE_PWM_PINS:
+            self.pi.hardware_PWM(pin, frequency, round(duty * 1_000_000))
+        else:
+            if self._pwm_frequency.get(pin) != frequency:
+                self.pi.set_PWM_frequency(pin, frequency)
+                self.pi.set_PWM_range(pin, SOFT_PWM_RANGE)
+                self._pwm_frequency[pin] = frequency
+            self.pi.set_PWM_dutycycle(pin, round(duty * SOFT_PWM_RANGE))
+
+    def create_te_source(self, pin: int) -> TeSource:
+        return PigpioTeSource(self.pi, pin)
+
+    def spi_write(self, data: Buffer):
+        self.pi.spi_write(self.spi_handle, data)
+
+    def write_batch(self, ops: Sequence[BatchOp]) -> int:
+        if not self._pipelined:
+            return Transport.write_batch(self, ops)
+        pigpio = self._pigpio
+        sl = self.pi.sl
+        packets = bytearray()
+        pending = 0
+        round_trips = 0
+        level = None
+        with sl.l:
+            for dc, data in ops:
+                if dc != level:
+                    packets += struct.pack(
+                        'IIII', pigpio._PI_CMD_WRITE, self.dc_pin, dc, 0
+                    )
+                    level = dc
+                    pending += 1
+                if isinstance(data, list):
+                    data = bytes(data)
+                packets += struct.pack(
+                    'IIII', pigpio._PI_CMD_SPIW, self.spi_handle, 0,
+                    len(data)
+                )
+                packets += data
+                pending += 1
+                if pending >= self.pipeline_depth:
+                    self._send_pipelined(sl.s, packets, pending)
+                    packets = bytearray()
+                    pending = 0
+                    round_trips += 1
+            if pending:
+                self._send_pipelined(sl.s, packets, pending)
+                round_trips += 1
+        return round_trips
+
+    def _send_pipelined(self, sock, packets: bytearray, count: int):
+        """Sends `count` command packets and checks all replies."""
+        sock.sendall(packets)
+        size = count * 16  # each reply is cmd, p1, p2, result
+        replies = bytearray()
+        while len(replies) < size:
+            data = sock.recv(size - len(replies))
+            if not data:
+                raise RuntimeError("pigpio daemon closed the connection.")
+            replies += data
+        for (result,) in struct.iter_unpack('12xi', replies):
+            if result < 0:
+                raise RuntimeError(
+                    f"pigpio command failed: {self._pigpio.error_text(result)}"
+                )
+
+    def close(self):
+        try:
+            if self.spi_handle >= 0:
+                self.pi.spi_close(self.spi_handle)
+                self.spi_handle = -1
+        finally:
+            self._disconnect()
+
+
+class SpidevTransport(PigpioTransport):
+    """
+    Pixel data through the kernel spidev driver, GPIO through pigpio.
+
+    Each chunk is one `writebytes2` ioctl. The chunk size can grow up to
+    the spidev `bufsiz` limit (4096 bytes unless raised with e.g.
+    `spidev.bufsiz=65536` on the kernel command line). Command bytes also
+    use spidev, so only DC/RST/backlight toggles go through the daemon
+    socket.
+    """
+    name = "spidev"
+    BUFSIZ_PATH = "/sys/module/spidev/parameters/bufsiz"
+
+    def __init__(
+            self,
+            channel: int = 0,
+            speed_hz: int = 32_000_000,
+            bus: int = 0,
+            pi=None
+    ):
+        """
+        Args:
+            channel: SPI chip select (the Y in /dev/spidevX.Y).
+            speed_hz: SPI clock speed in Hz.
+            bus: SPI bus number (the X in /dev/spidevX.Y).
+            pi: A connected `pigpio.pi` to share for the GPIOs.
+        """
+        try:
+            import spidev
+        except ImportError as e:
+            raise RuntimeError(
+                "The spidev transport requires the 'spidev' package."
+            ) from e
+
+        self._init_pigpio(pi)
+        self.spi_handle = -1  # SPI is not opened through the daemon
+
+        self.spi = spidev.SpiDev()
+        try:
+            self.spi.open(bus, channel)
+        except OSError as e:
+            self._disconnect()
+            raise RuntimeError(
+                f"Failed to open /dev/spidev{bus}.{channel}: {e}"
+            ) from e
+        self.spi.max_speed_hz = speed_hz
+        self.spi.mode = 0
+        self.max_chunk_size = self._read_bufsiz()
+
+    def _read_bufsiz(self) -> int:
+        """Returns the kernel's largest single spidev transfer."""
+        try:
+            with open(self.BUFSIZ_PATH) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return 4096
+
+    def spi_write(self, data: Buffer):
+        self.spi.writebytes2(data)
+
+    # The SPI writes are kernel ioctls, so the generic batch loop already
+    # avoids the daemon for everything but the D/C toggles.
+    write_batch = Transport.write_batch
+
+    def close(self):
+        try:
+            self.spi.close()
+        finally:
+            super().close()
+
+
+class MemoryTransport(Transport):
+    """
+    In-memory backend that records GPIO levels and SPI traffic.
+
+    Used for tests and benchmarks on machines without a panel.
+    """
+    name = "memory"
+    max_chunk_size = 65536
+    persist_tuning = False
+
+    def __init__(
+            self,
+            channel: int = 0,
+            speed_hz: int = 32_000_000,
+            max_records: int = 1024
+    ):
+        """
+        Args:
+            channel: Ignored; accepted for a uniform constructor.
+            speed_hz: Ignored; accepted for a uniform constructor.
+            max_records: Number of most recent SPI writes kept in `records`
+                         as (D/C level, payload) tuples.
+        """
+        self.levels: Dict[int, int] = {}
+        # Duty cycle last set per pin (1.0/0.0 after a plain write)
+        self.pwm: Dict[int, float] = {}
+        self.records: Deque[Tuple[int, bytes]] = deque(maxlen=max_records)
+        self.bytes_written = 0
+        self.spi_calls = 0
+
+    def setup_output(self, pins: Iterable[int]):
+        for pin in pins:
+            self.levels.setdefault(pin, 0)
+
+    def gpio_write(self, pin: int, level: int):
+        self.levels[pin] = level
+        self.pwm[pin] = float(level)
+
+    def set_pwm(self, pin: int, duty: float, frequency: int = 1000):
+        self.levels[pin] = 1 if duty > 0 else 0
+        self.pwm[pin] = duty
+
+    def create_te_source(self, pin: int) -> TeSource:
+        """A simulated 60 Hz panel; `pin` is ignored."""
+        return MockTeSource()
+
+    def spi_write(self, data: Buffer):
+        payload = bytes(data)
+        dc = self.levels.get(self.dc_pin, 1) if self.dc_pin is not None \
+            else 1
+        self.records.append((dc, payload))
+        self.bytes_written += len(payload)
+        self.spi_calls += 1
+
+    def reset_counters(self):
+        """Clears the records and traffic counters."""
+        self.records.clear()
+        self.bytes_written = 0
+        self.spi_calls = 0
+
+
+class EmulatorTransport(Transport):
+    """Feeds the driver's SPI traffic into an `ST7789VEmulator`."""
+    name = "emulator"
+    max_chunk_size = 65536
+    persist_tuning = False
+    needs_geometry = True
+
+    def __init__(
+            self,
+            channel: int = 0,
+            speed_hz: int = 32_000_000,
+            width: int = 240,
+            height: int = 320
+    ):
+        """
+        Args:
+            channel: Ignored; accepted for a uniform constructor.
+            speed_hz: SPI clock used to estimate bus time.
+            width: Native panel width.
+            height: Native panel height.
+        """
+        from .emulator import ST7789VEmulator
+
+        self.speed_hz = speed_hz
+        self.device = ST7789VEmulator(width, height)
+        self.levels: Dict[int, int] = {}
+        self.pwm: Dict[int, float] = {}
+        self.rst_pin: Optional[int] = None
+        self.backlight_pin: Optional[int] = None
+
+    def setup_pins(
+            self, dc_pin: int, rst_pin: Optional[int], backlight_pin: int
+    ):
+        self.rst_pin = rst_pin
+        self.backlight_pin = backlight_pin
+        super().setup_pins(dc_pin, rst_pin, backlight_pin)
+
+    def setup_output(self, pins: Iterable[int]):
+        for pin in pins:
+            self.levels.setdefault(pin, 0)
+
+    def gpio_write(self, pin: int, level: int):
+        if pin == self.rst_pin and level == 0 and self.levels.get(pin):
+            self.device.reset()  # falling edge on RESX
+        self.levels[pin] = level
+        self.pwm[pin] = float(level)
+
+    def set_pwm(self, pin: int, duty: float, frequency: int = 1000):
+        self.levels[pin] = 1 if duty > 0 else 0
+        self.pwm[pin] = duty
+
+    def create_te_source(self, pin: int) -> TeSource:
+        """A simulated 60 Hz panel; `pin` is ignored."""
+        return MockTeSource()
+
+    def spi_write(self, data: Buffer):
+        dc = self.levels.get(self.dc_pin, 1) if self.dc_pin is not None \
+            else 1
+        self.device.feed(dc, bytes(data))
+
+    @property
+    def backlight(self) -> bool:
+        """True while the backlight pin is high."""
+        return bool(self.levels.get(self.backlight_pin, 0))
+
+    @property
+    def brightness(self) -> float:
+        """Duty cycle of the backlight pin (0.0 to 1.0)."""
+        return self.pwm.get(self.backlight_pin, 0.0)
+
+    def bus_time(self, nbytes: Optional[int] = None) -> float:
+        """
+        Estimated SPI time in seconds for `nbytes` (default: all bytes
+        sent so far) at the configured clock.
+        """
+        if nbytes is None:
+            nbytes = self.device.counters['bytes']
+        return nbytes * 8 / self.speed_hz
+
+
+TRANSPORTS: Dict[str, type] = {
+    PigpioTransport.name: PigpioTransport,
+    SpidevTransport.name: SpidevTransport,
+    MemoryTransport.name: MemoryTransport,
+    EmulatorTransport.name: EmulatorTransport,
+}
+
+
+def create_transport(
+        transport: Union[str, Transport],
+        channel: int = 0,
+        speed_hz: int = 32_000_000,
+        width: int = 240,
+        height: int = 320
+) -> Transport:
+    """
+    Returns a transport instance.
+
+    Args:
+        transport: A backend name from `TRANSPORTS`, or an existing
+                   `Transport` instance which is returned unchanged.
+        channel: SPI channel (chip select).
+        speed_hz: SPI clock speed in Hz.
+        width: Native panel width, for backends that model the panel.
+        height: Native panel height, for backends that model the panel.
+    """
+    if isinstance(transport, Transport):
+        return transport
+    try:
+        cls = TRANSPORTS[transport]
+    except KeyError:
+        raise ValueError(
+            f"Unknown transport '{transport}'. "
+            f"Choose from: {', '.join(TRANSPORTS)}"
+        ) from None
+    if cls.needs_geometry:
+        return cls(
+            channel=channel, speed_hz=speed_hz, width=width, height=height
+        )
+    return cls(channel=channel, speed_hz=speed_hz)
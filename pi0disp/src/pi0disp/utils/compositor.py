@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Region-local layer compositing.
+
+A `Compositor` keeps an opaque background and a stack of `Layer`s (sprites,
+HUD text...). Each layer's image is premultiplied once, when it is set, so
+compositing is one multiply-add per pixel. Moving, changing or hiding a
+layer only marks its old and new areas dirty, and `render()` rebuilds just
+those areas: the background is restored from the cached array, the layers
+are composited over it and the result is converted to RGB565, so the work
+per frame scales with the changed area, not with the screen size.
+"""
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from .performance_core import ColorConverter, RegionMerger, RegionOptimizer
+
+Region = Tuple[int, int, int, int]
+# A rectangle to draw: (x0, y0, '>u2' pixels of shape (height, width))
+Rect = Tuple[int, int, np.ndarray]
+Source = Union[Image.Image, np.ndarray]
+
+
+def _intersect(a: Region, b: Region) -> Optional[Region]:
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return (x0, y0, x1, y1)
+
+
+class Layer:
+    """
+    An image placed on a `Compositor`, stored premultiplied.
+
+    Create layers with `Compositor.add_layer`; changing the position,
+    image or visibility marks the affected areas dirty.
+    """
+    def __init__(
+            self,
+            compositor: 'Compositor',
+            image: Source,
+            x: int = 0,
+            y: int = 0,
+            visible: bool = True
+    ):
+        self._compositor = compositor
+        self._x = int(x)
+        self._y = int(y)
+        self._visible = visible
+        self._set(image)
+
+    @property
+    def bbox(self) -> Region:
+        """The area (x0, y0, x1, y1) covered by the layer."""
+        return (self._x, self._y, self._x + self.width, self._y + self.height)
+
+    @property
+    def visible(self) -> bool:
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible: bool):
+        if visible != self._visible:
+            self._visible = visible
+            self._compositor.mark_dirty(self.bbox)
+
+    def move_to(self, x: int, y: int):
+        """Moves the layer's top-left corner to (x, y)."""
+        x, y = int(x), int(y)
+        if (x, y) == (self._x, self._y):
+            return
+        if self._visible:
+            self._compositor.mark_dirty(self.bbox)
+        self._x, self._y = x, y
+        if self._visible:
+            self._compositor.mark_dirty(self.bbox)
+
+    def set_image(self, image: Source, x: Optional[int] = None,
+                  y: Optional[int] = None):
+        """
+        Replaces the layer's image (premultiplying it once), optionally
+        moving it at the same time.
+        """
+        if self._visible:
+            self._compositor.mark_dirty(self.bbox)
+        if x is not None:
+            self._x = int(x)
+        if y is not None:
+            self._y = int(y)
+        self._set(image)
+        if self._visible:
+            self._compositor.mark_dirty(self.bbox)
+
+    def _set(self, image: Source):
+        """
+        Stores `image` (PIL RGBA/RGB or uint8 array of shape (h, w, 4) or
+        (h, w, 3)) as premultiplied color and inverse alpha.
+        """
+        if isinstance(image, Image.Image):
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            image = np.asarray(image)
+        h, w, channels = image.shape
+        self.width, self.height = w, h
+        if channels == 3:
+            self.opaque = True
+            self._color = np.array(image, dtype=np.uint8)
+            self._inv_alpha = None
+            return
+        alpha = image[..., 3:4].astype(np.uint16)
+        self.opaque = bool((alpha == 255).all())
+        # color * alpha / 255, rounded; uint16 so compositing needs no cast
+        self._color = (
+            (image[..., :3] * alpha + 127) // 255
+        ).astype(np.uint16)
+        self._inv_alpha = 255 - alpha
+        if self.opaque:
+            self._color = self._color.astype(np.uint8)
+            self._inv_alpha = None
+
+    def _composite(self, out: np.ndarray, region: Region):
+        """Composites the layer over `out`, the uint16 RGB of `region`."""
+        part = _intersect(region, self.bbox)
+        if part is None:
+            return
+        x0, y0, x1, y1 = part
+        dst = out[y0 - region[1]:y1 - region[1], x0 - region[0]:x1 - region[0]]
+        src = (slice(y0 - self._y, y1 - self._y),
+               slice(x0 - self._x, x1 - self._x))
+        if self._inv_alpha is None:
+            dst[...] = self._color[src]
+            return
+        inv = self._inv_alpha[src]
+        dst *= inv
+        dst += 127
+        dst //= 255
+        dst += self._color[src]
+
+
+class Compositor:
+    """
+    Composites layers over a static background, only where something
+    changed.
+
+    Example::
+
+        comp = Compositor(background, merge_regions=lcd.merge_regions)
+        ball = comp.add_layer(ball_image, x, y)
+        while True:
+            ball.move_to(x, y)
+            lcd.display_rgb565_rects(comp.render())
+    """
+    def __init__(
+            self,
+            background: Source,
+            merge_regions: Optional[
+                Callable[[Sequence[Region], Optional[int]], List[Region]]
+            ] = None,
+            converter: Optional[ColorConverter] = None
+    ):
+        """
+        Args:
+            background: Opaque PIL image or uint8 RGB array; its size is
+                        the screen size.
+            merge_regions: Function merging dirty regions, called as
+                           `merge_regions(regions, max_regions)` (e.g.
+                           `ST7789V.merge_regions`). Default: a
+                           `RegionMerger`.
+            converter: Color converter for the RGB565 output.
+        """
+        self._merge = merge_regions or RegionMerger().merge
+        self._converter = converter or ColorConverter()
+        self.layers: List[Layer] = []
+        self._dirty: List[Region] = []
+        self.set_background(background)
+
+    def set_background(self, background: Source):
+        """Replaces the background; the whole screen becomes dirty."""
+        if isinstance(background, Image.Image):
+            background = np.asarray(background.convert("RGB"))
+        self._background = np.array(background[..., :3], dtype=np.uint8)
+        self.height, self.width = self._background.shape[:2]
+        self.mark_dirty((0, 0, self.width, self.height))
+
+    def update_background(self, image: Source, x: int = 0, y: int = 0):
+        """Overwrites part of the background with an opaque image."""
+        if isinstance(image, Image.Image):
+            image = np.asarray(image.convert("RGB"))
+        h, w = image.shape[:2]
+        region = self._clip((x, y, x + w, y + h))
+        if region is None:
+            return
+        x0, y0, x1, y1 = region
+        self._background[y0:y1, x0:x1] = \
+            image[y0 - y:y1 - y, x0 - x:x1 - x, :3]
+        self.mark_dirty(region)
+
+    def add_layer(
+            self,
+            image: Source,
+            x: int = 0,
+            y: int = 0,
+            visible: bool = True
+    ) -> Layer:
+        """Adds a layer on top of the existing ones."""
+        layer = Layer(self, image, x, y, visible)
+        self.layers.append(layer)
+        if visible:
+            self.mark_dirty(layer.bbox)
+        return layer
+
+    def remove_layer(self, layer: Layer):
+        """Removes a layer; the area it covered becomes dirty."""
+        self.layers.remove(layer)
+        if layer.visible:
+            self.mark_dirty(layer.bbox)
+
+    def mark_dirty(self, region: Region):
+        """Records an area that must be rebuilt by the next `render`."""
+        region = self._clip(region)
+        if region is not None:
+            self._dirty.append(region)
+
+    def render(self, max_regions: Optional[int] = 8) -> List[Rect]:
+        """
+        Rebuilds the dirty areas and returns them as RGB565 rectangles.
+
+        Each rectangle is a new array, so the result can be handed to
+        another thread (e.g. `ST7789V.display_rgb565_rects` on the
+        pipeline) while the next frame is composed.
+
+        Args:
+            max_regions: Upper bound on the number of merged regions, or
+                         None.
+        """
+        if not self._dirty:
+            return []
+        regions = self._merge(self._dirty, max_regions)
+        self._dirty = []
+        return [(r[0], r[1], self.compose(r)) for r in regions]
+
+    def compose(self, region: Region) -> np.ndarray:
+        """Composites one region and returns it as '>u2' RGB565."""
+        x0, y0, x1, y1 = region
+        out = self._background[y0:y1, x0:x1].astype(np.uint16)
+        for layer in self.layers:
+            if layer.visible:
+                layer._composite(out, region)
+        return self._converter.rgb_to_rgb565(out.astype(np.uint8))
+
+    def _clip(self, region: Region) -> Optional[Region]:
+        r = RegionOptimizer.clamp_region(region, self.width, self.height)
+        if r[2] <= r[0] or r[3] <= r[1]:
+            return None
+        return r
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Delta-compressed RGB565 animation container.
+
+Each frame stores only the rectangles that changed since the previous
+frame, as raw big-endian RGB565, so both the file and the SPI traffic
+shrink when most of the screen is static (e.g. face animations). The file
+layout is:
+
+- header: magic, size, frame count, flags, index offset
+- frame records: rectangle count, then per rectangle x0, y0, x1, y1 (x1/y1
+  exclusive) followed by its pixels
+- index: per frame the record offset, the keyframe it depends on and its
+  duration, plus an optional loop record (last frame -> first frame)
+
+Keyframes (the first frame, and every `key_interval` frames if set) cover
+the whole screen, so any frame can be reconstructed from the index.
+"""
+import mmap
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .frame_file import iter_source_frames
+from .image_processor import ImageProcessor
+from .performance_core import DirtyTileDetector, RegionMerger
+
+MAGIC = b'PI0DDLT1'
+# magic, width, height, frame count, flags, index offset
+HEADER = struct.Struct('<8sHHIIQ')
+RECORD = struct.Struct('<I')  # rectangles in the frame
+RECT = struct.Struct('<HHHH')  # x0, y0, x1, y1
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('key', '<u4'), ('duration', '<u4')])
+FLAG_LOOP = 0x1  # the index has a loop record after the frames
+DELTA_FILE_EXT = '.delta'
+
+Region = Tuple[int, int, int, int]
+# A rectangle to draw: (x0, y0, pixels of shape (height, width))
+Rect = Tuple[int, int, np.ndarray]
+
+
+class DeltaEncoder:
+    """
+    Writes a delta animation frame by frame.
+
+    Changed areas are found with a vectorized tile comparison against the
+    previous frame (`DirtyTileDetector`), merged with the SPI cost model
+    (`RegionMerger`) so the player does not pay the window overhead for
+    many tiny rectangles, and trimmed to the changed pixels.
+    """
+    def __init__(
+            self,
+            path: str,
+            width: int,
+            height: int,
+            tile_size: int = 8,
+            key_interval: int = 0,
+            merger: Optional[RegionMerger] = None
+    ):
+        """
+        Args:
+            path: Output file (written on `close`).
+            width: Frame width in pixels.
+            height: Frame height in pixels.
+            tile_size: Edge length of the comparison tiles.
+            key_interval: Store a full frame every N frames for faster
+                          random access (0: first frame only).
+            merger: Region merger (default: `RegionMerger()`).
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.key_interval = key_interval
+        self._detector = DirtyTileDetector(tile_size)
+        self._merger = merger or RegionMerger()
+        self._index: List[Tuple[int, int, int]] = []
+        self._first: Optional[np.ndarray] = None
+        self._prev = np.zeros((height, width), dtype='>u2')
+        self._key = 0
+        self._tmp = path + '.tmp'
+        self._file = open(self._tmp, 'wb')
+        try:
+            self._file.write(b'\0' * HEADER.size)
+        except BaseException:
+            self.abort()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._file.closed:
+            return
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_frame(self, pixels: np.ndarray, duration_ms: int) -> List[Region]:
+        """
+        Appends a frame.
+
+        Args:
+            pixels: '>u2' RGB565 array of shape (height, width).
+            duration_ms: How long the frame is shown.
+
+        Returns:
+            The rectangles stored for the frame.
+        """
+        if pixels.shape != (self.height, self.width):
+            raise ValueError(
+                f"Frame shape {pixels.shape} != {(self.height, self.width)}"
+            )
+        n = len(self._index)
+        if n == 0 or (self.key_interval and n % self.key_interval == 0):
+            regions = [(0, 0, self.width, self.height)]
+            self._key = n
+        else:
+            regions = self._diff(self._prev, pixels)
+
+        try:
+            offset = self._write_record(pixels, regions)
+        except BaseException:
+            self.abort()  # the file now ends in a partial record
+            raise
+        self._index.append((offset, self._key, duration_ms))
+        if self._first is None:
+            self._first = pixels.copy()
+        np.copyto(self._prev, pixels)
+        return regions
+
+    def close(self, loop: bool = True) -> Dict[str, float]:
+        """
+        Writes the index and finishes the file.
+
+        Args:
+            loop: Also store the delta from the last frame back to the
+                  first, so looping playback needs no keyframe.
+
+        Returns:
+            The `DeltaAnimation.get_stats` of the written file.
+        """
+        if not self._index:
+            self.abort()
+            raise ValueError("No frames were added")
+        f = self._file
+        try:
+            entries = list(self._index)
+            flags = 0
+            if loop and len(entries) > 1:
+                regions = self._diff(self._prev, self._first)
+                entries.append(
+                    (self._write_record(self._first, regions), 0, 0)
+                )
+                flags |= FLAG_LOOP
+
+            index_offset = f.tell()
+            f.write(np.array(entries, dtype=INDEX_DTYPE).tobytes())
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC, self.width, self.height, len(self._index), flags,
+                index_offset
+            ))
+            f.close()
+            os.replace(self._tmp, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        with DeltaAnimation(self.path) as anim:
+            return anim.get_stats()
+
+    def abort(self):
+        """Discards the partially written file."""
+        self._file.close()
+        if os.path.exists(self._tmp):
+            os.unlink(self._tmp)
+
+    def _diff(self, old: np.ndarray, new: np.ndarray) -> List[Region]:
+        """Returns the merged, trimmed rectangles where `new` differs."""
+        regions = self._detector.changed_regions(old, new)
+        regions = self._merger.merge(regions)
+        trimmed = []
+        for x0, y0, x1, y1 in regions:
+            changed = old[y0:y1, x0:x1] != new[y0:y1, x0:x1]
+            rows = np.flatnonzero(changed.any(axis=1))
+            if rows.size == 0:
+                continue
+            cols = np.flatnonzero(changed.any(axis=0))
+            trimmed.append((
+                x0 + int(cols[0]), y0 + int(rows[0]),
+                x0 + int(cols[-1]) + 1, y0 + int(rows[-1]) + 1
+            ))
+        return trimmed
+
+    def _write_record(self, pixels: np.ndarray, regions: List[Region]) -> int:
+        f = self._file
+        offset = f.tell()
+        f.write(RECORD.pack(len(regions)))
+        for x0, y0, x1, y1 in regions:
+            f.write(RECT.pack(x0, y0, x1, y1))
+            f.write(np.ascontiguousarray(pixels[y0:y1, x0:x1]).tobytes())
+        return offset
+
+
+class DeltaAnimation:
+    """
+    Read-only, memory-mapped access to a delta animation.
+
+    `rects(i)` returns the rectangles of frame `i` as zero-copy array views;
+    `render(i)` reconstructs a whole frame from its keyframe.
+    """
+    def __init__(self, path: str):
+        """
+        Args:
+            path: A file written by `DeltaEncoder`.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, self.width, self.height, self.count, flags, \
+                index_offset = HEADER.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise ValueError(f"'{path}' is not a pi0disp delta animation")
+            self.has_loop = bool(flags & FLAG_LOOP)
+            self._index = np.frombuffer(
+                self._mmap, dtype=INDEX_DTYPE,
+                count=self.count + self.has_loop, offset=index_offset
+            ).copy()
+            self._data_end = index_offset
+        except (ValueError, struct.error):
+            self._mmap.close()
+            raise
+        self.durations_ms = self._index['duration'][:self.count].tolist()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def duration(self) -> float:
+        """Total clip duration in seconds."""
+        return sum(self.durations_ms) / 1000
+
+    def rects(self, index: int) -> List[Rect]:
+        """Returns the (x0, y0, pixels) rectangles stored for a frame."""
+        return self._read_record(int(self._index['offset'][index]))
+
+    def loop_rects(self) -> List[Rect]:
+        """
+        Returns the rectangles that turn the last frame into the first
+        (the full first frame if the file has no loop record).
+        """
+        if self.has_loop:
+            return self._read_record(int(self._index['offset'][self.count]))
+        return self.rects(0)
+
+    def keyframe(self, index: int) -> int:
+        """Returns the keyframe that frame `index` is decoded from."""
+        return int(self._index['key'][index])
+
+    def render(self, index: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Reconstructs a whole frame (random access).
+
+        Returns:
+            '>u2' array of shape (height, width) (`out` if given).
+        """
+        if out is None:
+            out = np.zeros((self.height, self.width), dtype='>u2')
+        for i in range(self.keyframe(index), index + 1):
+            for x0, y0, pixels in self.rects(i):
+                h, w = pixels.shape
+                out[y0:y0 + h, x0:x0 + w] = pixels
+        return out
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns the compression statistics.
+
+        Keys: frames, raw_bytes (uncompressed RGB565 frames), file_bytes,
+        ratio (raw / file), bytes_per_frame (stored frame data, average),
+        pixel_bytes_per_frame (SPI pixel payload, average),
+        rects_per_frame.
+        """
+        rects = 0
+        pixels = 0
+        for i in range(self.count):
+            for _, _, p in self.rects(i):
+                rects += 1
+                pixels += p.size
+        raw = self.count * self.width * self.height * 2
+        size = len(self._mmap)
+        data = self._data_end - HEADER.size
+        if self.has_loop:
+            data -= self._data_end - int(self._index['offset'][self.count])
+        return {
+            'frames': self.count,
+            'raw_bytes': raw,
+            'file_bytes': size,
+            'ratio': round(raw / size, 2),
+            'bytes_per_frame': round(data / self.count, 1),
+            'pixel_bytes_per_frame': round(pixels * 2 / self.count, 1),
+            'rects_per_frame': round(rects / self.count, 2),
+        }
+
+    def close(self):
+        """Unmaps the file. Rectangle arrays must not be used afterwards."""
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # rectangle views still exported; unmapped when collected
+
+    def _read_record(self, offset: int) -> List[Rect]:
+        buf = self._mmap
+        (n,) = RECORD.unpack_from(buf, offset)
+        offset += RECORD.size
+        rects = []
+        for _ in range(n):
+            x0, y0, x1, y1 = RECT.unpack_from(buf, offset)
+            offset += RECT.size
+            w, h = x1 - x0, y1 - y0
+            pixels = np.frombuffer(
+                buf, dtype='>u2', count=w * h, offset=offset
+            ).reshape(h, w)
+            offset += w * h * 2
+            rects.append((x0, y0, pixels))
+        return rects
+
+
+def encode_delta_animation(
+        source: str,
+        path: str,
+        width: int,
+        height: int,
+        fit_mode: str = "contain",
+        default_fps: float = 30.0,
+        key_interval: int = 0,
+        tile_size: int = 8
+) -> Dict[str, float]:
+    """
+    Encodes a GIF/APNG or a directory of images as a delta animation.
+
+    Returns:
+        The compression statistics (see `DeltaAnimation.get_stats`).
+    """
+    processor = ImageProcessor()
+    converter = processor.optimizers['color_converter']
+    pixels = np.empty((height, width), dtype='>u2')
+    encoder = DeltaEncoder(path, width, height, tile_size, key_interval)
+    try:
+        for frame, duration in iter_source_frames(
+                source, max(1, round(1000 / default_fps))
+        ):
+            frame = processor.resize_with_aspect_ratio(
+                frame, width, height, fit_mode
+            )
+            converter.rgb_to_rgb565(np.asarray(frame.convert("RGB")), out=pixels)
+            encoder.add_frame(pixels, duration)
+    except BaseException:
+        encoder.abort()
+        raise
+    return encoder.close()
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped RGB565 frame files for animation playback.
+
+A clip (GIF, APNG or a directory of images) is decoded, resized and
+converted once into a frame file: a small header, the frames as raw
+big-endian RGB565, and a table of frame durations. Playback maps the file
+and reads frames as zero-copy array views, while a `FramePrefetcher`
+thread pages upcoming frames in and releases the ones already shown, so
+memory use stays bounded regardless of clip length.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from typing import Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from .image_cache import find_images
+from .image_processor import ImageProcessor
+from .performance_core import get_cache_dir
+
+MAGIC = b'PI0DFRM1'
+# magic, width, height, frame count, frame data offset, durations offset
+HEADER = struct.Struct('<8sHHIQQ')
+DATA_OFFSET = 4096  # frames start on a page boundary
+FRAME_FILE_EXT = '.frames'
+
+
+def iter_source_frames(
+        source: str, default_ms: int
+) -> Iterator[Tuple[Image.Image, int]]:
+    """Yields (frame, duration in ms) from an animation or a directory."""
+    if os.path.isdir(source):
+        for path in find_images(source, recursive=False):
+            with Image.open(path) as img:
+                yield img.convert("RGB"), default_ms
+        return
+    with Image.open(source) as img:
+        for frame in ImageSequence.Iterator(img):
+            duration = int(frame.info.get('duration') or default_ms)
+            yield frame.convert("RGB"), duration
+
+
+def convert_to_frame_file(
+        source: str,
+        path: str,
+        width: int,
+        height: int,
+        fit_mode: str = "contain",
+        default_fps: float = 30.0
+) -> int:
+    """
+    Converts a clip into a frame file, one frame at a time.
+
+    Args:
+        source: GIF/APNG/animated WebP file or a directory of images
+                (played in file name order).
+        path: Frame file to write.
+        width: Frame width in pixels.
+        height: Frame height in pixels.
+        fit_mode: "contain" or "cover".
+        default_fps: Frame rate for frames without a duration.
+
+    Returns:
+        The number of frames written.
+    """
+    processor = ImageProcessor()
+    converter = processor.optimizers['color_converter']
+    pixels = np.empty((height, width), dtype='>u2')
+    durations = []
+
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(b'\0' * DATA_OFFSET)
+            for frame, duration in iter_source_frames(
+                    source, max(1, round(1000 / default_fps))
+            ):
+                frame = processor.resize_with_aspect_ratio(
+                    frame, width, height, fit_mode
+                )
+                converter.rgb_to_rgb565(
+                    np.asarray(frame.convert("RGB")), out=pixels
+                )
+                f.write(memoryview(pixels).cast('B'))
+                durations.append(duration)
+            if not durations:
+                raise ValueError(f"No frames found in '{source}'")
+
+            durations_offset = f.tell()
+            f.write(np.asarray(durations, dtype='<u4').tobytes())
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC, width, height, len(durations), DATA_OFFSET,
+                durations_offset
+            ))
+        os.replace(tmp, path)
+    except BaseException:
+        # Also on Ctrl+C: never leave a partial frame file behind
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return len(durations)
+
+
+def cached_frame_file(
+        source: str,
+        width: int,
+        height: int,
+        fit_mode: str = "contain",
+        default_fps: float = 30.0
+) -> str:
+    """
+    Returns a frame file for a clip from the pi0disp cache, converting the
+    clip first if it changed or was never converted.
+
+    Files are named `<clip and settings>-<clip version>`, so converting a
+    changed clip removes the frame files of its older versions.
+    """
+    source = os.path.abspath(source)
+    st = os.stat(source)
+    name = _digest(f"{source}|{width}x{height}|{fit_mode}|{default_fps:g}")
+    version = _digest(f"{st.st_mtime_ns}|{st.st_size}")[:8]
+    directory = clip_cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}-{version}{FRAME_FILE_EXT}")
+    if not os.path.exists(path):
+        convert_to_frame_file(
+            source, path, width, height, fit_mode, default_fps
+        )
+        for entry in os.listdir(directory):
+            if entry.startswith(name + '-') and \
+                    entry.endswith(FRAME_FILE_EXT) and \
+                    entry != os.path.basename(path):
+                os.unlink(os.path.join(directory, entry))
+    return path
+
+
+def clip_cache_dir() -> str:
+    """Directory of the frame files written by `cached_frame_file`."""
+    return os.path.join(get_cache_dir(), 'clips')
+
+
+def clear_clip_cache() -> int:
+    """Deletes all cached frame files and returns how many were removed."""
+    directory = clip_cache_dir()
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    for name in os.listdir(directory):
+        if name.endswith(FRAME_FILE_EXT):
+            os.unlink(os.path.join(directory, name))
+            removed += 1
+    return removed
+
+
+def _digest(key: str) -> str:
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+class FrameFile:
+    """
+    Read-only, memory-mapped access to a frame file.
+
+    `frame(i)` returns a '>u2' array view of shape (height, width) straight
+    into the mapping; nothing is copied or decoded.
+    """
+    def __init__(self, path: str):
+        """
+        Args:
+            path: A file written by `convert_to_frame_file`.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, self.width, self.height, self.count, offset, \
+                durations_offset = HEADER.unpack_from(self._mmap)
+            if magic != MAGIC:
+                raise ValueError(f"'{path}' is not a pi0disp frame file")
+            self.frame_bytes = self.width * self.height * 2
+            self._offset = offset
+            self.durations_ms = np.frombuffer(
+                self._mmap, dtype='<u4', count=self.count,
+                offset=durations_offset
+            ).tolist()
+            self._frames = np.frombuffer(
+                self._mmap, dtype='>u2',
+                count=self.count * self.width * self.height, offset=offset
+            ).reshape(self.count, self.height, self.width)
+        except (ValueError, struct.error):
+            self._mmap.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def duration(self) -> float:
+        """Total clip duration in seconds."""
+        return sum(self.durations_ms) / 1000
+
+    def frame(self, index: int) -> np.ndarray:
+        """Returns frame `index` as a zero-copy RGB565 array."""
+        return self._frames[index]
+
+    def advise(self, start: int, stop: int, need: bool):
+        """
+        Tells the kernel that frames [start, stop) are needed soon, or no
+        longer needed (their pages can be dropped).
+        """
+        advice = 'MADV_WILLNEED' if need else 'MADV_DONTNEED'
+        if not hasattr(mmap, advice) or start >= stop:
+            return
+        begin = self._offset + start * self.frame_bytes
+        end = self._offset + stop * self.frame_bytes
+        begin -= begin % mmap.PAGESIZE  # madvise needs page alignment
+        self._mmap.madvise(getattr(mmap, advice), begin, end - begin)
+
+    def close(self):
+        """Unmaps the file. Frame arrays must not be used afterwards."""
+        self._frames = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # frame views still exported; unmapped when collected
+
+
+class FramePrefetcher:
+    """
+    Pages upcoming frames of a `FrameFile` in on a background thread.
+
+    The render loop calls `get(index)`; the thread then makes sure the next
+    `depth` frames are resident (so the display writer never waits on
+    storage) and lets the kernel drop frames that have been shown, so about
+    `depth + 1` frames are mapped in at any time.
+    """
+    def __init__(self, frames: FrameFile, depth: int = 8, loop: bool = False):
+        """
+        Args:
+            frames: The clip to play.
+            depth: Number of frames to keep ready ahead of playback.
+            loop: If True, the first frames are prefetched near the end.
+        """
+        if depth < 1:
+            raise ValueError("depth must be 1 or greater.")
+        self._frames = frames
+        self.depth = depth
+        self.loop = loop
+        self._cond = threading.Condition()
+        self._position = -1  # last frame returned by get()
+        self._resident: Set[int] = set()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'frames': 0, 'ready': 0, 'waited': 0}
+
+    def start(self):
+        """Starts the prefetch thread."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(
+            target=self._loop, name="frame-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops the prefetch thread."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def get(self, index: int) -> np.ndarray:
+        """
+        Returns frame `index` and moves the prefetch window past it.
+
+        Frames that were not prefetched (e.g. after a seek) are still
+        returned; they are just read on demand.
+        """
+        with self._cond:
+            self._stats['frames'] += 1
+            self._stats[
+                'ready' if index in self._resident else 'waited'
+            ] += 1
+            self._position = index
+            self._cond.notify_all()
+        return self._frames.frame(index)
+
+    def get_stats(self) -> dict:
+        """Returns frames served and how many of them were prefetched."""
+        with self._cond:
+            return dict(self._stats)
+
+    def _wanted(self) -> List[int]:
+        """The frames that should be resident, in playback order."""
+        count = len(self._frames)
+        ahead = [self._position + k for k in range(1, self.depth + 1)]
+        if self.loop:
+            return [i % count for i in ahead]
+        return [i for i in ahead if i < count]
+
+    def _loop(self):
+        frames = self._frames
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running:
+                        return
+                    wanted = self._wanted()
+                    todo = [i for i in wanted if i not in self._resident]
+                    if todo:
+                        break
+                    self._cond.wait()
+                stale = [
+                    i for i in self._resident
+                    if i not in wanted and i != self._position
+                ]
+                self._resident.difference_update(stale)
+
+            for i in stale:
+                frames.advise(i, i + 1, False)
+            index = todo[0]
+            frames.advise(index, index + 1, True)
+            # Fault the pages in, one read per page
+            frames.frame(index).reshape(-1)[::mmap.PAGESIZE // 2].sum()
+            with self._cond:
+                self._resident.add(index)
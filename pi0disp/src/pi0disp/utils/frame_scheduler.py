@@ -0,0 +1,209 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Deadline-based frame scheduler for animation loops.
+
+Frames are paced against absolute deadlines on the monotonic clock
+(start + n * period), so sleep jitter and rendering time never accumulate
+into drift, and the achieved frame rate and missed deadlines are measured.
+"""
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+POLICY_DROP = "drop"
+POLICY_SLOW = "slow"
+POLICIES = (POLICY_DROP, POLICY_SLOW)
+# Longest wait for a display refresh before a frame starts without it
+VSYNC_TIMEOUT = 0.1
+
+
+class FrameScheduler:
+    """
+    Paces a render loop to a target frame rate.
+
+    Blocking use::
+
+        scheduler = FrameScheduler(30)
+        while running:
+            dt = scheduler.tick()  # sleeps until the next frame is due
+            update(dt)
+            render()
+
+    Non-blocking use, rendering only when a frame is due::
+
+        while running:
+            handle_requests()
+            if scheduler.poll():
+                render()
+
+    When a frame starts after its deadline, the policy decides what
+    happens to the schedule:
+
+    - "drop": stay on the original time grid. Slots that have already
+      passed are skipped (counted as dropped), so the animation keeps real
+      time and the loop catches up without a burst of frames.
+    - "slow": render every frame, but restart the grid at the late frame,
+      so the frame rate drops under load instead of skipping frames.
+
+    With a `vsync` function (e.g. `ST7789V.te_sync.wait`), `tick()` wakes
+    a quarter period early and starts the frame on the next display refresh,
+    and the grid follows the refresh times, so pacing runs on the panel's
+    clock rather than the CPU's.
+    """
+    def __init__(
+            self,
+            fps: float,
+            policy: str = POLICY_DROP,
+            tolerance: float = 0.002,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], None] = time.sleep,
+            vsync: Optional[Callable[[float], Optional[float]]] = None
+    ):
+        """
+        Args:
+            fps: Target frames per second.
+            policy: "drop" or "slow" (see the class docstring).
+            tolerance: Lateness in seconds that is not counted as a missed
+                       deadline (absorbs sleep jitter).
+            clock: Monotonic time source in seconds.
+            sleep: Sleep function used while waiting for a deadline.
+            vsync: Called as `vsync(timeout)`; waits for the next display
+                   refresh and returns its time on `clock`, or None on
+                   timeout. Used by `tick()` only.
+        """
+        if fps <= 0:
+            raise ValueError("fps must be greater than 0.")
+        if policy not in POLICIES:
+            raise ValueError(
+                f"Unknown policy '{policy}'. Choose from: {', '.join(POLICIES)}"
+            )
+        self.period = 1.0 / fps
+        self.policy = policy
+        self.tolerance = tolerance
+        self._clock = clock
+        self._sleep = sleep
+        self.vsync = vsync
+
+        self._deadline: float = 0.0
+        self._last_start: float = 0.0
+        self._started = False
+        self._frame_starts: Deque[float] = deque(maxlen=61)
+        self._stats: Dict[str, float] = {}
+        self.reset()
+
+    @property
+    def fps(self) -> float:
+        """The target frame rate."""
+        return 1.0 / self.period
+
+    def reset(self):
+        """Restarts the schedule and clears the statistics."""
+        self._started = False
+        self._frame_starts.clear()
+        self._stats = {
+            'frames': 0, 'missed': 0, 'dropped': 0,
+            'max_late_ms': 0.0, 'total_late_ms': 0.0,
+        }
+
+    def time_until_due(self) -> float:
+        """Seconds until the next frame is due (0 if it already is)."""
+        if not self._started:
+            return 0.0
+        return max(0.0, self._deadline - self._clock())
+
+    def is_due(self) -> bool:
+        """True if the next frame is due, without starting it."""
+        return self.time_until_due() <= 0.0
+
+    def poll(self) -> bool:
+        """
+        Starts the next frame if it is due, without blocking.
+
+        Returns:
+            True if a frame was started and should be rendered.
+        """
+        if not self.is_due():
+            return False
+        self._start_frame(self._clock())
+        return True
+
+    def tick(self) -> float:
+        """
+        Waits for the next deadline and starts the frame.
+
+        Returns:
+            Seconds since the previous frame started (the target period on
+            the first frame), for time-based animation.
+        """
+        vsync = self.vsync
+        now = self._clock()
+        if self._started:
+            remaining = self._deadline - now
+            if vsync is not None:
+                remaining -= self.period / 4
+            if remaining > 0:
+                self._sleep(remaining)
+                now = self._clock() if vsync is not None \
+                    else max(self._clock(), self._deadline)
+        if vsync is not None and (not self._started or now < self._deadline):
+            # Early: start on the next refresh, which becomes the deadline.
+            # Past the deadline the refresh is already over (e.g. a TE-synced
+            # transfer waited for it), so the frame starts at once.
+            edge = vsync(VSYNC_TIMEOUT)
+            if edge is not None:
+                now = edge
+                if self._started:
+                    self._deadline = edge
+            else:
+                now = self._clock()
+        previous = self._last_start if self._started else now - self.period
+        self._start_frame(now)
+        return now - previous
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns the frame counters and the achieved frame rate.
+
+        Keys: frames, missed (frames started later than the tolerance),
+        dropped (skipped slots under the "drop" policy), max_late_ms,
+        avg_late_ms (over missed frames), fps (over the last 60 frames).
+        """
+        stats = dict(self._stats)
+        missed = stats['missed']
+        total_late_ms = stats.pop('total_late_ms')
+        stats['avg_late_ms'] = total_late_ms / missed if missed else 0.0
+        starts = self._frame_starts
+        stats['fps'] = (len(starts) - 1) / (starts[-1] - starts[0]) \
+            if len(starts) > 1 and starts[-1] > starts[0] else 0.0
+        stats['target_fps'] = self.fps
+        return stats
+
+    def _start_frame(self, now: float):
+        """Books a frame starting at `now` and sets the next deadline."""
+        stats = self._stats
+        if not self._started:
+            self._started = True
+            deadline = now
+        else:
+            deadline = self._deadline
+
+        late = now - deadline
+        if late > self.tolerance:
+            stats['missed'] += 1
+            stats['total_late_ms'] += late * 1000
+            stats['max_late_ms'] = max(stats['max_late_ms'], late * 1000)
+
+        if late >= self.period and self.policy == POLICY_DROP:
+            # Skip the slots that have passed, keeping the time grid
+            skipped = int(late // self.period)
+            stats['dropped'] += skipped
+            deadline += skipped * self.period
+        elif late > self.tolerance and self.policy == POLICY_SLOW:
+            deadline = now  # restart the grid at this frame
+
+        self._deadline = deadline + self.period
+        self._last_start = now
+        self._frame_starts.append(now)
+        stats['frames'] += 1
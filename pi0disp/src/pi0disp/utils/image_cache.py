@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of pre-converted images.
+
+Decoding, LANCZOS resizing and RGB565 conversion of the same asset are
+done once; the result is stored as raw big-endian RGB565 and memory-mapped
+on later use, so showing a cached image costs one mmap and one transfer
+(`ST7789V.display_rgb565`).
+"""
+import hashlib
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from .image_processor import ImageProcessor
+from .performance_core import get_cache_dir
+
+CACHE_VERSION = 1  # bump when the conversion output changes
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')
+
+
+class ImageCache:
+    """
+    Maps (file, target size, fit mode, gamma, resize quality) to a
+    memory-mapped RGB565 array of shape (height, width).
+
+    Entries are keyed on the absolute path, modification time and size of
+    the source file, so edited files are converted again. Each entry is a
+    headerless `.rgb565` file of width * height * 2 bytes.
+    """
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Args:
+            cache_dir: Directory for the blobs (default: `images` in the
+                       pi0disp cache directory).
+        """
+        self.cache_dir = cache_dir or os.path.join(get_cache_dir(), 'images')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._processor = ImageProcessor()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def entry_path(
+            self, path: str, width: int, height: int,
+            fit_mode: str = "contain", gamma: float = 1.0,
+            quality: str = "best"
+    ) -> str:
+        """Returns the blob file for an image and conversion settings."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        key = f"{CACHE_VERSION}|{path}|{st.st_mtime_ns}|{st.st_size}|" \
+            f"{width}x{height}|{fit_mode}|{gamma:g}|{quality}"
+        digest = hashlib.sha1(key.encode()).hexdigest()[:20]
+        return os.path.join(
+            self.cache_dir, f"{digest}_{width}x{height}.rgb565"
+        )
+
+    def get(
+            self, path: str, width: int, height: int,
+            fit_mode: str = "contain", gamma: float = 1.0,
+            quality: str = "best"
+    ) -> np.ndarray:
+        """
+        Returns the converted image, converting and storing it on a miss.
+
+        Args:
+            path: Source image file.
+            width: Target width in pixels.
+            height: Target height in pixels.
+            fit_mode: "contain" or "cover" (see
+                      `ImageProcessor.resize_with_aspect_ratio`).
+            gamma: Gamma correction applied before conversion (1.0: none).
+            quality: Resize preset (see `image_processor.QUALITY_PRESETS`).
+
+        Returns:
+            A read-only memory-mapped '>u2' array of shape (height, width).
+        """
+        entry = self.entry_path(path, width, height, fit_mode, gamma, quality)
+        nbytes = width * height * 2
+        try:
+            if os.path.getsize(entry) == nbytes:
+                self.stats['hits'] += 1
+                return np.memmap(
+                    entry, dtype='>u2', mode='r', shape=(height, width)
+                )
+        except OSError:
+            pass
+
+        pixels = self.convert(path, width, height, fit_mode, gamma, quality)
+        self.stats['misses'] += 1
+        # Write to a temporary file first so readers never see a partial blob
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pixels.tobytes())
+            os.replace(tmp, entry)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return np.memmap(entry, dtype='>u2', mode='r', shape=(height, width))
+
+    def convert(
+            self, path: str, width: int, height: int,
+            fit_mode: str = "contain", gamma: float = 1.0,
+            quality: str = "best"
+    ) -> np.ndarray:
+        """Decodes, resizes and converts an image without caching it."""
+        processor = self._processor
+        with Image.open(path) as img:
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            # Still unloaded for RGB/L, so JPEG draft decoding can apply
+            img = processor.resize_with_aspect_ratio(
+                img, width, height, fit_mode, quality
+            )
+        if gamma != 1.0:
+            img = processor.apply_gamma(img, gamma)
+        return processor.optimizers['color_converter'].rgb_to_rgb565(
+            np.asarray(img.convert("RGB"))
+        )
+
+    def precompile(
+            self, paths: Iterable[str], width: int, height: int,
+            fit_mode: str = "contain", gammas: Iterable[float] = (1.0,),
+            quality: str = "best"
+    ) -> List[str]:
+        """
+        Converts images into the cache ahead of time.
+
+        Returns:
+            The source files that could not be converted.
+        """
+        failed = []
+        for path in paths:
+            for gamma in gammas:
+                try:
+                    self.get(path, width, height, fit_mode, gamma, quality)
+                except (OSError, ValueError):
+                    failed.append(path)
+                    break
+        return failed
+
+    def clear(self) -> int:
+        """Deletes all cached blobs and returns how many were removed."""
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.rgb565'):
+                os.unlink(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+
+def find_images(directory: str, recursive: bool = True) -> Iterator[str]:
+    """Yields the image files in a directory, in sorted order."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root, name)
+        if not recursive:
+            break
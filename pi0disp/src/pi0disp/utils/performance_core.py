@@ -6,10 +6,15 @@ performance_core.py - パフォーマンス最適化のための汎用モジュ
 パフォーマンスを最適化するために設計された再利用可能なクラス群を提供します。
 各クラスは特定の最適化手法に焦点を当てています。
 """
+import heapq
+import json
+import os
+import platform
 import time
 import threading
 from collections import deque
-from typing import List, Tuple, Callable, Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Callable, Any, Dict, Optional, Union
 
 import numpy as np
 
@@ -20,29 +25,47 @@ class MemoryPool:
     再利用可能なバッファのプールを管理し、頻繁に割り当てられるメモリブロックを
     再利用することで、ガベージコレクション（不要なメモリを自動で解放する処理）の
     オーバーヘッド（余分な処理時間）を削減します。
+
+    バッファは2の累乗のサイズクラスで管理されるため、取得・返却はどちらも
+    O(1)で行えます。要求サイズより大きいバッファが返るので、呼び出し側は
+    必要な長さだけスライスして使います。
     """
     def __init__(
             self,
             max_pools: int = 8,
-            buffer_factory: Callable[[int], Any] = bytearray
+            buffer_factory: Callable[[int], Any] = bytearray,
+            min_size: int = 256
     ):
         """
         メモリプールを初期化します。
 
         Args:
-            max_pools (int): 各バッファサイズごとにプールに保持するバッファの
-                             最大数。例えば、サイズ100のバッファを最大8個まで
-                             プールに保持します。
+            max_pools (int): 各サイズクラスごとにプールに保持するバッファの
+                             最大数。
             buffer_factory (Callable): 新しいバッファを作成するための関数。
                                例: `bytearray` (バイト列を扱うためのバッファ)
+            min_size (int): 最小のサイズクラス（バイト数）。
         """
-        self._pools: Dict[int, deque] = {}  # バッファサイズごとに分類されたプール
+        self._pools: Dict[int, List[Any]] = {}  # サイズクラスごとのプール
         self._max_pools = max_pools
         self._buffer_factory = buffer_factory
+        self._min_size = min_size
         self._lock = threading.Lock()  # スレッドセーフにするためのロック
-        # （複数の処理が同時にメモリプールを操作しないようにする）
-        self._stats = {'hits': 0, 'misses': 0, 'created': 0}  # 統計情報
-        # （ヒット数、ミス数、作成数）
+        self._stats = self._new_stats()  # 統計情報
+
+    @staticmethod
+    def _new_stats() -> Dict[str, int]:
+        return {
+            'hits': 0, 'misses': 0, 'created': 0,
+            'returned': 0, 'discarded': 0,
+        }
+
+    def size_class(self, size: int) -> int:
+        """`size`を収容できる最小のサイズクラス（2の累乗）を返します。"""
+        size = int(size)  # NumPyの整数型も受け付ける
+        if size <= self._min_size:
+            return self._min_size
+        return 1 << (size - 1).bit_length()
 
     def get_buffer(self, size: int) -> Any:
         """
@@ -53,24 +76,18 @@ class MemoryPool:
             size (int): 必要な最小バッファサイズ。
 
         Returns:
-            バッファオブジェクト。
-        """
-        with self._lock:  # ロックを取得し、他のスレッドからの
-            # アクセスを一時的にブロック
-            # 指定されたサイズ以上の、利用可能な最小のバッファを探します
-            for pool_size in sorted(self._pools.keys()):
-                if pool_size >= size and self._pools[pool_size]:
-                    self._stats['hits'] += 1  # プールから取得できたので
-                    # ヒット数を増やす
-                    return self._pools[pool_size].pop()  # プールからバッファを
-                    # 取り出して返す
-
-            # 適切なバッファが見つからない場合、新しいバッファを作成します
-            self._stats['misses'] += 1  # プールから取得できなかったので
-            # ミス数を増やす
-            self._stats['created'] += 1  # 新しく作成したので作成数を増やす
-            return self._buffer_factory(size)  # バッファ生成関数を使って
-            # 新しいバッファを返す
+            サイズクラス分の長さを持つバッファオブジェクト。
+        """
+        size_class = self.size_class(size)
+        with self._lock:
+            pool = self._pools.get(size_class)
+            if pool:
+                self._stats['hits'] += 1
+                return pool.pop()
+            self._stats['misses'] += 1
+            self._stats['created'] += 1
+        # 新しいバッファの生成はロックの外で行う
+        return self._buffer_factory(size_class)
 
     def return_buffer(self, buffer: Any):
         """
@@ -79,27 +96,34 @@ class MemoryPool:
         Args:
             buffer: プールに戻すバッファオブジェクト。
         """
-        size = len(buffer)  # バッファのサイズを取得
-        with self._lock:  # ロックを取得
-            if size not in self._pools:
-                # そのサイズのプールがまだ存在しない場合、新しく作成
-                self._pools[size] = deque(maxlen=self._max_pools)
-
-            if len(self._pools[size]) < self._max_pools:
-                # プールに空きがある場合、バッファを追加
-                self._pools[size].append(buffer)
+        size = len(buffer)
+        if size < self._min_size:
+            return
+        # 2の累乗でないバッファは、収まる最大のクラスに入れる
+        size_class = 1 << (size.bit_length() - 1)
+        with self._lock:
+            pool = self._pools.setdefault(size_class, [])
+            if len(pool) < self._max_pools:
+                pool.append(buffer)
+                self._stats['returned'] += 1
+            else:
+                self._stats['discarded'] += 1
 
     def get_stats(self) -> dict:
-        """プール使用状況に関する統計情報（ヒット数、ミス数など）を返します。
+        """プール使用状況に関する統計情報（ヒット数、ヒット率など）を返します。
         """
-        with self._lock:  # ロックを取得
-            return self._stats.copy()  # 統計情報のコピーを返す
+        with self._lock:
+            stats: dict = dict(self._stats)
+            stats['pooled'] = sum(len(p) for p in self._pools.values())
+        requests = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / requests if requests else 0.0
+        return stats
 
     def clear(self):
         """すべてのプールを空にし、統計情報をリセットします。"""
-        with self._lock:  # ロックを取得
-            self._pools.clear()  # すべてのプールをクリア
-            self._stats = {'hits': 0, 'misses': 0, 'created': 0}  # 統計情報をリセット
+        with self._lock:
+            self._pools.clear()
+            self._stats = self._new_stats()
 
 
 class LookupTableCache:
@@ -138,10 +162,22 @@ class LookupTableCache:
         RGB565は、赤5ビット、緑6ビット、青5ビットで色を表現する形式で、
         メモリ使用量を抑えつつ色を表現するのに使われます。
         """
+        r_shift = (np.arange(256, dtype=np.uint16) >> 3) << 11  # 赤成分のシフト値
+        g_shift = (np.arange(256, dtype=np.uint16) >> 2) << 5   # 緑成分のシフト値
+        b_shift = (np.arange(256, dtype=np.uint16) >> 3)        # 青成分のシフト値
         return {
-            'r_shift': (np.arange(256, dtype=np.uint16) >> 3) << 11,  # 赤成分のシフト値
-            'g_shift': (np.arange(256, dtype=np.uint16) >> 2) << 5,   # 緑成分のシフト値
-            'b_shift': (np.arange(256, dtype=np.uint16) >> 3),        # 青成分のシフト値
+            'r_shift': r_shift,
+            'g_shift': g_shift,
+            'b_shift': b_shift,
+            # ビッグエンディアン版（変換結果をそのままSPIへ送るため）
+            'r_shift_be': r_shift.astype('>u2'),
+            'g_shift_be': g_shift.astype('>u2'),
+            'b_shift_be': b_shift.astype('>u2'),
+            # 赤と緑をまとめた結合テーブル（インデックスは r | g << 8）
+            'rg_be': (
+                ((np.arange(65536, dtype=np.uint16) & 0xF8) << 8)
+                | (((np.arange(65536, dtype=np.uint16) >> 8) & 0xFC) << 3)
+            ).astype('>u2'),
         }
 
     def _generate_gamma_tables(
@@ -303,12 +339,405 @@ class RegionOptimizer:
     ) -> Tuple[int, int, int, int]:
         """Clamps a region's coordinates to be within screen boundaries."""
         return (
-            max(0, region[0]),
-            max(0, region[1]),
-            min(width, region[2]),
-            min(height, region[3])
+            max(0, int(region[0])),
+            max(0, int(region[1])),
+            min(width, int(region[2])),
+            min(height, int(region[3]))
+        )
+
+
+class RegionMerger:
+    """
+    Merges dirty regions with an SPI cost model.
+
+    Sending a region costs a fixed per-window overhead (CASET, RASET, RAMWR
+    and the D/C toggles around them) plus its pixels. Two regions are merged
+    when sending their bounding box is cheaper than sending both, i.e. when
+    the extra pixels cost less than the saved window overhead.
+
+    Large inputs are first reduced to the row runs of a coarse coverage
+    raster, which bounds the number of regions by the raster size instead
+    of the sprite count. The best merges are then taken from a priority
+    queue of candidates found with vectorized scans; stale entries are
+    skipped lazily after each merge.
+    """
+    def __init__(
+            self,
+            window_overhead_us: float = 600.0,
+            bytes_per_sec: float = 2_500_000.0,
+            bytes_per_pixel: float = 2.0,
+            band_size: int = 64,
+            raster_threshold: int = 48,
+            raster_cell: int = 8,
+            top_k: int = 8
+    ):
+        """
+        Args:
+            window_overhead_us: Fixed cost of addressing one region.
+            bytes_per_sec: Pixel data throughput of the bus.
+            bytes_per_pixel: Bytes sent per pixel (2 for RGB565).
+            band_size: Height of the scan bands used when merges are
+                       forced down to `max_regions`.
+            raster_threshold: Above this many regions, the input is first
+                              reduced with a vectorized coverage raster.
+            raster_cell: Cell size of that raster in pixels.
+            top_k: Candidate partners kept per region.
+        """
+        self.window_overhead_us = window_overhead_us
+        self.bytes_per_sec = bytes_per_sec
+        self.bytes_per_pixel = bytes_per_pixel
+        self.band_size = band_size
+        self.raster_threshold = raster_threshold
+        self.raster_cell = raster_cell
+        self.top_k = top_k
+
+    @property
+    def overhead_px(self) -> float:
+        """The window overhead expressed as an equivalent pixel count."""
+        return (
+            self.window_overhead_us * 1e-6 * self.bytes_per_sec
+            / self.bytes_per_pixel
         )
 
+    def update_costs(
+            self,
+            window_overhead_us: Optional[float] = None,
+            bytes_per_sec: Optional[float] = None
+    ):
+        """Updates the cost model from measurements (None keeps a value)."""
+        if window_overhead_us is not None and window_overhead_us > 0:
+            self.window_overhead_us = window_overhead_us
+        if bytes_per_sec is not None and bytes_per_sec > 0:
+            self.bytes_per_sec = bytes_per_sec
+
+    def cost(self, regions: List[Tuple[int, int, int, int]]) -> float:
+        """Estimated transfer time of a region list in microseconds."""
+        pixels = sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions)
+        return len(regions) * self.window_overhead_us + (
+            pixels * self.bytes_per_pixel / self.bytes_per_sec * 1e6
+        )
+
+    def merge(
+            self,
+            regions: List[Tuple[int, int, int, int]],
+            max_regions: Optional[int] = None
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Merges regions where the cost model says it pays off.
+
+        Args:
+            regions: A list of (x0, y0, x1, y1) tuples.
+            max_regions: If given, further merges with the smallest cost
+                         increase are made until at most this many remain.
+
+        Returns:
+            The merged regions.
+        """
+        rects = [
+            tuple(r) for r in regions if r and r[2] > r[0] and r[3] > r[1]
+        ]
+        if len(rects) > self.raster_threshold:
+            rects = self._rasterize(rects)
+        if len(rects) > 1:
+            rects = self._merge_beneficial(rects)
+        if max_regions is not None and len(rects) > max_regions:
+            rects = self._merge_to_limit(rects, max(1, max_regions))
+        return rects
+
+    def _rasterize(self, rects: list) -> list:
+        """
+        Reduces many regions to the runs of a coarse coverage raster.
+
+        Each region is snapped outwards to `raster_cell` pixels, which adds
+        at most raster_cell - 1 pixels per side. That is small against the
+        window overhead, while overlaps between regions are removed.
+        """
+        g = self.raster_cell
+        coords = np.asarray(rects, dtype=np.int64)
+        ox, oy = int(coords[:, 0].min()), int(coords[:, 1].min())
+        width = int(coords[:, 2].max()) - ox
+        height = int(coords[:, 3].max()) - oy
+        cells = coords - (ox, oy, ox, oy)
+        cells[:, :2] //= g
+        cells[:, 2:] = -(-cells[:, 2:] // g)  # ceil
+
+        mask = np.zeros((-(-height // g), -(-width // g)), dtype=bool)
+        for cx0, cy0, cx1, cy1 in cells.tolist():
+            mask[cy0:cy1, cx0:cx1] = True
+
+        return [
+            (x0 + ox, y0 + oy, x1 + ox, y1 + oy)
+            for x0, y0, x1, y1 in mask_to_regions(mask, g, width, height)
+        ]
+
+    @staticmethod
+    def _area(r) -> int:
+        return (r[2] - r[0]) * (r[3] - r[1])
+
+    def _gain(self, a, b) -> float:
+        """Pixels saved by sending bbox(a, b) instead of a and b."""
+        bbox = RegionOptimizer._merge_two(a, b)
+        return (
+            self.overhead_px + self._area(a) + self._area(b)
+            - self._area(bbox)
+        )
+
+    def _merge_beneficial(self, rects: list) -> list:
+        """
+        Greedily merges the pair with the largest gain until no merge pays
+        off. Each region keeps its best `top_k` candidates in a heap, found
+        with one vectorized scan over all live regions; a region whose
+        candidates have all been merged away is rescanned when popped.
+        """
+        overhead = self.overhead_px
+        top_k = self.top_k
+        n = len(rects)
+        # Coordinates live in preallocated arrays: n inputs + n-1 merges
+        coords = np.zeros((2 * n, 4), dtype=np.int64)
+        coords[:n] = rects
+        areas = np.zeros(2 * n, dtype=np.int64)
+        areas[:n] = (coords[:n, 2] - coords[:n, 0]) * \
+            (coords[:n, 3] - coords[:n, 1])
+        # bytearray for fast scalar checks, NumPy view for vector updates
+        alive = bytearray(2 * n)
+        alive[:n] = b'\x01' * n
+        alive_np = np.frombuffer(alive, dtype=bool)
+        count = n
+        heap: List[Tuple[float, int, int]] = []
+
+        def push_candidates(i: int):
+            idx = np.flatnonzero(alive_np[:count])
+            idx = idx[idx != i]
+            if idx.size == 0:
+                return
+            r = coords[i]
+            c = coords[idx]
+            bbox_area = (
+                (np.maximum(c[:, 2], r[2]) - np.minimum(c[:, 0], r[0])) *
+                (np.maximum(c[:, 3], r[3]) - np.minimum(c[:, 1], r[1]))
+            )
+            gains = overhead + areas[i] + areas[idx] - bbox_area
+            positive = gains > 0
+            idx, gains = idx[positive], gains[positive]
+            if idx.size > top_k:
+                best = np.argpartition(gains, -top_k)[-top_k:]
+                idx, gains = idx[best], gains[best]
+            for j, gain in zip(idx.tolist(), gains.tolist()):
+                heapq.heappush(heap, (-gain, i, j))
+
+        def absorb_contained(k: int):
+            """Regions inside a merged box are free to merge."""
+            c = coords[:count]
+            r = coords[k]
+            inside = (c[:, 0] >= r[0]) & (c[:, 1] >= r[1]) & \
+                (c[:, 2] <= r[2]) & (c[:, 3] <= r[3])
+            inside[k] = False
+            alive_np[:count][inside] = False
+
+        for i in range(n):
+            push_candidates(i)
+
+        while heap:
+            _, i, j = heapq.heappop(heap)
+            if not (alive[i] and alive[j]):
+                # stale entry; the survivor looks for new partners
+                if alive[i]:
+                    push_candidates(i)
+                continue
+            alive[i] = alive[j] = 0
+            k = count
+            count += 1
+            coords[k] = (
+                min(coords[i, 0], coords[j, 0]),
+                min(coords[i, 1], coords[j, 1]),
+                max(coords[i, 2], coords[j, 2]),
+                max(coords[i, 3], coords[j, 3]),
+            )
+            areas[k] = (coords[k, 2] - coords[k, 0]) * \
+                (coords[k, 3] - coords[k, 1])
+            alive[k] = 1
+            absorb_contained(k)
+            push_candidates(k)
+
+        return [tuple(int(v) for v in coords[i])
+                for i in np.flatnonzero(alive_np[:count])]
+
+    def _merge_to_limit(self, rects: list, max_regions: int) -> list:
+        """
+        Forces merges of neighbors along a serpentine scan order, always
+        taking the pair with the smallest cost increase, until at most
+        `max_regions` regions remain.
+        """
+        band = max(1, self.band_size)
+
+        def order_key(r):
+            row = ((r[1] + r[3]) // 2) // band
+            cx = (r[0] + r[2]) // 2
+            return (row, cx if row % 2 == 0 else -cx)
+
+        rects = sorted(rects, key=order_key)
+        n = len(rects)
+        prev = list(range(-1, n - 1))
+        nxt = list(range(1, n + 1))
+        nxt[-1] = -1
+        alive = [True] * n
+        version = [0] * n
+        heap: List[Tuple[float, int, int, int, int]] = []
+
+        def push(i: int):
+            j = nxt[i]
+            if j != -1:
+                heapq.heappush(heap, (
+                    -self._gain(rects[i], rects[j]),
+                    i, j, version[i], version[j]
+                ))
+
+        for i in range(n - 1):
+            push(i)
+
+        count = n
+        while count > max_regions and heap:
+            _, i, j, vi, vj = heapq.heappop(heap)
+            if not (alive[i] and alive[j]) or nxt[i] != j or \
+                    version[i] != vi or version[j] != vj:
+                continue
+            rects[i] = RegionOptimizer._merge_two(rects[i], rects[j])
+            version[i] += 1
+            alive[j] = False
+            nxt[i] = nxt[j]
+            if nxt[j] != -1:
+                prev[nxt[j]] = i
+            count -= 1
+            push(i)
+            if prev[i] != -1:
+                push(prev[i])
+
+        return [r for r, a in zip(rects, alive) if a]
+
+
+class DirtyTileDetector:
+    """
+    Finds changed areas between two RGB565 frames by comparing them tile by
+    tile with vectorized NumPy operations.
+    """
+    def __init__(self, tile_size: int = 16):
+        """
+        Args:
+            tile_size: Edge length of the square comparison tiles in pixels.
+        """
+        if tile_size < 1:
+            raise ValueError("tile_size must be 1 or greater.")
+        self.tile_size = tile_size
+        self._diff = np.empty(0, dtype=bool)  # reusable comparison buffer
+
+    def changed_tiles(self, old: np.ndarray, new: np.ndarray) -> np.ndarray:
+        """
+        Returns a boolean mask with one entry per tile, True where any pixel
+        of the tile differs. Edge tiles may be smaller than `tile_size`.
+        """
+        if old.shape != new.shape:
+            raise ValueError(
+                f"Frame shapes differ: {old.shape} != {new.shape}"
+            )
+        h, w = new.shape[:2]
+        if self._diff.size < h * w:
+            self._diff = np.empty(h * w, dtype=bool)
+        diff = self._diff[:h * w].reshape(h, w)
+        np.not_equal(old, new, out=diff)
+
+        t = self.tile_size
+        rows = np.logical_or.reduceat(diff, np.arange(0, h, t), axis=0)
+        return np.logical_or.reduceat(rows, np.arange(0, w, t), axis=1)
+
+    def changed_regions(
+            self, old: np.ndarray, new: np.ndarray
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Returns the changed areas as (x0, y0, x1, y1) regions.
+
+        Horizontal runs of changed tiles become one region, and runs with
+        the same span on consecutive tile rows are joined vertically.
+        """
+        mask = self.changed_tiles(old, new)
+        h, w = new.shape[:2]
+        return mask_to_regions(mask, self.tile_size, w, h)
+
+
+def mask_to_regions(
+        mask: np.ndarray, tile: int, width: int, height: int
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Converts a boolean tile mask into (x0, y0, x1, y1) pixel regions.
+
+    Horizontal runs of set tiles become one region, and runs with the same
+    span on consecutive tile rows are joined vertically. Regions are clipped
+    to `width` x `height`.
+    """
+    regions: List[Tuple[int, int, int, int]] = []
+    open_runs: Dict[Tuple[int, int], int] = {}  # (x0, x1) -> index
+    padded = np.zeros(mask.shape[1] + 2, dtype=np.int8)
+    for ty in range(mask.shape[0]):
+        y0, y1 = ty * tile, min(height, (ty + 1) * tile)
+        if y0 >= height:
+            break
+        padded[1:-1] = mask[ty]
+        edges = np.flatnonzero(np.diff(padded))
+        runs: Dict[Tuple[int, int], int] = {}
+        for start, end in zip(edges[::2], edges[1::2]):
+            span = (int(start) * tile, min(width, int(end) * tile))
+            if span[0] >= span[1]:
+                continue
+            if span in open_runs:
+                i = open_runs[span]
+                regions[i] = (span[0], regions[i][1], span[1], y1)
+                runs[span] = i
+            else:
+                runs[span] = len(regions)
+                regions.append((span[0], y0, span[1], y1))
+        open_runs = runs
+    return regions
+
+
+def upscale_nearest(src: np.ndarray, scale: int, out: np.ndarray) -> np.ndarray:
+    """
+    Enlarges an image by an integer factor (pixel replication) into `out`.
+
+    Whole scale x scale blocks are filled with a single broadcast copy
+    through a strided 4D view of `out`, so there are no temporaries.
+
+    Args:
+        src: Array of shape (h, w) or (h, w, channels).
+        scale: Integer factor.
+        out: Destination of shape (H, W[, channels]) with H <= h * scale
+             and W <= w * scale (e.g. a framebuffer slice). Blocks cut off
+             by its right and bottom edges are filled partially.
+
+    Returns:
+        `out`.
+    """
+    H, W = out.shape[:2]
+    fh, fw = H // scale, W // scale  # whole blocks
+    rest = out.shape[2:]
+    if fh and fw:
+        sy, sx = out.strides[:2]
+        blocks = np.lib.stride_tricks.as_strided(
+            out, shape=(fh, scale, fw, scale) + rest,
+            strides=(sy * scale, sy, sx * scale, sx) + out.strides[2:]
+        )
+        np.copyto(blocks, src[:fh, None, :fw, None], casting='unsafe')
+    if W % scale and fh:
+        # Partial column of blocks at the right edge
+        np.copyto(
+            out[:fh * scale, fw * scale:],
+            np.repeat(src[:fh, fw:fw + 1], scale, axis=0), casting='unsafe'
+        )
+    if H % scale:
+        # Partial row of blocks at the bottom edge
+        np.copyto(
+            out[fh * scale:],
+            np.repeat(src[fh:fh + 1], scale, axis=1)[:, :W], casting='unsafe'
+        )
+    return out
 
 class PerformanceMonitor:
     """
@@ -356,55 +785,243 @@ class AdaptiveChunking:
     """
     Dynamically adjusts data transfer chunk sizes based on performance to
     optimize throughput.
+
+    The throughput of full-size chunks is tracked per chunk size. After
+    enough samples, the size is moved one step (hill climbing) in the
+    current direction while throughput keeps improving, and returns to the
+    best size found otherwise. The learned state can be saved and restored
+    with `get_state` / `load_state`.
     """
     def __init__(
             self,
             initial_size: int = 4096,
             min_size: int = 1024,
-            max_size: int = 16384
+            max_size: int = 16384,
+            samples_per_step: int = 10,
+            step: float = 1.25
     ):
         self.chunk_size = initial_size
         self.min_size = min_size
         self.max_size = max_size
+        self.samples_per_step = samples_per_step
+        self.step = step
         self._throughputs: deque[float] = deque(maxlen=20)
+        self._size_rates: Dict[int, float] = {}  # chunk size -> bytes/sec
+        self._samples = 0
+        self._direction = 1
         self._last_adjustment = time.monotonic()
+        self._lock = threading.Lock()
 
     def record_transfer(self, data_size: int, transfer_time: float):
         """Records a data transfer to adjust future chunk sizes."""
-        if transfer_time > 0:
-            self._throughputs.append(data_size / transfer_time)
-        
-        if time.monotonic() - self._last_adjustment > 1.0 and len(self._throughputs) >= 10:
+        if transfer_time <= 0:
+            return
+
+        rate = data_size / transfer_time
+        with self._lock:
+            self._throughputs.append(rate)
+            if data_size != self.chunk_size:
+                return  # only full chunks are comparable between sizes
+            self._record_rate(rate)
+
+    def record_batch(
+            self, data_size: int, transfer_time: float, chunk_size: int
+    ):
+        """
+        Records a batched transfer of `data_size` bytes cut into chunks of
+        `chunk_size`, timed as a whole.
+
+        `transfer_time` should exclude the non-pixel overhead of the batch.
+        Only batches cut at the current size with at least one full chunk
+        count; they tune the chunk size but do not enter `bytes_per_sec`.
+        """
+        if transfer_time <= 0:
+            return
+        with self._lock:
+            if chunk_size != self.chunk_size or data_size < chunk_size:
+                return
+            self._record_rate(data_size / transfer_time)
+
+    def _record_rate(self, rate: float):
+        """Adds a sample for the current chunk size (lock held)."""
+        prev = self._size_rates.get(self.chunk_size)
+        self._size_rates[self.chunk_size] = \
+            rate if prev is None else prev * 0.8 + rate * 0.2
+        self._samples += 1
+
+        if self._samples >= self.samples_per_step and \
+                time.monotonic() - self._last_adjustment > 0.5:
             self._adjust_chunk_size()
 
     def _adjust_chunk_size(self):
-        """Adjusts chunk size based on recent throughput."""
-        if len(self._throughputs) < 10:
-            return
+        """Moves the chunk size one step towards higher throughput."""
+        rates = self._size_rates
+        best = max(rates, key=rates.__getitem__)
+        if best != self.chunk_size:
+            # The last step made things worse: go back and turn around
+            self.chunk_size = best
+            self._direction = -self._direction
 
-        recent_avg = sum(list(self._throughputs)[-10:]) / 10
-        older_avg = sum(list(self._throughputs)[:-10]) / 10 \
-            if len(self._throughputs) > 10 else recent_avg
+        candidate = self._next_size(self.chunk_size, self._direction)
+        if candidate is not None and candidate not in rates:
+            self.chunk_size = candidate
 
-        if recent_avg > older_avg * 1.05:  # Throughput is improving
-            self.chunk_size = min(self.max_size, int(self.chunk_size * 1.2))
-        elif recent_avg < older_avg * 0.95:  # Throughput is degrading
-            self.chunk_size = max(self.min_size, int(self.chunk_size * 0.8))
-        
+        self._samples = 0
         self._last_adjustment = time.monotonic()
 
+    def _next_size(self, size: int, direction: int) -> Optional[int]:
+        """Returns the neighboring candidate size, or None at a limit."""
+        factor = self.step if direction > 0 else 1 / self.step
+        candidate = int(size * factor) // 256 * 256
+        candidate = max(self.min_size, min(self.max_size, candidate))
+        return None if candidate == size else candidate
+
     def get_chunk_size(self) -> int:
         """Returns the current optimal chunk size."""
         return self.chunk_size
 
+    @property
+    def best_chunk_size(self) -> int:
+        """The chunk size with the highest measured throughput so far."""
+        with self._lock:
+            if not self._size_rates:
+                return self.chunk_size
+            return max(self._size_rates, key=self._size_rates.__getitem__)
+
+    @property
+    def bytes_per_sec(self) -> float:
+        """Recent average throughput in bytes per second (0 if unknown)."""
+        with self._lock:
+            if not self._throughputs:
+                return 0.0
+            return sum(self._throughputs) / len(self._throughputs)
+
+    def get_state(self) -> Dict[str, float]:
+        """Returns the learned optimum for persisting."""
+        best = self.best_chunk_size
+        with self._lock:
+            rate = self._size_rates.get(best, 0.0)
+        return {'chunk_size': best, 'bytes_per_sec': rate}
+
+    def load_state(self, state: Dict[str, float]):
+        """Starts from a previously learned optimum."""
+        size = int(state.get('chunk_size', self.chunk_size))
+        with self._lock:
+            self.chunk_size = max(self.min_size, min(self.max_size, size))
+            rate = float(state.get('bytes_per_sec', 0.0))
+            if rate > 0:
+                self._size_rates[self.chunk_size] = rate
+
+
+def get_cache_dir() -> str:
+    """
+    Returns the pi0disp cache directory (created on demand).
+
+    Honors `XDG_CACHE_HOME` and falls back to `~/.cache/pi0disp`.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'pi0disp')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def load_json_cache(name: str) -> Dict[str, Any]:
+    """Reads a JSON cache file from the cache directory ({} if missing)."""
+    try:
+        with open(os.path.join(get_cache_dir(), name)) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_json_cache(name: str, data: Dict[str, Any]):
+    """Atomically writes a JSON cache file; errors are ignored."""
+    try:
+        path = os.path.join(get_cache_dir(), name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+# (right shift, mask) moving G1, B1, R2, G2, B2 of a '>u4' RGB565 pixel
+# pair into packed RGB444 position
+RGB444_PAIR_FIELDS = (
+    (7, 0x0F0000), (5, 0x00F000), (4, 0x000F00), (3, 0x0000F0), (1, 0x00000F)
+)
+ENGINE_CACHE_FILE = "rgb565_engine.json"
+
 
 class ColorConverter:
     """
     Provides fast color space conversion utilities using cached lookup tables.
+
+    RGB to RGB565 conversion has several interchangeable engines that
+    produce bit-identical results:
+
+    - "lut": three per-channel table gathers ORed together.
+    - "shift": bit masks and shifts on native uint16 arrays.
+    - "table": one gather from a combined red/green table indexed by the
+      two adjacent bytes of each pixel, plus a blue gather.
+    - "pil": Pillow's "BGR;16" converter (only on Pillow versions that
+      still provide that mode).
+
+    With engine="auto" (the default), the fastest verified engine on this
+    machine is measured once and the choice is cached per machine and
+    library versions.
+
+    With `workers` > 1, large images are split into horizontal bands that
+    are converted concurrently into the same output array (the NumPy
+    kernels release the GIL). Images under `parallel_min_pixels` are
+    converted on the calling thread, where a thread handoff would cost
+    more than it saves.
     """
-    def __init__(self):
+    ENGINES = ('lut', 'shift', 'table', 'pil')
+
+    _auto_engine: Optional[str] = None  # chosen once per process
+    _auto_lock = threading.Lock()
+
+    def __init__(
+            self,
+            engine: str = 'auto',
+            workers: int = 1,
+            parallel_min_pixels: int = 16384
+    ):
+        """
+        Args:
+            engine: "auto" or one of `ENGINES`.
+            workers: Threads converting one image (1: no threading,
+                     0: one per CPU core).
+            parallel_min_pixels: Smallest image converted in parallel.
+        """
+        if engine != 'auto' and engine not in self.ENGINES:
+            raise ValueError(
+                f"Unknown engine '{engine}'. "
+                f"Choose from: auto, {', '.join(self.ENGINES)}"
+            )
+        if workers < 0:
+            raise ValueError("workers must be 0 (all cores) or more.")
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_min_pixels = parallel_min_pixels
+        self._executor: Optional[ThreadPoolExecutor] = None
         self._rgb565_cache = LookupTableCache.get_instance('rgb565')
         self._gamma_cache = LookupTableCache.get_instance('gamma')
+        self._local = threading.local()  # per-thread scratch buffers
+        self._engine_name = engine
+        self._convert: Optional[Callable] = None
+        if engine != 'auto':
+            self._convert = getattr(self, '_convert_' + engine)
+
+    @property
+    def engine(self) -> str:
+        """The conversion engine in use (resolves "auto")."""
+        if self._engine_name == 'auto':
+            return self.select_engine()
+        return self._engine_name
 
     def rgb_to_rgb565_bytes(self, rgb_array: np.ndarray) -> bytes:
         """
@@ -416,12 +1033,329 @@ class ColorConverter:
         Returns:
             A byte string containing the RGB565 pixel data.
         """
-        r = self._rgb565_cache.get_table('r_shift')[rgb_array[:, :, 0]]
-        g = self._rgb565_cache.get_table('g_shift')[rgb_array[:, :, 1]]
-        b = self._rgb565_cache.get_table('b_shift')[rgb_array[:, :, 2]]
-        
-        rgb565 = r | g | b
-        return rgb565.astype('>u2').tobytes()
+        return self.rgb_to_rgb565(rgb_array).tobytes()
+
+    def rgb_to_rgb565(
+            self, rgb_array: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Converts an RGB NumPy array to a big-endian RGB565 array.
+
+        Args:
+            rgb_array: A uint8 NumPy array with shape (height, width, 3).
+                       A fourth (alpha) channel is ignored.
+            out: Optional '>u2' array with shape (height, width) that
+                 receives the result, e.g. a slice of a framebuffer.
+                 It may be a non-contiguous view.
+
+        Returns:
+            The '>u2' array holding the RGB565 pixels (`out` if given).
+        """
+        if rgb_array.ndim != 3 or rgb_array.shape[2] < 3:
+            raise ValueError(
+                f"rgb_array has shape {rgb_array.shape}, "
+                "expected (height, width, 3)"
+            )
+        # The engines rely on exactly three channels (see _convert_table)
+        rgb_array = rgb_array[:, :, :3]
+        shape = rgb_array.shape[:2]
+        if out is None:
+            out = np.empty(shape, dtype='>u2')
+        elif out.shape != shape:
+            raise ValueError(
+                f"out has shape {out.shape}, expected {shape}"
+            )
+        if self._convert is None:
+            self._convert = getattr(self, '_convert_' + self.engine)
+        if self.workers > 1 and shape[0] * shape[1] >= self.parallel_min_pixels:
+            self._convert_bands(rgb_array, out)
+        else:
+            self._convert(rgb_array, out)
+        return out
+
+    def rgb565_to_rgb444(
+            self, pixels: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Packs RGB565 pixels into the 12-bit RGB444 wire format of COLMOD
+        0x53: two pixels in three bytes (R1G1, B1R2, G2B2).
+
+        An odd pixel count is padded with a copy of the first pixel. The
+        controller writes that extra pixel at the start of the window
+        (its address counter wraps), which therefore keeps its color.
+
+        Args:
+            pixels: RGB565 array of any shape and byte order.
+            out: Optional uint8 array of 3 * ceil(n / 2) bytes.
+
+        Returns:
+            The packed uint8 array (`out` if given).
+        """
+        v = np.ascontiguousarray(pixels.reshape(-1), dtype='>u2')
+        n = v.size
+        pairs = (n + 1) // 2
+        if out is None:
+            out = np.empty(pairs * 3, dtype=np.uint8)
+        elif out.size != pairs * 3:
+            raise ValueError(f"out has {out.size} bytes, expected {pairs * 3}")
+        if n % 2:
+            v = np.concatenate((v, v[:1])).astype('>u2', copy=False)
+
+        # Each pixel pair as one word: (p1 << 16) | p2. Move the top 4 bits
+        # of the six channels next to each other in the low 24 bits.
+        word = v.view('>u4').astype(np.uint32)
+        acc = self._scratch((1, pairs), np.uint32, slot=2)[0]
+        tmp = self._scratch((1, pairs), np.uint32, slot=3)[0]
+        np.right_shift(word, 8, out=acc)
+        acc &= 0xF00000  # R1
+        for shift, mask in RGB444_PAIR_FIELDS:
+            np.right_shift(word, shift, out=tmp)
+            tmp &= mask
+            acc |= tmp
+        # Column-wise byte copies are much faster than one strided 4->3
+        # byte copy
+        columns = out.reshape(pairs, 3)
+        for k, shift in enumerate((16, 8, 0)):
+            np.right_shift(acc, shift, out=tmp)
+            np.copyto(columns[:, k], tmp, casting='unsafe')
+        return out
+
+    def _convert_bands(self, rgb_array: np.ndarray, out: np.ndarray):
+        """Converts horizontal bands concurrently into `out`."""
+        height = out.shape[0]
+        bands = min(self.workers, height)
+        bounds = [height * i // bands for i in range(bands + 1)]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers - 1,
+                thread_name_prefix='rgb565'
+            )
+        futures = [
+            self._executor.submit(
+                self._convert, rgb_array[y0:y1], out[y0:y1]
+            )
+            for y0, y1 in zip(bounds[1:-1], bounds[2:])
+        ]
+        # The calling thread converts the first band itself
+        try:
+            self._convert(rgb_array[:bounds[1]], out[:bounds[1]])
+        finally:
+            for future in futures:
+                future.result()
+
+    def close(self):
+        """Stops the conversion threads (they restart on demand)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # --- Conversion engines: (rgb_array, out) -> None ---
+
+    def _convert_lut(self, rgb_array: np.ndarray, out: np.ndarray):
+        tmp = self._scratch(out.shape)
+        np.take(
+            self._rgb565_cache.get_table('r_shift_be'), rgb_array[:, :, 0],
+            out=out, mode='clip'
+        )
+        np.take(
+            self._rgb565_cache.get_table('g_shift_be'), rgb_array[:, :, 1],
+            out=tmp, mode='clip'
+        )
+        out |= tmp
+        np.take(
+            self._rgb565_cache.get_table('b_shift_be'), rgb_array[:, :, 2],
+            out=tmp, mode='clip'
+        )
+        out |= tmp
+
+    def _convert_shift(self, rgb_array: np.ndarray, out: np.ndarray):
+        acc = self._scratch(out.shape, np.uint16, 0)
+        tmp = self._scratch(out.shape, np.uint16, 1)
+        np.bitwise_and(rgb_array[:, :, 0], 0xF8, out=acc)
+        acc <<= 8
+        np.bitwise_and(rgb_array[:, :, 1], 0xFC, out=tmp)
+        tmp <<= 3
+        acc |= tmp
+        np.right_shift(rgb_array[:, :, 2], 3, out=tmp)
+        acc |= tmp
+        out[...] = acc  # byte swap into big-endian
+
+    def _convert_table(self, rgb_array: np.ndarray, out: np.ndarray):
+        rgb = np.ascontiguousarray(rgb_array, dtype=np.uint8)
+        h, w = out.shape
+        # Unaligned little-endian view of each pixel's (r, g) byte pair
+        rg = np.ndarray(
+            (h, w), dtype='<u2', buffer=rgb, strides=(w * 3, 3)
+        )
+        np.take(
+            self._rgb565_cache.get_table('rg_be'), rg, out=out, mode='clip'
+        )
+        tmp = self._scratch(out.shape)
+        np.take(
+            self._rgb565_cache.get_table('b_shift_be'), rgb[:, :, 2],
+            out=tmp, mode='clip'
+        )
+        out |= tmp
+
+    def _convert_pil(self, rgb_array: np.ndarray, out: np.ndarray):
+        from PIL import Image
+
+        image = Image.fromarray(np.ascontiguousarray(rgb_array, np.uint8))
+        packed = image.convert('BGR;16').tobytes()  # little-endian 5-6-5
+        out[...] = np.frombuffer(packed, dtype='<u2').reshape(out.shape)
+
+    # --- Engine selection ---
+
+    @classmethod
+    def available_engines(cls) -> List[str]:
+        """Returns the engines usable with the installed libraries."""
+        engines = [e for e in cls.ENGINES if e != 'pil']
+        try:
+            from PIL import Image
+            Image.new('RGB', (1, 1)).convert('BGR;16')
+            engines.append('pil')
+        except (ImportError, ValueError, KeyError, OSError):
+            pass
+        return engines
+
+    @classmethod
+    def verify_engines(cls) -> Dict[str, bool]:
+        """
+        Checks every available engine against the "lut" reference.
+
+        The test images cover every value of every channel, and each engine
+        is also run with a non-contiguous input and output.
+
+        Returns:
+            Engine name -> True if its output is bit-identical.
+        """
+        y, x = np.mgrid[0:256, 0:256].astype(np.uint8)
+        images = [
+            np.stack((x, y, x ^ y), axis=2),
+            np.stack((x ^ y, x, y), axis=2),
+        ]
+        reference = cls('lut')
+        results = {}
+        for name in cls.available_engines():
+            converter = cls(name)
+            ok = True
+            try:
+                for rgb in images:
+                    expected = reference.rgb_to_rgb565(rgb)
+                    ok &= bool(np.array_equal(
+                        converter.rgb_to_rgb565(rgb), expected
+                    ))
+                    # Strided input, and output into a framebuffer slice
+                    target = np.zeros((256, 300), dtype='>u2')
+                    converter.rgb_to_rgb565(
+                        rgb[:, ::2], out=target[:, 10:138]
+                    )
+                    ok &= bool(np.array_equal(
+                        target[:, 10:138], expected[:, ::2]
+                    ))
+                    ok &= not target[:, :10].any() and \
+                        not target[:, 138:].any()
+            except (ImportError, ValueError):
+                ok = False
+            results[name] = ok
+        return results
+
+    @classmethod
+    def benchmark_engines(
+            cls, engines: Optional[List[str]] = None, repeat: int = 5
+    ) -> Dict[str, float]:
+        """
+        Times the engines on a full 320x240 frame plus a 64x64 region.
+
+        Returns:
+            Engine name -> best time in seconds for both conversions.
+        """
+        rng = np.random.default_rng(0)
+        samples = [
+            rng.integers(0, 256, (240, 320, 3), dtype=np.uint8),
+            rng.integers(0, 256, (64, 64, 3), dtype=np.uint8),
+        ]
+        outs = [np.empty(s.shape[:2], dtype='>u2') for s in samples]
+        timings = {}
+        for name in engines or cls.available_engines():
+            converter = cls(name)
+            for rgb, out in zip(samples, outs):  # warm up tables/buffers
+                converter.rgb_to_rgb565(rgb, out=out)
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for rgb, out in zip(samples, outs):
+                    converter.rgb_to_rgb565(rgb, out=out)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        return timings
+
+    @classmethod
+    def select_engine(cls, use_cache: bool = True) -> str:
+        """
+        Returns the fastest bit-identical engine on this machine.
+
+        The choice is made once per process. It is cached on disk per
+        machine, NumPy and Pillow version, so later runs skip the
+        measurement.
+        """
+        if cls._auto_engine is not None:
+            return cls._auto_engine
+        with cls._auto_lock:
+            if cls._auto_engine is not None:
+                return cls._auto_engine
+
+            import PIL
+            key = f"{platform.machine()}|numpy-{np.__version__}|" \
+                f"pillow-{PIL.__version__}"
+            available = cls.available_engines()
+            cached = load_json_cache(ENGINE_CACHE_FILE).get(key) \
+                if use_cache else None
+            if isinstance(cached, dict) and cached.get('engine') in available:
+                cls._auto_engine = cached['engine']
+                return cls._auto_engine
+
+            verified = [
+                name for name, ok in cls.verify_engines().items() if ok
+            ]
+            timings = cls.benchmark_engines(verified or ['lut'])
+            engine = min(timings, key=timings.get)
+            if use_cache:
+                entries = load_json_cache(ENGINE_CACHE_FILE)
+                entries[key] = {
+                    'engine': engine,
+                    'timings_ms': {
+                        k: round(v * 1000, 3) for k, v in timings.items()
+                    },
+                }
+                save_json_cache(ENGINE_CACHE_FILE, entries)
+            cls._auto_engine = engine
+            return engine
+
+    @staticmethod
+    def color_to_rgb565(color: Union[int, Tuple[int, int, int]]) -> int:
+        """
+        Converts an (r, g, b) tuple to an RGB565 integer.
+        Integers are treated as RGB565 values and returned unchanged.
+        """
+        if isinstance(color, int):
+            return color & 0xFFFF
+        r, g, b = color[:3]
+        return ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+
+    def _scratch(
+            self, shape: Tuple[int, int], dtype: Any = '>u2', slot: int = 0
+    ) -> np.ndarray:
+        """Returns a reusable per-thread work array of `shape`."""
+        size = shape[0] * shape[1]
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        key = (np.dtype(dtype).str, slot)
+        buf = buffers.get(key)
+        if buf is None or buf.size < size:
+            buf = buffers[key] = np.empty(size, dtype=dtype)
+        return buf[:size].reshape(shape)
 
     def apply_gamma(self, rgb_array: np.ndarray, gamma: float = 2.2) -> np.ndarray:
         """Applies gamma correction to an RGB NumPy array."""
@@ -430,17 +1364,23 @@ class ColorConverter:
 
 # --- Factory Function ---
 
-def create_optimizer_pack() -> dict:
+def create_optimizer_pack(conversion_workers: int = 1) -> dict:
     """
     Creates a standard dictionary of optimizer instances for convenience.
 
+    Args:
+        conversion_workers: Threads used by the color converter for large
+                            images (see `ColorConverter`).
+
     Returns:
         A dictionary containing instances of the core optimization classes.
     """
     return {
         'memory_pool': MemoryPool(),
         'region_optimizer': RegionOptimizer(),
+        'region_merger': RegionMerger(),
         'performance_monitor': PerformanceMonitor(),
         'adaptive_chunking': AdaptiveChunking(),
-        'color_converter': ColorConverter(),
+        'color_converter': ColorConverter(workers=conversion_workers),
+        'tile_detector': DirtyTileDetector(),
     }
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Cached text rendering for HUD overlays.
+
+Glyphs are rasterized once per font into a shared `GlyphAtlas`, strings
+are composed from the atlas and kept in an LRU cache, and drawing a cached
+string is a masked blend into the target buffer: no layout or FreeType
+rasterization happens while the text is unchanged, and changing text only
+copies glyphs out of the atlas.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+Font = Union[ImageFont.FreeTypeFont, ImageFont.ImageFont]
+Color = Tuple[int, int, int]
+Region = Tuple[int, int, int, int]
+
+
+def _font_key(font: Font) -> tuple:
+    """Identifies a font face and size (fonts loaded twice share a key)."""
+    path = getattr(font, 'path', None)
+    if isinstance(path, str):
+        return (path, getattr(font, 'size', 0), getattr(font, 'index', 0))
+    return ('id', id(font))
+
+
+class GlyphAtlas:
+    """
+    Coverage masks of the glyphs of one font, packed into a single 8-bit
+    array (shelf packing), with their bounding boxes and advances.
+
+    Use `GlyphAtlas.for_font(font)` to share one atlas per (font, size).
+    """
+    _atlases: Dict[tuple, 'GlyphAtlas'] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, font: Font, width: int = 512):
+        """
+        Args:
+            font: A PIL font.
+            width: Width of the atlas array in pixels.
+        """
+        self.font = font
+        self.array = np.zeros((64, width), dtype=np.uint8)
+        # char -> (atlas x, atlas y, w, h, bbox x0, bbox y0, advance)
+        self._glyphs: Dict[str, Tuple[int, int, int, int, int, int, float]] = {}
+        self._shelf_x = 0
+        self._shelf_y = 0
+        self._shelf_h = 0
+        self.rasterized = 0
+
+    @classmethod
+    def for_font(cls, font: Font) -> 'GlyphAtlas':
+        """Returns the shared atlas of a font, creating it on first use."""
+        key = _font_key(font)
+        with cls._lock:
+            atlas = cls._atlases.get(key)
+            if atlas is None:
+                atlas = cls._atlases[key] = cls(font)
+            return atlas
+
+    def glyph(self, char: str) -> Tuple[np.ndarray, int, int, float]:
+        """
+        Returns (coverage mask, bbox x0, bbox y0, advance) of a character,
+        rasterizing it on first use. The bbox offsets are relative to the
+        pen position, like `font.getbbox`.
+        """
+        entry = self._glyphs.get(char)
+        if entry is None:
+            entry = self._add(char)
+        ax, ay, w, h, bx, by, advance = entry
+        return self.array[ay:ay + h, ax:ax + w], bx, by, advance
+
+    def _add(self, char: str):
+        font = self.font
+        x0, y0, x1, y1 = (int(v) for v in font.getbbox(char))
+        w, h = max(0, x1 - x0), max(0, y1 - y0)
+        advance = float(font.getlength(char))
+        ax, ay = self._allocate(w, h)
+        if w and h:
+            glyph = Image.new("L", (w, h), 0)
+            ImageDraw.Draw(glyph).text((-x0, -y0), char, font=font, fill=255)
+            self.array[ay:ay + h, ax:ax + w] = np.asarray(glyph)
+        self.rasterized += 1
+        entry = (ax, ay, w, h, x0, y0, advance)
+        self._glyphs[char] = entry
+        return entry
+
+    def _allocate(self, w: int, h: int) -> Tuple[int, int]:
+        """Reserves a w x h cell, starting a new shelf or growing as needed."""
+        width = self.array.shape[1]
+        if w > width:
+            self.array = np.pad(self.array, ((0, 0), (0, w - width)))
+            width = w
+        if self._shelf_x + w > width:
+            self._shelf_y += self._shelf_h
+            self._shelf_x = self._shelf_h = 0
+        while self._shelf_y + h > self.array.shape[0]:
+            self.array = np.pad(self.array, ((0, self.array.shape[0]), (0, 0)))
+        x, y = self._shelf_x, self._shelf_y
+        self._shelf_x += w
+        self._shelf_h = max(self._shelf_h, h)
+        return x, y
+
+
+class RenderedText:
+    """A string's coverage mask and its bounding box offset (like textbbox)."""
+    __slots__ = ('mask', 'x0', 'y0', '_rgba', '_mask_image')
+
+    def __init__(self, mask: np.ndarray, x0: int, y0: int):
+        self.mask = mask
+        self.x0 = x0
+        self.y0 = y0
+        self._rgba: Dict[Color, Image.Image] = {}
+        self._mask_image: Optional[Image.Image] = None
+
+    @property
+    def bbox(self) -> Region:
+        """(x0, y0, x1, y1) relative to the pen position."""
+        h, w = self.mask.shape
+        return (self.x0, self.y0, self.x0 + w, self.y0 + h)
+
+    def mask_image(self) -> Image.Image:
+        """The coverage mask as a PIL "L" image (cached)."""
+        if self._mask_image is None:
+            self._mask_image = Image.fromarray(self.mask, "L")
+        return self._mask_image
+
+    def rgba_image(self, color: Color) -> Image.Image:
+        """The text in `color` with the coverage as alpha (cached)."""
+        image = self._rgba.get(color)
+        if image is None:
+            h, w = self.mask.shape
+            rgba = np.empty((h, w, 4), dtype=np.uint8)
+            rgba[..., :3] = color
+            rgba[..., 3] = self.mask
+            image = self._rgba[color] = Image.fromarray(rgba, "RGBA")
+        return image
+
+
+class TextRenderer:
+    """
+    Draws text from a glyph atlas, caching rendered strings in an LRU.
+
+    Example::
+
+        hud = TextRenderer(font)
+        region = hud.draw(lcd.framebuffer, (5, 5), f"FPS: {fps:.1f}",
+                          (255, 255, 255))
+        lcd.flush()
+
+    Targets can be a PIL image (RGB/RGBA/L), an RGB uint8 array of shape
+    (height, width, 3), a '>u2' RGB565 array, or a `FrameBuffer` (the
+    drawn region is marked dirty). Kerning is not applied.
+    """
+    def __init__(self, font: Font, cache_size: int = 128):
+        """
+        Args:
+            font: The PIL font to draw with.
+            cache_size: Number of rendered strings kept.
+        """
+        self.font = font
+        self.atlas = GlyphAtlas.for_font(font)
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[str, RenderedText]' = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def render(self, text: str) -> RenderedText:
+        """Returns the rendered string, composing it on a cache miss."""
+        cached = self._cache.get(text)
+        if cached is not None:
+            self._cache.move_to_end(text)
+            self._stats['hits'] += 1
+            return cached
+
+        self._stats['misses'] += 1
+        placed = []
+        pen = 0.0
+        for char in text:
+            mask, bx, by, advance = self.atlas.glyph(char)
+            if mask.size:
+                placed.append((mask, round(pen) + bx, by))
+            pen += advance
+
+        if placed:
+            x0 = min(x for _, x, _ in placed)
+            y0 = min(y for _, _, y in placed)
+            x1 = max(x + m.shape[1] for m, x, _ in placed)
+            y1 = max(y + m.shape[0] for m, _, y in placed)
+            out = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            for mask, x, y in placed:
+                h, w = mask.shape
+                view = out[y - y0:y - y0 + h, x - x0:x - x0 + w]
+                np.maximum(view, mask, out=view)
+            rendered = RenderedText(out, x0, y0)
+        else:
+            rendered = RenderedText(np.zeros((0, 0), dtype=np.uint8), 0, 0)
+
+        self._cache[text] = rendered
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return rendered
+
+    def measure(self, text: str) -> Region:
+        """Returns the text's (x0, y0, x1, y1) bbox relative to the pen."""
+        return self.render(text).bbox
+
+    def draw(
+            self, target, xy: Tuple[int, int], text: str, color: Color
+    ) -> Optional[Region]:
+        """
+        Draws text with its pen (origin) at `xy`, like `ImageDraw.text`.
+
+        Returns:
+            The region (x0, y0, x1, y1) that was drawn, or None if the text
+            is empty or off the target.
+        """
+        rendered = self.render(text)
+        if not rendered.mask.size:
+            return None
+        bx0, by0, bx1, by1 = rendered.bbox
+        x, y = int(xy[0]), int(xy[1])
+        region = (x + bx0, y + by0, x + bx1, y + by1)
+
+        if isinstance(target, Image.Image):
+            return self._draw_image(target, rendered, region, color)
+
+        array = getattr(target, 'array', target)  # FrameBuffer or array
+        th, tw = array.shape[:2]
+        cx0, cy0 = max(0, region[0]), max(0, region[1])
+        cx1, cy1 = min(tw, region[2]), min(th, region[3])
+        if cx0 >= cx1 or cy0 >= cy1:
+            return None
+        alpha = rendered.mask[
+            cy0 - region[1]:cy1 - region[1], cx0 - region[0]:cx1 - region[0]
+        ].astype(np.uint16)
+        dst = array[cy0:cy1, cx0:cx1]
+        if array.ndim == 3:
+            dst[...] = _blend(
+                dst, np.array(color, dtype=np.uint16), alpha[..., None]
+            )
+        else:
+            rgb = _rgb565_to_rgb(dst)
+            blended = _blend(
+                rgb, np.array(color, dtype=np.uint16), alpha[..., None]
+            ).astype(np.uint16)
+            # Keep untouched pixels bit-exact
+            touched = alpha > 0
+            packed = (
+                ((blended[..., 0] & 0xF8) << 8)
+                | ((blended[..., 1] & 0xFC) << 3)
+                | (blended[..., 2] >> 3)
+            )
+            dst[touched] = packed[touched]
+        clipped = (cx0, cy0, cx1, cy1)
+        if hasattr(target, 'mark_dirty'):
+            target.mark_dirty(clipped)
+        return clipped
+
+    def get_stats(self) -> dict:
+        """Returns string cache hits/misses and rasterized glyph count."""
+        stats = dict(self._stats)
+        stats['cached'] = len(self._cache)
+        stats['glyphs'] = self.atlas.rasterized
+        return stats
+
+    @staticmethod
+    def _draw_image(
+            image: Image.Image, rendered: RenderedText, region: Region,
+            color: Color
+    ) -> Optional[Region]:
+        x0, y0, x1, y1 = region
+        clipped = (max(0, x0), max(0, y0), min(image.width, x1),
+                   min(image.height, y1))
+        if clipped[0] >= clipped[2] or clipped[1] >= clipped[3]:
+            return None
+        if image.mode == "RGBA":
+            # "Over" compositing, so the layer's alpha stays correct
+            source = (clipped[0] - x0, clipped[1] - y0,
+                      clipped[2] - x0, clipped[3] - y0)
+            image.alpha_composite(
+                rendered.rgba_image(color), clipped[:2], source
+            )
+        else:
+            fill = color if image.mode != "L" else max(color)
+            image.paste(fill, region, rendered.mask_image())
+        return clipped
+
+
+def _blend(dst: np.ndarray, color: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """Blends `color` over uint8 RGB pixels with 0-255 coverage."""
+    return ((color * alpha + dst * (255 - alpha) + 127) // 255).astype(np.uint8)
+
+
+def _rgb565_to_rgb(pixels: np.ndarray) -> np.ndarray:
+    """Expands RGB565 pixels to uint8 RGB."""
+    v = pixels.astype(np.uint16)
+    rgb = np.empty(pixels.shape + (3,), dtype=np.uint16)
+    rgb[..., 0] = (v >> 8) & 0xF8
+    rgb[..., 1] = (v >> 3) & 0xFC
+    rgb[..., 2] = (v << 3) & 0xF8
+    return rgb
+
@@ -0,0 +1,136 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Test for ColorConverter: every engine must match the "lut" reference
+bit for bit.
+"""
+import numpy as np
+import pytest
+
+from pi0disp.utils.performance_core import ColorConverter
+
+ENGINES = ColorConverter.available_engines()
+
+
+def ramp_images():
+    """
+    Images where every value of every channel appears next to every value
+    of the other channels.
+    """
+    y, x = np.mgrid[0:256, 0:256].astype(np.uint8)
+    return [
+        np.stack((x, y, x ^ y), axis=2),
+        np.stack((x ^ y, x, y), axis=2),
+        np.stack((y, x ^ y, x), axis=2),
+    ]
+
+
+def random_image(height, width, channels=3, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(
+        0, 256, (height, width, channels), dtype=np.uint8
+    )
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return ColorConverter("lut")
+
+
+# ======================================================================
+# Reference
+# ======================================================================
+def test_lut_matches_formula(reference):
+    """
+    "lut" itself implements the RGB565 packing.
+    """
+    for rgb in ramp_images():
+        r, g, b = (rgb[:, :, i].astype(np.uint16) for i in range(3))
+        expected = ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
+        out = reference.rgb_to_rgb565(rgb)
+        assert out.dtype == np.dtype(">u2")
+        assert np.array_equal(out, expected)
+
+
+# ======================================================================
+# Engines against the reference
+# ======================================================================
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_ramps(reference, engine):
+    """
+    Exhaustive channel ramps.
+    """
+    converter = ColorConverter(engine)
+    for rgb in ramp_images():
+        assert np.array_equal(
+            converter.rgb_to_rgb565(rgb), reference.rgb_to_rgb565(rgb)
+        )
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("size", [(1, 1), (1, 7), (7, 1), (3, 5), (17, 33),
+                                  (239, 321)])
+def test_engine_odd_sizes(reference, engine, size):
+    """
+    Odd and single-pixel sizes.
+    """
+    rgb = random_image(*size)
+    assert np.array_equal(
+        ColorConverter(engine).rgb_to_rgb565(rgb),
+        reference.rgb_to_rgb565(rgb)
+    )
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_strided(reference, engine):
+    """
+    Non-contiguous input, output into a framebuffer slice.
+    """
+    rgb = random_image(64, 101, seed=1)
+    expected = reference.rgb_to_rgb565(rgb[:, ::2])
+    target = np.zeros((64, 80), dtype=">u2")
+    ColorConverter(engine).rgb_to_rgb565(rgb[:, ::2], out=target[:, 10:61])
+    assert np.array_equal(target[:, 10:61], expected)
+    assert not target[:, :10].any()
+    assert not target[:, 61:].any()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_four_channels(reference, engine):
+    """
+    The alpha channel of an RGBA array is ignored.
+    """
+    rgba = random_image(31, 47, channels=4, seed=2)
+    assert np.array_equal(
+        ColorConverter(engine).rgb_to_rgb565(rgba),
+        reference.rgb_to_rgb565(np.ascontiguousarray(rgba[:, :, :3]))
+    )
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_parallel(reference, engine):
+    """
+    Banded conversion on several threads.
+    """
+    rgb = random_image(241, 319, seed=3)
+    converter = ColorConverter(engine, workers=3, parallel_min_pixels=1)
+    try:
+        assert np.array_equal(
+            converter.rgb_to_rgb565(rgb), reference.rgb_to_rgb565(rgb)
+        )
+    finally:
+        converter.close()
+
+
+def test_verify_engines():
+    """
+    The runtime check agrees with the tests above.
+    """
+    assert ColorConverter.verify_engines() == {e: True for e in ENGINES}
+
+
+@pytest.mark.parametrize("shape", [(4, 4), (4, 4, 2)])
+def test_bad_shape(reference, shape):
+    with pytest.raises(ValueError):
+        reference.rgb_to_rgb565(np.zeros(shape, dtype=np.uint8))
@@ -0,0 +1,119 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Round-trip tests of the display path on the emulator transport: what the
+emulated panel shows must match the source image.
+"""
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from pi0disp.disp.emulator import save_snapshot
+from pi0disp.disp.st7789v import ST7789V
+
+
+def rgb565_colors(image):
+    """The colors of `image` after RGB565 quantization, as the emulator
+    expands them back to 8 bits."""
+    a = np.asarray(image.convert("RGB")).astype(np.uint16)
+    r, g, b = a[..., 0] >> 3, a[..., 1] >> 2, a[..., 2] >> 3
+    return np.stack(
+        ((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)),
+        axis=-1
+    ).astype(np.uint8)
+
+
+def random_image(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(
+        rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    )
+
+
+def screen(lcd):
+    return np.asarray(lcd.transport.device.render())
+
+
+@pytest.fixture(scope="module", params=[0, 90, 180, 270])
+def lcd(request):
+    """One panel per rotation (the init sequence sleeps about 1 s); every
+    test starts by drawing the whole screen."""
+    lcd = ST7789V(transport="emulator", rotation=request.param)
+    yield lcd
+    lcd.close()
+
+
+# ======================================================================
+# Round trips
+# ======================================================================
+def test_display(lcd):
+    image = random_image(lcd.width, lcd.height)
+    lcd.display(image)
+    assert np.array_equal(screen(lcd), rgb565_colors(image))
+
+
+def test_display_regions(lcd):
+    base = random_image(lcd.width, lcd.height, seed=1)
+    lcd.display(base)
+    image = random_image(lcd.width, lcd.height, seed=2)
+    regions = [(0, 0, 10, 10), (50, 60, 91, 99), (lcd.width - 7, 3,
+                                                  lcd.width, lcd.height)]
+    lcd.display_regions(image, regions)
+
+    expected = base.copy()
+    for region in regions:
+        expected.paste(image.crop(region), region[:2])
+    assert np.array_equal(screen(lcd), rgb565_colors(expected))
+
+
+def test_display_regions_numpy_coords(lcd):
+    image = random_image(lcd.width, lcd.height, seed=3)
+    lcd.display(Image.new("RGB", image.size))
+    region = tuple(np.array([5, 7, 61, 43]))
+    lcd.display_regions(image, [region])
+
+    expected = Image.new("RGB", image.size)
+    expected.paste(image.crop(region), (5, 7))
+    assert np.array_equal(screen(lcd), rgb565_colors(expected))
+
+
+def test_flush(lcd):
+    lcd.framebuffer.fill((0, 0, 64))
+    lcd.flush([(0, 0, lcd.width, lcd.height)])
+
+    sprite = random_image(40, 30, seed=4)
+    lcd.framebuffer.fill_rect(10, 20, 70, 50, (255, 128, 0))
+    lcd.framebuffer.paste(sprite, 100, 80)
+    lcd.flush()
+
+    expected = Image.new("RGB", (lcd.width, lcd.height), (0, 0, 64))
+    ImageDraw.Draw(expected).rectangle((10, 20, 69, 49), fill=(255, 128, 0))
+    expected.paste(sprite, (100, 80))
+    assert np.array_equal(screen(lcd), rgb565_colors(expected))
+
+
+# ======================================================================
+# Geometry and snapshots
+# ======================================================================
+def test_panel_geometry():
+    with ST7789V(transport="emulator", width=240, height=240) as lcd:
+        device = lcd.transport.device
+        assert (device.width, device.height) == (240, 240)
+        image = random_image(240, 240, seed=5)
+        lcd.display(image)
+        assert np.array_equal(screen(lcd), rgb565_colors(image))
+
+
+def test_save_snapshot(lcd, tmp_path):
+    image = random_image(lcd.width, lcd.height, seed=6)
+    lcd.display(image)
+    path = tmp_path / "screen.png"
+    assert save_snapshot(lcd.transport, str(path))
+    with Image.open(path) as snapshot:
+        assert np.array_equal(np.asarray(snapshot), rgb565_colors(image))
+
+
+def test_save_snapshot_needs_emulator(tmp_path):
+    with ST7789V(transport="memory") as lcd:
+        assert not save_snapshot(lcd.transport, str(tmp_path / "x.png"))
@@ -0,0 +1,59 @@
+#
+# (c) 2025 Yoichi Tanibayashi
+#
+"""
+Test for MemoryPool and its use by the region transfers
+"""
+import numpy as np
+import pytest
+from PIL import Image
+
+from pi0disp.disp.st7789v import ST7789V
+from pi0disp.utils.performance_core import MemoryPool
+
+
+@pytest.fixture
+def lcd():
+    lcd = ST7789V(transport="memory")
+    yield lcd
+    lcd.close()
+
+
+# ======================================================================
+# Size classes
+# ======================================================================
+@pytest.mark.parametrize("size, expected", [
+    (0, 256), (1, 256), (256, 256), (257, 512), (4096, 4096), (4097, 8192),
+])
+def test_size_class(size, expected):
+    assert MemoryPool().size_class(size) == expected
+
+
+@pytest.mark.parametrize("size", [np.int64(1000), np.uint32(1000)])
+def test_numpy_size(size):
+    """
+    NumPy integers are accepted like int.
+    """
+    pool = MemoryPool()
+    assert pool.size_class(size) == 1024
+    buffer = pool.get_buffer(size)
+    assert len(buffer) == 1024
+    pool.return_buffer(buffer)
+    assert pool.get_buffer(1024) is buffer
+
+
+# ======================================================================
+# Region transfers with NumPy coordinates
+# ======================================================================
+def test_display_region_numpy_coords(lcd):
+    image = Image.new("RGB", (lcd.width, lcd.height), (255, 0, 0))
+    x0, y0, x1, y1 = np.array([10, 10, 50, 40])
+    lcd.display_region(image, x0, y0, x1, y1)
+    assert lcd.transport.bytes_written >= 40 * 30 * 2
+
+
+def test_display_regions_numpy_coords(lcd):
+    image = Image.new("RGB", (lcd.width, lcd.height), (0, 255, 0))
+    regions = [tuple(r) for r in np.array([[0, 0, 33, 17], [50, 60, 71, 90]])]
+    lcd.display_regions(image, regions)
+    assert lcd.transport.bytes_written >= (33 * 17 + 21 * 30) * 2